@@ -5,320 +5,215 @@ Tests multiple scenarios across both interfaces with Wireshark validation
 """
 
 import sys
-import os
-import time
-import struct
-import socket
-import threading
 
-sys.path.insert(0, '/home/kim/tsn_venv/lib/python3.12/site-packages')
+from frer_frame import interface_mac, interface_mtu, max_payload
+from frer_scenario import Scenario, ScenarioStream, ScenarioRunner, FIRST_SRC_PORT
+from frer_recovery import COUNTER_NAMES
 
-try:
-    from scapy.all import *
-except ImportError:
-    os.system("source /home/kim/tsn_venv/bin/activate && pip install scapy")
-    from scapy.all import *
+# Largest UDP payload in a 1500-byte MTU, where the interface MTU is unknown
+MTU_PAYLOAD = max_payload(1500)
 
 class ComprehensiveRTAGTester:
     """Comprehensive R-TAG testing across multiple scenarios"""
     
-    def __init__(self):
+    def __init__(self, line_rate=False, scale=1):
         self.test_results = {}
-        self.sequence_counter = 1
+        self.line_rate = line_rate  # ignore inter-frame gaps, send in batches
+        self.scale = scale  # frames per declared frame, gaps shrunk to match
         
-    def create_rtag_frame(self, seq_num, stream_handle=1, interface="enp2s0", 
-                         vlan_id=100, priority=3, payload_size=64):
-        """Create standard-compliant R-TAG frame"""
-        
-        # Get interface MAC
+    def src_mac(self, interface):
+        """MAC address of an interface"""
         try:
-            src_mac_str = get_if_hwaddr(interface).replace(':', '')
-            src_mac = bytes.fromhex(src_mac_str)
+            return interface_mac(interface)
         except:
             # Fallback MACs
             if interface == "enp2s0":
-                src_mac = bytes.fromhex('68050cabd96e7')
-            else:
-                src_mac = bytes.fromhex('d45d64b25dc3')
-        
-        dst_mac = bytes.fromhex('ffffffffffff')  # Broadcast
-        
-        # VLAN tag
-        vlan_tci = (priority << 13) | vlan_id
-        vlan_tag = struct.pack('!HH', 0x8100, vlan_tci)
-        
-        # IEEE 802.1CB R-TAG
-        rtag_header = struct.pack('!HHHH',
-            0xF1C1,        # R-TAG EtherType
-            0x0000,        # Reserved  
-            seq_num,       # Sequence number
-            0x0800         # Next protocol (IP)
-        )
+                return bytes.fromhex('6805cabd96e7')
+            return bytes.fromhex('d45d64b25dc3')
+    
+    def basic_scenario(self):
+        """Basic R-TAG test - standard sequences"""
+        # Sequences 1-10, original + duplicate of each
+        return Scenario("Basic R-TAG compliance",
+                        [ScenarioStream(10, gap=0.2)])
+    
+    def multi_stream_scenario(self):
+        """Multi-stream R-TAG test"""
+        return Scenario("Multi-stream",
+                        [ScenarioStream(5, gap=0.1) for _ in range(3)])
+    
+    def vlan_priority_scenario(self):
+        """Different VLAN priorities test"""
+        priorities = [0, 3, 6, 7]  # Best effort, Critical, Voice, Network control
+        vlan_ids = [100, 200, 300, 400]
+        return Scenario("VLAN priority",
+                        [ScenarioStream(1, first_sequence=i + 1, vlan_id=vlan_id,
+                                        priority=priority, start=0.3 * i)
+                         for i, (priority, vlan_id) in enumerate(zip(priorities, vlan_ids))])
+    
+    def payload_size_scenario(self):
+        """Different payload sizes test, up to the largest the MTU allows"""
+        try:
+            largest = max_payload(interface_mtu("enp2s0"))
+        except OSError:
+            largest = MTU_PAYLOAD
+        sizes = [64, 128, 256, 512, 1024, largest]
+        return Scenario("Payload size",
+                        [ScenarioStream(1, first_sequence=i + 1, payload_size=size,
+                                        start=0.2 * i)
+                         for i, size in enumerate(sizes)])
+    
+    def wraparound_scenario(self):
+        """Sequence number wraparound test"""
+        return Scenario("Sequence wraparound",
+                        [ScenarioStream(6, first_sequence=65533, gap=0.2)],
+                        "elimination continues across 0xFFFF → 0x0000")
+    
+    def replicated_scenario(self):
+        """Replicated R-TAG test (both interfaces, shared sequence numbers)"""
+        return Scenario("Replicated (enp2s0 + enp11s0)",
+                        [ScenarioStream(6, members=("enp2s0", "enp11s0"), gap=0.3)])
+    
+    def impaired_scenario(self):
+        """Replicated stream over lossy, skewed and misbehaving member paths"""
+        # NumPy is only loaded when the impaired paths are built
+        from frer_impairment import PathImpairment
+        paths = [PathImpairment(loss=0.02, burst_loss=0.002, burst_length=8,
+                                jitter=0.00005),
+                 PathImpairment(loss=0.01, delay=0.002, jitter=0.0003,
+                                jitter_distribution='exponential', reorder=0.02,
+                                duplicate=0.01, rogue=0.002)]
+        return Scenario("Impaired member paths",
+                        [ScenarioStream(2000, members=("enp2s0", "enp11s0"),
+                                        gap=0.0005, paths=paths)],
+                        "loss, bursts, skew, reordering, duplicates and rogue "
+                        "sequence numbers against the ground truth")
+    
+    def scenarios(self):
+        return [self.basic_scenario(), self.multi_stream_scenario(),
+                self.vlan_priority_scenario(), self.payload_size_scenario(),
+                self.wraparound_scenario(), self.replicated_scenario(),
+                self.impaired_scenario()]
+    
+    def run_scenarios(self, scenarios):
+        """Send scenarios concurrently and check them against the receiver"""
+        runner = ScenarioRunner(scenarios, self.src_mac("enp2s0"),
+                                scale=self.scale, line_rate=self.line_rate)
+        
+        print(f"{'Stream':>6} {'UDP port':>8} {'VLAN':>5} {'PCP':>4} {'Size':>5} "
+              f"{'Frames':>9}  Members / scenario")
+        for scenario in scenarios:
+            for stream in scenario.streams:
+                print(f"{stream.handle:>6} {FIRST_SRC_PORT + stream.handle:>8} "
+                      f"{stream.vlan_id:>5} {stream.priority:>4} {stream.payload_size:>5} "
+                      f"{stream.frames * self.scale:>9}  "
+                      f"{' + '.join(stream.members)} / {scenario.name}")
+                for member, path in zip(stream.members, stream.paths or ()):
+                    print(f"{'':>42}{member}: {path.describe()}")
+        print("")
         
-        # Create payload of specified size
-        base_payload = f"R-TAG Test S{stream_handle} Seq{seq_num} If{interface}"
-        if len(base_payload) < payload_size:
-            payload = base_payload + "X" * (payload_size - len(base_payload))
+        try:
+            results = runner.run()
+        except (OSError, RuntimeError) as e:
+            print(f"❌ Scenario run error: {e}")
+            return False
+        
+        report = runner.report
+        if self.line_rate:
+            print(f"📈 {report.frames} frames in {report.elapsed:.3f}s: {report.pps:,.0f} pps")
         else:
-            payload = base_payload[:payload_size]
-        
-        # IP/UDP headers (simplified)
-        ip_header = struct.pack('!BBHHHBBH4s4s',
-            0x45, 0x00, 20 + 8 + len(payload), seq_num, 0x4000, 64, 17, 0,
-            socket.inet_aton("192.168.100.1"), socket.inet_aton("192.168.100.2"))
-        
-        udp_header = struct.pack('!HHHH', 12345, 54321, 8 + len(payload), 0)
-        
-        # Complete frame
-        frame = (dst_mac + src_mac + vlan_tag + rtag_header + 
-                 ip_header + udp_header + payload.encode())
-        
-        return frame
+            print(f"📈 {report.summary()}")
+        if runner.drops:
+            print(f"⚠ Receiver dropped {runner.drops} frames")
+        
+        all_passed = True
+        for scenario, mismatches in results:
+            self.test_results[scenario.name] = not mismatches
+            frames = scenario.frames(self.scale)
+            if not mismatches:
+                note = f" ({scenario.description})" if scenario.description else ""
+                print(f"✅ {scenario.name}: {frames} frames, receiver counts match{note}")
+                continue
+            all_passed = False
+            print(f"❌ {scenario.name}: {frames} frames, {len(mismatches)} mismatches")
+            for stream, counter, expected, received in mismatches:
+                print(f"   Stream {stream.handle} {COUNTER_NAMES[counter]}: "
+                      f"expected {expected}, received {received}")
+        return all_passed
     
     def send_basic_rtag_test(self):
-        """Basic R-TAG test - standard sequences"""
         print("🔬 Test 1: Basic R-TAG Compliance Test")
-        print("=" * 50)
-        
-        try:
-            sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW)
-            sock.bind(("enp2s0", 0))
-            
-            # Send sequences 1-10 with duplicates
-            for seq in range(1, 11):
-                frame = self.create_rtag_frame(seq, stream_handle=1)
-                
-                print(f"📤 Sending Sequence {seq} (Stream 1)")
-                
-                # Original
-                sock.send(frame)
-                time.sleep(0.001)
-                
-                # Duplicate (FRER)
-                sock.send(frame)
-                time.sleep(0.2)
-            
-            sock.close()
-            print("✅ Basic test completed: 10 sequences × 2 packets = 20 total")
-            
-        except Exception as e:
-            print(f"❌ Basic test error: {e}")
+        return self.run_scenarios([self.basic_scenario()])
     
     def send_multi_stream_test(self):
-        """Multi-stream R-TAG test"""
         print("\n🌊 Test 2: Multi-Stream R-TAG Test")
-        print("=" * 50)
-        
-        try:
-            sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW)
-            sock.bind(("enp2s0", 0))
-            
-            # Test multiple streams
-            for stream_id in [1, 2, 3]:
-                print(f"\n📡 Stream {stream_id} packets:")
-                
-                for seq in range(1, 6):  # 5 sequences per stream
-                    frame = self.create_rtag_frame(seq, stream_handle=stream_id)
-                    
-                    print(f"   Seq {seq}: Stream {stream_id}")
-                    
-                    # Send original + duplicate
-                    sock.send(frame)
-                    time.sleep(0.001)
-                    sock.send(frame)
-                    time.sleep(0.1)
-            
-            sock.close()
-            print("✅ Multi-stream test: 3 streams × 5 sequences × 2 packets = 30 total")
-            
-        except Exception as e:
-            print(f"❌ Multi-stream test error: {e}")
+        return self.run_scenarios([self.multi_stream_scenario()])
     
     def send_vlan_priority_test(self):
-        """Different VLAN priorities test"""
         print("\n🎯 Test 3: VLAN Priority R-TAG Test")
-        print("=" * 50)
-        
-        try:
-            sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW)
-            sock.bind(("enp2s0", 0))
-            
-            priorities = [0, 3, 6, 7]  # Best effort, Critical, Voice, Network control
-            vlan_ids = [100, 200, 300, 400]
-            
-            for i, (priority, vlan_id) in enumerate(zip(priorities, vlan_ids)):
-                seq = i + 1
-                frame = self.create_rtag_frame(seq, stream_handle=1, 
-                                             vlan_id=vlan_id, priority=priority)
-                
-                print(f"📤 VLAN {vlan_id}, Priority {priority}, Seq {seq}")
-                
-                # Send original + duplicate
-                sock.send(frame)
-                time.sleep(0.001)
-                sock.send(frame)
-                time.sleep(0.3)
-            
-            sock.close()
-            print("✅ Priority test: 4 priorities × 2 packets = 8 total")
-            
-        except Exception as e:
-            print(f"❌ Priority test error: {e}")
+        return self.run_scenarios([self.vlan_priority_scenario()])
     
     def send_payload_size_test(self):
-        """Different payload sizes test"""
         print("\n📏 Test 4: Payload Size Variation Test")
-        print("=" * 50)
-        
-        try:
-            sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW)
-            sock.bind(("enp2s0", 0))
-            
-            sizes = [64, 128, 256, 512, 1024, 1500]  # Different MTU sizes
-            
-            for i, size in enumerate(sizes):
-                seq = i + 1
-                frame = self.create_rtag_frame(seq, stream_handle=1, payload_size=size)
-                
-                print(f"📤 Payload {size} bytes, Seq {seq}")
-                
-                # Send original + duplicate
-                sock.send(frame)
-                time.sleep(0.001)
-                sock.send(frame)
-                time.sleep(0.2)
-            
-            sock.close()
-            print("✅ Payload test: 6 sizes × 2 packets = 12 total")
-            
-        except Exception as e:
-            print(f"❌ Payload test error: {e}")
+        return self.run_scenarios([self.payload_size_scenario()])
     
     def send_sequence_wraparound_test(self):
-        """Sequence number wraparound test"""
         print("\n🔄 Test 5: Sequence Wraparound Test")
-        print("=" * 50)
-        
-        try:
-            sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW)
-            sock.bind(("enp2s0", 0))
-            
-            # Test near sequence number limits
-            sequences = [65533, 65534, 65535, 0, 1, 2]  # 16-bit wraparound
-            
-            for seq in sequences:
-                frame = self.create_rtag_frame(seq, stream_handle=1)
-                
-                print(f"📤 Sequence {seq} (0x{seq:04X})")
-                
-                # Send original + duplicate
-                sock.send(frame)
-                time.sleep(0.001)
-                sock.send(frame)
-                time.sleep(0.2)
-            
-            sock.close()
-            print("✅ Wraparound test: 6 sequences × 2 packets = 12 total")
-            
-        except Exception as e:
-            print(f"❌ Wraparound test error: {e}")
+        return self.run_scenarios([self.wraparound_scenario()])
     
     def send_bidirectional_test(self):
-        """Bidirectional R-TAG test (both interfaces)"""
-        print("\n↔️  Test 6: Bidirectional R-TAG Test")
-        print("=" * 50)
-        
-        def send_from_interface(interface, start_seq):
-            try:
-                sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW)
-                sock.bind((interface, 0))
-                
-                for i in range(3):  # 3 sequences per interface
-                    seq = start_seq + i
-                    frame = self.create_rtag_frame(seq, stream_handle=1, interface=interface)
-                    
-                    print(f"📤 {interface}: Sequence {seq}")
-                    
-                    # Send original + duplicate
-                    sock.send(frame)
-                    time.sleep(0.001)
-                    sock.send(frame)
-                    time.sleep(0.3)
-                
-                sock.close()
-                
-            except Exception as e:
-                print(f"❌ {interface} error: {e}")
-        
-        # Send from both interfaces simultaneously
-        thread1 = threading.Thread(target=send_from_interface, args=("enp2s0", 100))
-        thread2 = threading.Thread(target=send_from_interface, args=("enp11s0", 200))
-        
-        thread1.start()
-        time.sleep(0.1)  # Small delay
-        thread2.start()
-        
-        thread1.join()
-        thread2.join()
-        
-        print("✅ Bidirectional test: 2 interfaces × 3 sequences × 2 packets = 12 total")
+        print("\n↔️  Test 6: Replicated R-TAG Test (enp2s0 + enp11s0)")
+        return self.run_scenarios([self.replicated_scenario()])
+    
+    def send_impaired_test(self):
+        print("\n🧪 Test 7: Impaired Member Paths Test")
+        return self.run_scenarios([self.impaired_scenario()])
     
     def run_comprehensive_test(self):
-        """Run all R-TAG tests"""
+        """Run all R-TAG scenarios at once and verify them"""
         print("🚀 COMPREHENSIVE IEEE 802.1CB R-TAG TEST SUITE")
         print("=" * 60)
-        print("Testing on interfaces: enp2s0, enp11s0")
-        print("Wireshark should be capturing on both interfaces")
+        print("Testing on interfaces: enp2s0, enp11s0 (receiver on both)")
         print("Expected R-TAG EtherType: 0xF1C1")
+        print(f"Transmit mode: {'line rate (batched)' if self.line_rate else 'paced'}"
+              + (f", scale ×{self.scale}" if self.scale > 1 else ""))
         print("")
         
-        # Run all tests with delays
-        self.send_basic_rtag_test()
-        time.sleep(2)
-        
-        self.send_multi_stream_test()
-        time.sleep(2)
-        
-        self.send_vlan_priority_test()
-        time.sleep(2)
-        
-        self.send_payload_size_test()
-        time.sleep(2)
-        
-        self.send_sequence_wraparound_test()
-        time.sleep(2)
-        
-        self.send_bidirectional_test()
+        # Scenarios run concurrently on disjoint streams
+        passed = self.run_scenarios(self.scenarios())
         
         # Summary
         print("\n" + "=" * 60)
         print("🎯 COMPREHENSIVE TEST SUMMARY")
         print("=" * 60)
-        print("Total packets sent: ~94 packets")
+        print(f"Scenarios passed: {sum(self.test_results.values())}/{len(self.test_results)}")
         print("")
         print("🔍 WIRESHARK VERIFICATION:")
         print("✅ Protocol column should show: 'IEEE 802.1CB'")
         print("✅ R-TAG fields should be parsed correctly")
-        print("✅ Each sequence should appear exactly 2 times")
         print("")
         print("📊 Display Filters to use:")
         print("  • All R-TAG: ieee8021cb")
-        print("  • Stream 1: ieee8021cb and frame contains 01:00")
-        print("  • Stream 2: ieee8021cb and frame contains 02:00") 
-        print("  • Stream 3: ieee8021cb and frame contains 03:00")
-        print("  • High sequences: ieee8021cb.seq >= 100")
+        print(f"  • Stream N: ieee8021cb and udp.srcport == {FIRST_SRC_PORT} + N (table above)")
+        print("  • High sequences: ieee8021cb.seq >= 65533")
         print("  • VLAN 200: ieee8021cb and vlan.id == 200")
         print("  • Priority 6: ieee8021cb and vlan.priority == 6")
         print("")
         print("🧩 Expected R-TAG patterns in hex view:")
         print("  • F1 C1 00 00 XX XX 08 00 (where XX XX is sequence)")
-        print("  • Stream handle in frame bytes (01:00, 02:00, 03:00)")
         print("")
-        print("🎉 All tests completed successfully!")
+        if passed:
+            print("🎉 All scenarios verified by the receiver!")
+        else:
+            print("⚠ Some scenarios did not match the expected counts")
+        return passed
 
 def main():
-    tester = ComprehensiveRTAGTester()
-    tester.run_comprehensive_test()
+    scale = 1
+    if "--scale" in sys.argv:
+        scale = int(sys.argv[sys.argv.index("--scale") + 1])
+    tester = ComprehensiveRTAGTester(line_rate="--line-rate" in sys.argv, scale=scale)
+    sys.exit(0 if tester.run_comprehensive_test() else 1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -4,92 +4,260 @@ FRER Analysis Tool - Real-time duplicate detection and statistics
 """
 
 import sys
-import os
 import time
-import struct
+from array import array
 from collections import defaultdict
 
+# Scapy is only imported by the sniff backend, from the tool's venv if present
 sys.path.insert(0, '/home/kim/tsn_venv/lib/python3.12/site-packages')
 
-try:
-    from scapy.all import *
-except ImportError:
-    os.system("source /home/kim/tsn_venv/bin/activate && pip install scapy")
-    from scapy.all import *
+from rtag_decoder import decode_rtag, decode_tagless
+from frer_recovery import (RecoveryTable, DEFAULT_HISTORY_LENGTH,
+                           DEFAULT_RESET_TIMEOUT, DEFAULT_LATENT_ERROR_PATHS,
+                           PASSED, DISCARDED, OUT_OF_ORDER, ROGUE, LOST,
+                           TAGLESS, RESETS, LATENT_ERRORS, COUNTER_NAMES)
+from frer_stream_id import StreamIdentificationTable, IP_STREAM_ID
+from frer_capture import TPacketV3Ring, TimestampingSocket, MultiInterfaceCapture
+from frer_bpf import compile_rtag_filter
+from frer_pcap import PcapReader
+from frer_transmit import BatchTransmitter
+from frer_replication import Replicator
+from frer_pacer import Pacer, constant_rate, bursts
+from frer_frame import FrameTemplate, interface_mac, decode_probe, PROBE_LEN
+from frer_stats import LogHistogram, CopyTable, ArrivalTable, EventLog
+from frer_stream_state import (StreamStateStore, DEFAULT_MAX_STREAMS,
+                               DEFAULT_IDLE_TIMEOUT)
+
+DEFAULT_REPORT_INTERVAL = 5.0  # seconds between periodic reports
+
+def format_event(index, stream_id, sequence, passed):
+    """Event log line for one R-TAG frame"""
+    if passed:
+        return f"[{index:3d}] Stream:{stream_id} Seq:{sequence:2d} | ORIGINAL  | ACCEPTED"
+    return f"[{index:3d}] Stream:{stream_id} Seq:{sequence:2d} | DUPLICATE | ELIMINATED"
 
 class FRERAnalyzer:
     """Real-time FRER frame analysis and duplicate elimination"""
     
-    def __init__(self):
-        self.stream_sequences = defaultdict(set)  # stream_id -> set of seen sequences
+    def __init__(self, history_length=DEFAULT_HISTORY_LENGTH,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT, stream_key=IP_STREAM_ID,
+                 member_streams=DEFAULT_LATENT_ERROR_PATHS, verbose=True,
+                 report_interval=DEFAULT_REPORT_INTERVAL, event_log=None,
+                 members=None, max_streams=DEFAULT_MAX_STREAMS, max_bytes=None,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT, recorder=None):
+        self.verbose = verbose  # periodic reports every report_interval seconds
+        self.report_interval = report_interval
+        self.event_log = event_log  # optional sampled/buffered EventLog
+        self.recorder = recorder  # optional CaptureRecorder, one record per frame
+        self.history_length = history_length
+        self.reset_timeout = reset_timeout
+        self.member_streams = member_streams  # expected copies of each frame
+        self.stream_table = StreamIdentificationTable(stream_key)
         self.packet_count = 0
         self.duplicate_count = 0
         self.unique_count = 0
         self.rtag_packets = 0
-        self.sequence_stats = defaultdict(int)  # sequence -> count
         self.start_time = time.time()
         
+        # Aggregates updated in O(1) per frame
+        self.inter_arrival = LogHistogram()  # ns between R-TAG frames
+        self.copy_histogram = LogHistogram()  # copies received per sequence
+        # One-way latency (RX timestamp - embedded TX time) in ns
+        self.path_latency = {}  # path_id -> LogHistogram, every copy
+        self.latency = LogHistogram()  # frames passed by elimination
+        # Per member stream (capture interface) accounting, when captured apart
+        self.members = list(members or [])
+        self.member_frames = array('Q', [0] * len(self.members))
+        self.member_wins = array('Q', [0] * len(self.members))  # first copies
+        self.member_losses = array('Q', [0] * len(self.members))
+        self.member_skew = [LogHistogram() for _ in self.members]  # ns behind first
+        
+        # Per-stream state: rows of array slabs, bounded by max_streams and
+        # max_bytes; streams idle for idle_timeout are folded into the totals
+        self.recovery_table = RecoveryTable(history_length, reset_timeout,
+                                            latent_error_paths=member_streams)
+        self.copies = CopyTable(self.copy_histogram, history_length)
+        self.arrivals = None
+        tables = [self.recovery_table, self.copies]
+        if self.members:
+            self.arrivals = ArrivalTable(self.member_wins, self.member_losses,
+                                         self.member_skew, history_length)
+            tables.append(self.arrivals)
+        self.streams = StreamStateStore(tables, max_streams, max_bytes,
+                                        idle_timeout, on_evict=self._evict)
+        self.evicted_counters = array('Q', bytes(8 * len(COUNTER_NAMES)))
+        self._last_arrival_ns = None
+        self._interval_start = time.monotonic()
+        self._interval_frames = 0
+        self._next_report_ns = time.monotonic_ns() + int(report_interval * 1e9)
+        
     def analyze_packet(self, packet):
         """Analyze packet for R-TAG and FRER behavior"""
+        # Scapy packets are serialized once; raw buffers are used as-is
+        timestamp_ns = None
+        if not isinstance(packet, (bytes, bytearray, memoryview)):
+            # Kernel receive time, as float seconds
+            timestamp_ns = int(packet.time * 1e9)
+            packet = bytes(packet)
+        self.analyze_frame(packet, timestamp_ns=timestamp_ns)
+    
+    def analyze_frame(self, frame, vlan_tci=None, timestamp_ns=None, member=None):
+        """Analyze a raw Ethernet frame (bytes or memoryview)
+
+        member is the index in members of the interface the frame came in on.
+        Returns True if elimination passed the frame, False if it discarded
+        it, and None for frames not subject to elimination.
+        """
         self.packet_count += 1
         
-        # Check if packet has R-TAG
-        if self.has_rtag(packet):
-            self.rtag_packets += 1
-            sequence = self.extract_sequence(packet)
-            
-            if sequence is not None:
-                self.sequence_stats[sequence] += 1
-                
-                # FRER duplicate detection (assume stream_id = 1 for simplicity)
-                stream_id = 1
-                
-                if sequence in self.stream_sequences[stream_id]:
-                    self.duplicate_count += 1
-                    status = "DUPLICATE"
-                    action = "ELIMINATED"
-                else:
-                    self.stream_sequences[stream_id].add(sequence)
-                    self.unique_count += 1
-                    status = "ORIGINAL"
-                    action = "ACCEPTED"
-                
-                # Real-time output
-                print(f"[{self.packet_count:3d}] Seq:{sequence:2d} | {status:9s} | {action}")
-                
-                # Print statistics every 10 packets
-                if self.rtag_packets % 10 == 0:
-                    self.print_statistics()
+        header = decode_rtag(frame, vlan_tci)
+        if header is None:
+            # Frames of a known stream that lost their R-TAG are tagless
+            header = decode_tagless(frame, vlan_tci)
+            if header is not None:
+                stream_id = self.stream_table.lookup(frame, header)
+                if stream_id is not None:
+                    self.recovery_table.tagless(self.streams.row(stream_id))
+                    if self.recorder is not None:
+                        self.recorder.record_tagless(
+                            timestamp_ns if timestamp_ns is not None else time.monotonic_ns(),
+                            member, stream_id, header.vlan, header.pcp, len(frame))
+            return None
+        
+        self.rtag_packets += 1
+        
+        stream_id = self.stream_table.identify(frame, header)
+        if stream_id is None:
+            # Not a configured stream: not subject to elimination
+            return None
+        
+        sequence = header.sequence
+        
+        # Capture timestamps drive RecoveryTimeout and idle eviction when
+        # the backend has them
+        clock_ns = time.monotonic_ns()
+        arrival_ns = timestamp_ns if timestamp_ns is not None else clock_ns
+        now = arrival_ns / 1e9
+        
+        # FRER duplicate detection per identified stream
+        row = self.streams.row(stream_id, now)
+        counters = self.recovery_table.counters
+        rogue_index = row * len(COUNTER_NAMES) + ROGUE
+        rogue_count = counters[rogue_index]
+        passed = self.recovery_table.accept(row, sequence, now)
+        # A rogue sequence number is outside the recovery window: feeding
+        # it to the copy/arrival rings would retire everything up to it
+        rogue = counters[rogue_index] != rogue_count
+        if passed:
+            self.unique_count += 1
+        else:
+            self.duplicate_count += 1
+        
+        if timestamp_ns is not None:
+            probe = decode_probe(frame, header)
+            if probe is not None:
+                latency = timestamp_ns - probe[2]
+                path = self.path_latency.get(probe[1])
+                if path is None:
+                    path = self.path_latency[probe[1]] = LogHistogram()
+                path.record(latency)
+                if passed:
+                    self.latency.record(latency)
+        
+        if not rogue:
+            self.copies.add(row, sequence)
+        
+        if member is not None:
+            self.member_frames[member] += 1
+            if not rogue:
+                self.arrivals.add(row, sequence, member, arrival_ns)
+        if self._last_arrival_ns is not None:
+            self.inter_arrival.record(arrival_ns - self._last_arrival_ns)
+        self._last_arrival_ns = arrival_ns
+        
+        if self.event_log is not None:
+            self.event_log.log(self.packet_count, stream_id, sequence, passed)
+        if self.recorder is not None:
+            self.recorder.record(arrival_ns, member, stream_id, sequence, header.vlan,
+                                 header.pcp, len(frame), passed)
+        
+        if self.verbose and clock_ns >= self._next_report_ns:
+            self.report()
+        return passed
+    
+    def tick(self):
+        """Fire the periodic report if it is due (for idle capture loops)"""
+        if self.verbose and time.monotonic_ns() >= self._next_report_ns:
+            self.report()
+    
+    def report(self):
+        """Print a short interval report from the running aggregates"""
+        if self.event_log is not None:
+            self.event_log.flush()
+        now = time.monotonic()
+        elapsed = now - self._interval_start
+        frames = self.rtag_packets - self._interval_frames
+        rate = frames / elapsed if elapsed > 0 else 0.0
+        totals = self.stream_totals()
+        print(f"📊 [{time.time() - self.start_time:7.1f}s] {rate:,.0f} R-TAG frames/s | "
+              f"passed {totals[PASSED]} | discarded {totals[DISCARDED]} | "
+              f"lost {totals[LOST]} | out-of-order {totals[OUT_OF_ORDER]} | "
+              f"rogue {totals[ROGUE]} | streams {len(self.streams)}")
+        print(f"   Inter-arrival: {self.inter_arrival.summary(1000, 'µs')}")
+        self._interval_start = now
+        self._interval_frames = self.rtag_packets
+        self._next_report_ns = time.monotonic_ns() + int(self.report_interval * 1e9)
+    
+    def finish(self):
+        """Close out the copy and arrival counters, flush the event log and
+        close the recorder"""
+        for _, row in self.streams.items():
+            self.copies.finish(row)
+            if self.arrivals is not None:
+                self.arrivals.finish(row)
+        if self.event_log is not None:
+            self.event_log.flush()
+        if self.recorder is not None:
+            self.recorder.close(self.stream_table.keys)
+    
+    def _evict(self, stream_id, row):
+        """Fold an idle stream's state into the totals before its row is reused"""
+        self.copies.finish(row)
+        if self.arrivals is not None:
+            self.arrivals.finish(row)
+        for index, value in enumerate(self.recovery_table.row_counters(row)):
+            self.evicted_counters[index] += value
+        if self.recorder is not None and stream_id in self.stream_table.keys:
+            # Recorded handles stay resolvable after the stream is forgotten
+            self.recorder.stream_keys[stream_id] = self.stream_table.keys[stream_id]
+        self.stream_table.forget(stream_id)
+    
+    def stream_counters(self, stream_id):
+        """Sequence recovery counters of a stream, None if it has no state"""
+        if stream_id not in self.streams:
+            return None
+        return self.recovery_table.row_counters(self.streams.rows[stream_id])
+    
+    def stream_totals(self):
+        """Recovery counters summed over all streams, evicted ones included"""
+        totals = list(self.evicted_counters)
+        for _, row in self.streams.items():
+            for index, value in enumerate(self.recovery_table.row_counters(row)):
+                totals[index] += value
+        return totals
     
     def has_rtag(self, packet):
         """Check if packet contains R-TAG"""
-        try:
-            # Look for R-TAG EtherType in packet
-            packet_bytes = bytes(packet)
-            # Search for 0xF1C1 pattern
-            for i in range(len(packet_bytes) - 1):
-                if packet_bytes[i:i+2] == b'\xf1\xc1':
-                    return True
-            return False
-        except:
-            return False
+        if not isinstance(packet, (bytes, bytearray, memoryview)):
+            packet = bytes(packet)
+        return decode_rtag(packet) is not None
     
     def extract_sequence(self, packet):
         """Extract sequence number from R-TAG"""
-        try:
-            packet_bytes = bytes(packet)
-            # Find R-TAG EtherType position
-            for i in range(len(packet_bytes) - 5):
-                if packet_bytes[i:i+2] == b'\xf1\xc1':
-                    # R-TAG structure: EtherType(2) + Reserved(2) + Sequence(2)
-                    if i + 6 <= len(packet_bytes):
-                        reserved = struct.unpack('!H', packet_bytes[i+2:i+4])[0]
-                        sequence = struct.unpack('!H', packet_bytes[i+4:i+6])[0]
-                        if reserved == 0x0000:  # Validate reserved field
-                            return sequence
-            return None
-        except:
-            return None
+        if not isinstance(packet, (bytes, bytearray, memoryview)):
+            packet = bytes(packet)
+        header = decode_rtag(packet)
+        return header.sequence if header is not None else None
     
     def print_statistics(self):
         """Print current FRER statistics"""
@@ -108,127 +276,512 @@ class FRERAnalyzer:
             elimination_rate = (self.duplicate_count / self.rtag_packets) * 100
             print(f"Elimination rate: {elimination_rate:.1f}%")
         
-        print("\nSequence number distribution:")
-        for seq in sorted(self.sequence_stats.keys()):
-            count = self.sequence_stats[seq]
-            status = "✓ Expected" if count == 2 else f"⚠ Unexpected ({count})"
-            print(f"  Seq {seq:2d}: {count:2d} packets | {status}")
+        print(f"Streams identified: {len(self.stream_table)}")
+        if self.streams.evicted:
+            print(f"Streams evicted (idle or over the cap): {self.streams.evicted}")
+        print(f"Stream state: {len(self.streams)} active streams, "
+              f"{self.streams.memory_bytes() / 1024:,.0f} KiB allocated "
+              f"(cap {self.streams.capacity} streams)")
+        
+        print("\nSequence recovery counters (IEEE 802.1CB):")
+        print(f"  {'Stream':>6} {'Passed':>9} {'Discarded':>9} {'OutOfOrd':>8} "
+              f"{'Rogue':>6} {'Lost':>6} {'Tagless':>7} {'Resets':>6} {'Latent':>6}")
+        rows = [(stream_id, self.recovery_table.row_counters(row))
+                for stream_id, row in sorted(self.streams.items())]
+        if self.streams.evicted:
+            rows.append(("evict", self.evicted_counters))
+        for stream_id, c in rows:
+            flag = " ⚠" if c[LATENT_ERRORS] or c[LOST] or c[ROGUE] else ""
+            print(f"  {stream_id:>6} {c[PASSED]:>9} {c[DISCARDED]:>9} "
+                  f"{c[OUT_OF_ORDER]:>8} {c[ROGUE]:>6} {c[LOST]:>6} "
+                  f"{c[TAGLESS]:>7} {c[RESETS]:>6} {c[LATENT_ERRORS]:>6}{flag}")
+        
+        print(f"\nInter-arrival time: {self.inter_arrival.summary(1000, 'µs')}")
+        print("Copies received per sequence number:")
+        for copies, count in self.copy_histogram.distribution():
+            print(f"  {copies:3d} copies: {count} sequences")
+        
+        if self.path_latency:
+            print("\nOne-way latency (RX timestamp - embedded TX time):")
+            for path_id in sorted(self.path_latency):
+                print(f"  Path {path_id}: {self.path_latency[path_id].summary(1000, 'µs')}")
+            print(f"  After elimination: {self.latency.summary(1000, 'µs')}")
+            worst = max(path.percentile(99.9) for path in self.path_latency.values())
+            eliminated = self.latency.percentile(99.9)
+            print(f"  p99.9 worst path {worst / 1000:,.1f}µs -> "
+                  f"{eliminated / 1000:,.1f}µs after elimination")
+        
+        if self.members:
+            print("\nMember streams (first copy = win, skew behind the first copy):")
+            print(f"  {'Interface':<12} {'Frames':>9} {'Wins':>7} {'Losses':>7} "
+                  f"{'Skew p50':>10} {'p99':>10} {'max':>10}")
+            wins = sum(self.member_wins) or 1
+            for index, interface in enumerate(self.members):
+                skew = self.member_skew[index]
+                print(f"  {interface:<12} {self.member_frames[index]:>9} "
+                      f"{self.member_wins[index] / wins * 100:>6.1f}% "
+                      f"{self.member_losses[index]:>7} "
+                      + " ".join(f"{value / 1000:>8,.1f}µs" for value in
+                                 (skew.percentile(50), skew.percentile(99), skew.max or 0)))
+        
+        if self.recorder is not None and self.recorder.closed:
+            print(f"\n💾 {self.recorder.summary()}")
         
         print("="*60 + "\n")
+    
+    def snapshot(self):
+        """Picklable counters and per-stream results for merging"""
+        self.finish()
+        return {
+            'packet_count': self.packet_count,
+            'rtag_packets': self.rtag_packets,
+            'unique_count': self.unique_count,
+            'duplicate_count': self.duplicate_count,
+            'stream_keys': dict(self.stream_table.keys),
+            'stream_counters': {stream_id: list(self.recovery_table.row_counters(row))
+                                for stream_id, row in self.streams.items()},
+            'evicted_counters': list(self.evicted_counters),
+            'evicted_streams': self.streams.evicted,
+            'inter_arrival': self.inter_arrival,
+            'copy_histogram': self.copy_histogram,
+            'path_latency': self.path_latency,
+            'latency': self.latency,
+            'members': self.members,
+            'member_frames': self.member_frames,
+            'member_wins': self.member_wins,
+            'member_losses': self.member_losses,
+            'member_skew': self.member_skew,
+        }
+    
+    def merge(self, snapshot):
+        """Add another analyzer's snapshot; streams are matched by key"""
+        self.packet_count += snapshot['packet_count']
+        self.rtag_packets += snapshot['rtag_packets']
+        self.unique_count += snapshot['unique_count']
+        self.duplicate_count += snapshot['duplicate_count']
+        self.inter_arrival.merge(snapshot['inter_arrival'])
+        self.copy_histogram.merge(snapshot['copy_histogram'])
+        self.latency.merge(snapshot['latency'])
+        for path_id, histogram in snapshot['path_latency'].items():
+            self.path_latency.setdefault(path_id, LogHistogram()).merge(histogram)
+        for index, interface in enumerate(snapshot.get('members', ())):
+            if interface not in self.members:
+                self.members.append(interface)
+                for counts in (self.member_frames, self.member_wins, self.member_losses):
+                    counts.append(0)
+                self.member_skew.append(LogHistogram())
+            mine = self.members.index(interface)
+            self.member_frames[mine] += snapshot['member_frames'][index]
+            self.member_wins[mine] += snapshot['member_wins'][index]
+            self.member_losses[mine] += snapshot['member_losses'][index]
+            self.member_skew[mine].merge(snapshot['member_skew'][index])
+        
+        for index, value in enumerate(snapshot['evicted_counters']):
+            self.evicted_counters[index] += value
+        self.streams.evicted += snapshot['evicted_streams']
+        
+        # Stream handles are local to each analyzer
+        for handle, counters in snapshot['stream_counters'].items():
+            key = snapshot['stream_keys'][handle]
+            row = self.streams.row(self.stream_table.handle_for_key(key))
+            self.recovery_table.add_counters(row, counters)
+
+def open_recorder(directory, members=()):
+    """Columnar frame recorder for --record; NumPy is only needed then"""
+    if directory is None:
+        return None
+    from frer_recorder import CaptureRecorder
+    print(f"Recording every frame to {directory}/ (columnar .npy chunks)")
+    return CaptureRecorder(directory, members)
 
-def run_realtime_analysis():
+def run_realtime_analysis(interface="enp2s0", backend="ring", sample_every=1, record=None):
     """Run real-time FRER analysis"""
     
     print("=" * 70)
     print("🔬 REAL-TIME FRER ANALYSIS")
     print("=" * 70)
-    print("Monitoring interface: enp2s0")
-    print("Filter: VLAN 100 packets")
-    print("Press Ctrl+C to stop and see final statistics")
-    print("")
-    print("Legend:")
-    print("  ORIGINAL  = First time seeing this sequence (ACCEPTED)")
-    print("  DUPLICATE = Already seen this sequence (ELIMINATED)")
+    print(f"Monitoring interface: {interface}")
+    if backend == "ring":
+        print("Capture: TPACKET_V3 ring, in-kernel BPF filter (R-TAG frames only)")
+    elif backend == "tstamp":
+        print("Capture: recvmsg() with SO_TIMESTAMPING RX timestamps, in-kernel BPF filter")
+    else:
+        print("Filter: VLAN 100 packets")
+    print(f"Reports every {DEFAULT_REPORT_INTERVAL:.0f}s; press Ctrl+C to stop and see final statistics")
     print("")
     
-    analyzer = FRERAnalyzer()
+    event_log = None
+    if sample_every:
+        print(f"Event log: every {sample_every} frame(s)" if sample_every > 1 else "Event log: every frame")
+        print("Legend:")
+        print("  ORIGINAL  = First time seeing this sequence (ACCEPTED)")
+        print("  DUPLICATE = Already seen this sequence (ELIMINATED)")
+        print("")
+        # Raw socket paths write events in batches; scapy delivers one at a time
+        event_log = EventLog(format_event, sample_every,
+                             buffer_size=1 if backend == "sniff" else 256)
+    
+    analyzer = FRERAnalyzer(event_log=event_log, recorder=open_recorder(record))
     
     def packet_handler(packet):
         analyzer.analyze_packet(packet)
     
     try:
-        # Capture on enp2s0 with VLAN 100 filter
-        sniff(iface="enp2s0", 
-              filter="vlan 100",
-              prn=packet_handler,
-              store=False)
+        # Keep the latency probe at the start of the payload
+        program = compile_rtag_filter(payload_bytes=PROBE_LEN)
+        if backend == "ring":
+            # Frames are analyzed in place, one retired block at a time
+            with TPacketV3Ring(interface, filter_program=program) as ring:
+                ring.capture(analyzer.analyze_frame, tick=analyzer.tick)
+        elif backend == "tstamp":
+            with TimestampingSocket(interface, filter_program=program) as sock:
+                sock.capture(analyzer.analyze_frame, tick=analyzer.tick)
+        else:
+            # Scapy dissection is optional and costs seconds to import
+            try:
+                from scapy.all import sniff
+            except ImportError:
+                print("❌ scapy is not installed: pip install scapy, or use the ring backend")
+                return
+            # Capture with VLAN 100 filter
+            sniff(iface=interface, 
+                  filter="vlan 100",
+                  prn=packet_handler,
+                  store=False)
               
     except KeyboardInterrupt:
         print("\n🛑 Analysis stopped by user")
+        print_summary(analyzer)
+
+def run_multi_analysis(interfaces, sample_every=1, record=None):
+    """Run FRER analysis over member streams captured on several interfaces"""
+    
+    print("=" * 70)
+    print("🔬 MULTI-INTERFACE FRER ANALYSIS")
+    print("=" * 70)
+    print(f"Member streams: {', '.join(interfaces)}")
+    print("Capture: one TPACKET_V3 ring per interface, merged by RX timestamp in one loop")
+    print(f"Reports every {DEFAULT_REPORT_INTERVAL:.0f}s; press Ctrl+C to stop and see final statistics")
+    print("")
+    
+    event_log = None
+    if sample_every:
+        event_log = EventLog(format_event, sample_every)
+    analyzer = FRERAnalyzer(event_log=event_log, members=interfaces,
+                            member_streams=len(interfaces),
+                            recorder=open_recorder(record, interfaces))
+    
+    try:
+        program = compile_rtag_filter(payload_bytes=PROBE_LEN)
+        with MultiInterfaceCapture(interfaces, filter_program=program) as capture:
+            capture.capture(analyzer.analyze_frame, tick=analyzer.tick)
+    except KeyboardInterrupt:
+        print("\n🛑 Analysis stopped by user")
+        print_summary(analyzer)
+
+def run_relay(ingress, egress, strip=False, sample_every=0, record=None,
+              passthrough=False):
+    """Eliminate duplicates from the ingress member streams and forward to egress"""
+    from frer_relay import FRERRelay
+    
+    print("=" * 70)
+    print("🔀 SOFTWARE FRER RELAY")
+    print("=" * 70)
+    print(f"Member streams: {', '.join(ingress)} -> {egress}")
+    print("R-TAG: " + ("stripped, EtherType restored from Next Protocol" if strip
+                       else "kept"))
+    print("Unidentified streams: " + ("forwarded" if passthrough else "dropped"))
+    print("Press Ctrl+C to stop and see final statistics")
+    print("")
+    
+    event_log = EventLog(format_event, sample_every) if sample_every else None
+    analyzer = FRERAnalyzer(event_log=event_log, members=ingress,
+                            member_streams=len(ingress),
+                            recorder=open_recorder(record, ingress))
+    with FRERRelay(ingress, egress, analyzer, strip=strip,
+                   passthrough=passthrough) as relay:
+        try:
+            relay.run()
+        except KeyboardInterrupt:
+            print("\n🛑 Relay stopped by user")
+        relay.print_statistics()
+    print_summary(analyzer)
+
+def run_fanout_analysis(interface="enp2s0", workers=None, mode="stream"):
+    """Run FRER analysis on several cores through a PACKET_FANOUT group"""
+    from frer_fanout import FanoutCapture
+    
+    capture = FanoutCapture(interface, workers,
+                            analyzer_factory=lambda: FRERAnalyzer(verbose=False),
+                            mode=mode)
+    
+    print("=" * 70)
+    print("🔬 MULTI-CORE FRER ANALYSIS")
+    print("=" * 70)
+    print(f"Monitoring interface: {interface}")
+    print(f"Workers: {capture.workers} (PACKET_FANOUT group {capture.group_id}, {mode} key)")
+    print("Press Ctrl+C to stop and see final statistics")
+    print("")
+    
+    try:
+        results = capture.run()
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return
+    print("\n🛑 Analysis stopped by user")
+    for failure in capture.failed:
+        print(f"⚠ {failure}: its frames are missing from the totals")
+    
+    merged = FRERAnalyzer(verbose=False)
+    merged.start_time = capture.start_time
+    owners = defaultdict(set)  # stream key -> workers that saw it
+    
+    print("\n👷 Per-worker results:")
+    for result in results:
+        snapshot = result['analyzer']
+        merged.merge(snapshot)
+        for key in snapshot['stream_keys'].values():
+            owners[key].add(result['worker'])
+        cpu = result['cpu'] if result['cpu'] is not None else "-"
+        rate = result['frames'] / result['cpu_time'] if result['cpu_time'] > 0 else 0.0
+        print(f"  Worker {result['worker']} (CPU {cpu}): {result['frames']} frames, "
+              f"{len(snapshot['stream_keys'])} streams, {result['drops']} drops, "
+              f"{rate:,.0f} frames/CPU-s")
+    
+    split = sum(1 for workers_seen in owners.values() if len(workers_seen) > 1)
+    if split:
+        print(f"⚠ {split} streams were split across workers (elimination is not exact)")
+    
+    print_summary(merged)
+
+def print_summary(analyzer):
+    """Print final statistics and the FRER test verdict"""
+    analyzer.finish()
+    analyzer.print_statistics()
+    
+    # Generate summary report
+    paths = analyzer.member_streams
+    totals = analyzer.stream_totals()
+    missing = totals[PASSED] * (paths - 1) - totals[DISCARDED] if paths else 0
+    print("\n📊 FRER TEST SUMMARY:")
+    print(f"Expected behavior: Each sequence should arrive on all {paths} member streams")
+    print(f"FRER effectiveness: {analyzer.unique_count} unique sequences identified")
+    print(f"Lost: {totals[LOST]} | Rogue: {totals[ROGUE]} | Out-of-order: {totals[OUT_OF_ORDER]} | "
+          f"Missing copies: {missing} | Latent errors: {totals[LATENT_ERRORS]}")
+    
+    # Check for perfect FRER behavior
+    perfect_frer = (totals[LOST] == 0 and totals[ROGUE] == 0 and missing == 0
+                    and totals[LATENT_ERRORS] == 0)
+    
+    if perfect_frer and analyzer.duplicate_count > 0:
+        print("✅ Perfect FRER behavior detected!")
+        print("   - All duplicates correctly identified")
+        print(f"   - Exactly {paths} copies of each sequence")
+    else:
+        print("⚠ Non-standard behavior detected")
+
+def run_offline_analysis(path, batch=False, record=None):
+    """Run FRER analysis over a pcap/pcapng capture file"""
+    
+    print("=" * 70)
+    print("📂 OFFLINE FRER ANALYSIS")
+    print("=" * 70)
+    print(f"Capture file: {path}")
+    print(f"Mode: {'vectorized batch (NumPy)' if batch else 'per-frame elimination'}")
+    print("")
+    
+    if batch:
+        # NumPy is only needed for bulk post-processing
+        from frer_batch import BatchAnalyzer
+        if record:
+            print("⚠ --record needs per-frame elimination; ignored with --batch")
+        analyzer = BatchAnalyzer()
+        start = time.perf_counter()
+        with PcapReader(path) as reader:
+            frames = reader.replay(analyzer.add)
         analyzer.print_statistics()
-        
-        # Generate summary report
-        print("\n📊 FRER TEST SUMMARY:")
-        print(f"Expected behavior: Each sequence should appear exactly 2 times")
-        print(f"FRER effectiveness: {len(analyzer.stream_sequences[1])} unique sequences identified")
-        
-        # Check for perfect FRER behavior
-        perfect_frer = True
-        for seq, count in analyzer.sequence_stats.items():
-            if count != 2:
-                perfect_frer = False
-                break
-        
-        if perfect_frer and analyzer.duplicate_count > 0:
-            print("✅ Perfect FRER behavior detected!")
-            print("   - All duplicates correctly identified")
-            print("   - Exactly 2 copies of each sequence")
-        else:
-            print("⚠ Non-standard behavior detected")
+        elapsed = time.perf_counter() - start
+        rate = frames / elapsed if elapsed > 0 else 0.0
+        print(f"Read {frames} frames ({reader.format}) in {elapsed:.2f}s: {rate:,.0f} frames/s")
+        return
+    
+    analyzer = FRERAnalyzer(verbose=False, recorder=open_recorder(record))
+    
+    start = time.perf_counter()
+    with PcapReader(path) as reader:
+        frames = reader.replay(analyzer.analyze_frame)
+    elapsed = time.perf_counter() - start
+    
+    rate = frames / elapsed if elapsed > 0 else 0.0
+    print(f"Read {frames} frames ({reader.format}) in {elapsed:.2f}s: {rate:,.0f} frames/s")
+    print_summary(analyzer)
 
-def send_test_sequence():
+def send_test_sequence(interface="enp2s0", line_rate=False):
     """Send a fresh test sequence for analysis"""
     
     print("🚀 Sending fresh test sequence for real-time analysis...")
     
-    # Import the working function from our previous script
-    import socket
+    # Template built once; only the sequence number is patched per frame
+    try:
+        src_mac = interface_mac(interface)
+    except:
+        src_mac = bytes.fromhex('6805cabd96e7')
     
-    def create_proper_rtag_frame(seq_num, next_protocol=0x0800):
-        """Create R-TAG frame that works with Wireshark"""
-        
-        dst_mac = bytes.fromhex('ffffffffffff')
-        try:
-            src_mac_str = get_if_hwaddr("enp2s0").replace(':', '')
-            src_mac = bytes.fromhex(src_mac_str)
-        except:
-            src_mac = bytes.fromhex('68050cabd96e7')
-        
-        vlan_tci = (3 << 13) | 100
-        vlan_tag = struct.pack('!HH', 0x8100, vlan_tci)
-        
-        rtag_header = struct.pack('!HHHH', 0xF1C1, 0x0000, seq_num, next_protocol)
-        
-        payload_text = f"Analysis Test #{seq_num}"
-        
-        ip_header = struct.pack('!BBHHHBBH4s4s',
-            0x45, 0x00, 20 + 8 + len(payload_text), seq_num, 0x4000, 64, 17, 0,
-            socket.inet_aton("192.168.100.1"), socket.inet_aton("192.168.100.2"))
-        
-        udp_header = struct.pack('!HHHH', 12345, 54321, 8 + len(payload_text), 0)
-        
-        frame = (dst_mac + src_mac + vlan_tag + rtag_header + 
-                 ip_header + udp_header + payload_text.encode())
-        
-        return frame
+    # Payload starts with a latency probe (stream 1, path ID, TX time)
+    template = FrameTemplate(src_mac, vlan_id=100, priority=3,
+                             payload=b"Analysis Test", probe_stream=1)
     
     try:
-        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW)
-        sock.bind(("enp2s0", 0))
+        tx = BatchTransmitter(interface, line_rate=line_rate)
         
         print("Sending 3 sequences with duplicates...")
         for i in range(3):
             seq_num = i + 10  # Use different sequence numbers
-            frame = create_proper_rtag_frame(seq_num)
+            frame = template.build(seq_num)
             
             print(f"📤 Sending sequence {seq_num}...")
             
-            # Send original
-            sock.send(frame)
-            time.sleep(0.01)
+            # Send original (path 0)
+            tx.send(frame, gap=0.01)
             
-            # Send duplicate
-            sock.send(frame)
-            time.sleep(0.5)
+            # Send duplicate (path 1, same TX time as the original)
+            frame = template.build(seq_num, path_id=1, tx_ns=template.tx_ns)
+            tx.send(frame, gap=0.5)
             
-        sock.close()
+        tx.close()
+        print(f"📈 {tx.report().summary()}")
         print("✅ Test sequence sent!")
         
     except Exception as e:
         print(f"❌ Error sending test: {e}")
 
+def send_replicated_load(interfaces, streams=8, count=100000, pps=None, burst=1):
+    """Replicate count frames of each of streams streams onto every interface
+
+    With pps the frames are paced at pps frames/s in total (in bursts of
+    burst frames); otherwise they are sent as fast as possible.
+    """
+    
+    print(f"🚀 Replicating {streams} streams × {count} frames onto {', '.join(interfaces)}...")
+    if pps:
+        print(f"Pacing: {pps:,.0f} frames/s" + (f" in bursts of {burst}" if burst > 1 else ""))
+    
+    try:
+        src_mac = interface_mac(interfaces[0])
+    except:
+        src_mac = bytes.fromhex('6805cabd96e7')
+    
+    # Streams differ in UDP source port, as in the comprehensive test
+    templates = [FrameTemplate(src_mac, vlan_id=100, priority=3,
+                               src_port=12345 + stream, payload=b"Replicated Load",
+                               probe_stream=stream + 1)
+                 for stream in range(streams)]
+    
+    try:
+        with Replicator(interfaces) as replicator:
+            if pps:
+                # Round-robin over the streams on absolute deadlines
+                def send(index):
+                    stream = index % streams
+                    replicator.queue(stream + 1, templates[stream])
+                schedule = bursts(burst, pps) if burst > 1 else constant_rate(pps)
+                report = Pacer().run(schedule, send, replicator.flush,
+                                     count=streams * count)
+                print(f"⏱  {report.summary()}")
+            else:
+                # Round-robin over the streams, one batch per member per 32 frames
+                for _ in range(count):
+                    for stream, template in enumerate(templates):
+                        replicator.queue(stream + 1, template)
+                replicator.flush()
+        print(f"📈 {replicator.report().summary()} per interface")
+        print(f"✅ {replicator.frames * len(interfaces)} frames sent")
+    except Exception as e:
+        print(f"❌ Error sending load: {e}")
+
 if __name__ == "__main__":
-    if len(sys.argv) > 1 and sys.argv[1] == "send":
-        send_test_sequence()
+    # Usage: frer_analysis_tool.py [send|ring] [interface] [--line-rate]
+    #        frer_analysis_tool.py [ring|tstamp|sniff] [interface] [--sample N | --quiet]
+    #        frer_analysis_tool.py fanout [interface] [--workers N] [--hash]
+    #        frer_analysis_tool.py file <capture.pcap[ng]> [--batch]
+    #        (ring, tstamp, sniff, multi, relay, file: [--record <directory>])
+    #        frer_analysis_tool.py relay <in1,in2> <out> [--strip] [--passthrough]
+    #                                [--sample N]
+    #        frer_analysis_tool.py replicate <if1,if2> [--streams N] [--count N]
+    #                                [--pps N [--burst N]]
+    line_rate = "--line-rate" in sys.argv
+    if line_rate:
+        sys.argv.remove("--line-rate")
+    batch = "--batch" in sys.argv
+    if batch:
+        sys.argv.remove("--batch")
+    workers = None
+    if "--workers" in sys.argv:
+        position = sys.argv.index("--workers")
+        workers = int(sys.argv[position + 1])
+        del sys.argv[position:position + 2]
+    sample_every = None  # every frame, or none when relaying
+    if "--sample" in sys.argv:
+        position = sys.argv.index("--sample")
+        sample_every = int(sys.argv[position + 1])
+        del sys.argv[position:position + 2]
+    if "--quiet" in sys.argv:
+        sys.argv.remove("--quiet")
+        sample_every = 0
+    fanout_mode = "stream"
+    if "--hash" in sys.argv:
+        sys.argv.remove("--hash")
+        fanout_mode = "hash"
+    streams = 8
+    if "--streams" in sys.argv:
+        position = sys.argv.index("--streams")
+        streams = int(sys.argv[position + 1])
+        del sys.argv[position:position + 2]
+    count = 100000
+    if "--count" in sys.argv:
+        position = sys.argv.index("--count")
+        count = int(sys.argv[position + 1])
+        del sys.argv[position:position + 2]
+    pps = None
+    if "--pps" in sys.argv:
+        position = sys.argv.index("--pps")
+        pps = float(sys.argv[position + 1])
+        del sys.argv[position:position + 2]
+    burst = 1
+    if "--burst" in sys.argv:
+        position = sys.argv.index("--burst")
+        burst = int(sys.argv[position + 1])
+        del sys.argv[position:position + 2]
+    record = None
+    if "--record" in sys.argv:
+        position = sys.argv.index("--record")
+        record = sys.argv[position + 1]
+        del sys.argv[position:position + 2]
+    strip = "--strip" in sys.argv
+    if strip:
+        sys.argv.remove("--strip")
+    passthrough = "--passthrough" in sys.argv
+    if passthrough:
+        sys.argv.remove("--passthrough")
+    mode = sys.argv[1] if len(sys.argv) > 1 else "ring"
+    interface = sys.argv[2] if len(sys.argv) > 2 else "enp2s0"
+    if sample_every is None:
+        sample_every = 0 if mode == "relay" else 1
+    if mode == "send":
+        send_test_sequence(interface, line_rate)
+    elif mode == "replicate":
+        send_replicated_load(interface.split(","), streams, count, pps, burst)
+    elif mode == "file":
+        run_offline_analysis(sys.argv[2], batch, record)
+    elif mode in ("ring", "tstamp", "sniff"):
+        run_realtime_analysis(interface, backend=mode, sample_every=sample_every,
+                              record=record)
+    elif mode == "multi":
+        run_multi_analysis(interface.split(","), sample_every, record)
+    elif mode == "relay":
+        run_relay(interface.split(","), sys.argv[3], strip, sample_every, record,
+                  passthrough)
+    elif mode == "fanout":
+        run_fanout_analysis(interface, workers, fanout_mode)
     else:
-        run_realtime_analysis()
\ No newline at end of file
+        run_realtime_analysis(interface, sample_every=sample_every, record=record)
\ No newline at end of file
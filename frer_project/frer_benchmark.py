@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+FRER Benchmark - Synthetic captures replayed through every analyzer backend
+Measures frames/s, ns/frame and peak memory without any network hardware
+"""
+
+import sys
+import os
+import heapq
+import json
+import multiprocessing
+import queue
+import platform
+import random
+import resource
+import subprocess
+import tempfile
+import time
+
+from rtag_decoder import decode_rtag
+from frer_frame import FrameTemplate
+from frer_pcap import PcapReader, PcapWriter
+
+BENCH_SRC_MAC = b'\x02\x00\x00\x00\x00\x01'
+FIRST_SRC_PORT = 20000
+CAPTURE_START_NS = 1700000000 * 1000000000  # fixed, so captures are byte-identical
+DEFAULT_BACKENDS = ("decode", "frame", "batch", "scapy")
+DEFAULT_OUTPUT = "frer_benchmark.json"
+# A backend this much slower per frame than in the baseline is a regression
+DEFAULT_THRESHOLD = 0.10
+RESULT_POLL = 0.5      # seconds between checks for a backend process that died
+# Scripts started by the hundreds from test harnesses: import time budget
+STARTUP_MODULES = ("frer_analysis_tool", "frer_wireshark_official",
+                   "comprehensive_rtag_test")
+STARTUP_BUDGET_MS = 100
+STARTUP_RUNS = 5
+
+
+class CaptureSpec:
+    """Parameters of a synthetic FRER capture
+
+    sequences frame numbers are spread round-robin over streams; each one
+    is sent on members paths. The first copy is always sent and every
+    other copy with probability duplicates; any copy is then lost with
+    probability loss, and held back behind 1..reorder_depth later frames
+    with probability reorder. Stream i has frames of sizes[i % len(sizes)]
+    bytes (without FCS). Frames are rate apart on the capture clock.
+    """
+
+    def __init__(self, sequences=100000, streams=8, members=2, duplicates=1.0,
+                 loss=0.0, reorder=0.0, reorder_depth=8, sizes=(128,),
+                 rate=1000000, seed=1):
+        self.sequences = sequences
+        self.streams = streams
+        self.members = members
+        self.duplicates = duplicates
+        self.loss = loss
+        self.reorder = reorder
+        self.reorder_depth = reorder_depth
+        self.sizes = tuple(sizes)
+        self.rate = rate
+        self.seed = seed
+
+    def as_dict(self):
+        return dict(vars(self), sizes=list(self.sizes))
+
+
+def stream_template(spec, stream):
+    """Frame template of one synthetic stream, sized from the spec"""
+    template = FrameTemplate(BENCH_SRC_MAC, src_port=FIRST_SRC_PORT + stream,
+                             probe_stream=stream + 1)
+    size = spec.sizes[stream % len(spec.sizes)]
+    template.set_payload(b"X" * max(size - len(template), 0))
+    return template
+
+
+def generate_capture(path, spec):
+    """Write the capture described by spec; returns its ground truth
+
+    The same spec and seed always give the same file. The ground truth
+    counts what a correct eliminator must report: unique sequences that
+    reached the capture, extra copies, and sequences with no copy left.
+    """
+    rng = random.Random(spec.seed)
+    templates = [stream_template(spec, stream) for stream in range(spec.streams)]
+    interval = 1e9 / spec.rate
+    pending = []    # (release position, position, frame)
+    position = 0
+    truth = {'frames': 0, 'unique': 0, 'duplicates': 0, 'lost': 0, 'reordered': 0}
+
+    with PcapWriter(path) as writer:
+        def release(until):
+            while pending and pending[0][0] <= until:
+                _, _, frame = heapq.heappop(pending)
+                writer.write(frame, CAPTURE_START_NS + round(writer.frames * interval))
+
+        for index in range(spec.sequences):
+            stream = index % spec.streams
+            sequence = (index // spec.streams) & 0xFFFF
+            template = templates[stream]
+            tx_ns = CAPTURE_START_NS + round(position * interval)
+            copies = 0
+            for path_id in range(spec.members):
+                if path_id and rng.random() >= spec.duplicates:
+                    continue
+                if rng.random() < spec.loss:
+                    continue
+                delay = 0
+                if rng.random() < spec.reorder:
+                    delay = rng.randint(1, spec.reorder_depth)
+                    truth['reordered'] += 1
+                frame = bytes(template.build(sequence, path_id=path_id, tx_ns=tx_ns))
+                heapq.heappush(pending, (position + delay, position, frame))
+                release(position)
+                position += 1
+                copies += 1
+            if copies:
+                truth['unique'] += 1
+                truth['duplicates'] += copies - 1
+            else:
+                truth['lost'] += 1
+        release(float('inf'))
+        truth['frames'] = writer.frames
+        truth['bytes'] = writer.bytes
+    return truth
+
+
+def _decode_backend():
+    """R-TAG parsing only: the cost every backend pays per frame"""
+    counts = {'rtag_frames': 0}
+
+    def handler(frame, vlan_tci, timestamp_ns):
+        if decode_rtag(frame, vlan_tci) is not None:
+            counts['rtag_frames'] += 1
+    return handler, lambda: counts
+
+
+def _frame_backend():
+    """Per-frame elimination, as used by the ring, multi and relay modes"""
+    from frer_analysis_tool import FRERAnalyzer
+    analyzer = FRERAnalyzer(verbose=False)
+
+    def result():
+        analyzer.finish()
+        return {'rtag_frames': analyzer.rtag_packets,
+                'unique': analyzer.unique_count,
+                'duplicates': analyzer.duplicate_count}
+    return analyzer.analyze_frame, result
+
+
+def _batch_backend():
+    """NumPy bulk analysis, as used by offline --batch"""
+    from frer_batch import BatchAnalyzer
+    analyzer = BatchAnalyzer()
+
+    def result():
+        stats = analyzer.statistics()
+        return {'rtag_frames': stats.rtag_frames, 'unique': stats.unique,
+                'duplicates': stats.duplicates}
+    return analyzer.add, result
+
+
+def _scapy_backend():
+    """Scapy dissection plus elimination, as in the default sniff mode"""
+    from scapy.all import Ether
+    from frer_analysis_tool import FRERAnalyzer
+    analyzer = FRERAnalyzer(verbose=False)
+
+    def handler(frame, vlan_tci, timestamp_ns):
+        packet = Ether(bytes(frame))
+        packet.time = timestamp_ns / 1e9
+        analyzer.analyze_packet(packet)
+
+    def result():
+        analyzer.finish()
+        return {'rtag_frames': analyzer.rtag_packets,
+                'unique': analyzer.unique_count,
+                'duplicates': analyzer.duplicate_count}
+    return handler, result
+
+
+BACKENDS = {
+    'decode': _decode_backend,
+    'frame': _frame_backend,
+    'batch': _batch_backend,
+    'scapy': _scapy_backend,
+}
+
+
+def _rss_kb():
+    """Current resident set size in KiB"""
+    with open('/proc/self/statm') as statm:
+        pages = int(statm.read().split()[1])
+    return pages * (os.sysconf('SC_PAGE_SIZE') // 1024)
+
+
+def _run_backend(name, path, results):
+    """Child process: one timed replay on a fresh interpreter state"""
+    try:
+        handler, result = BACKENDS[name]()
+    except ImportError as e:
+        results.put({'error': f"unavailable: {e}"})
+        return
+    start_rss = _rss_kb()
+    try:
+        with PcapReader(path) as reader:
+            start = time.perf_counter_ns()
+            frames = reader.replay(handler)
+            counts = result()
+            elapsed = time.perf_counter_ns() - start
+    except Exception as e:
+        results.put({'error': f"failed: {e!r}"})
+        return
+    # ru_maxrss includes the capture pages the reader touched
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put({'frames': frames, 'elapsed_ns': elapsed, 'peak_rss_kb': peak,
+                 'rss_growth_kb': max(peak - start_rss, 0), 'counts': counts})
+
+
+def run_backend(name, path):
+    """Replay path through one backend in a forked process; returns its result"""
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    process = context.Process(target=_run_backend, args=(name, path, results))
+    process.start()
+    result = None
+    while result is None:
+        try:
+            result = results.get(timeout=RESULT_POLL)
+        except queue.Empty:
+            if process.exitcode is None:
+                continue
+            # A result sent just before exiting is already in the pipe
+            try:
+                result = results.get(timeout=RESULT_POLL)
+            except queue.Empty:
+                result = {'error': f"failed: exited with code {process.exitcode}"}
+    process.join()
+    return result
+
+
+def measure_startup(modules=STARTUP_MODULES, runs=STARTUP_RUNS):
+    """Cold-start time of each tool: a fresh interpreter importing it, in ms
+
+    The fastest of runs is kept, so the result is the start-up cost
+    itself rather than scheduling noise.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    times = {}
+    for module in modules:
+        best = None
+        for _ in range(runs):
+            start = time.perf_counter_ns()
+            subprocess.run([sys.executable, '-c', f'import {module}'],
+                           cwd=directory, check=True)
+            elapsed = (time.perf_counter_ns() - start) / 1e6
+            best = elapsed if best is None else min(best, elapsed)
+        times[module] = best
+    return times
+
+
+def check_counts(counts, truth):
+    """Whether a backend's counters agree with the capture's ground truth"""
+    expected = {'rtag_frames': truth['frames'], 'unique': truth['unique'],
+                'duplicates': truth['duplicates']}
+    return all(counts[key] == expected[key] for key in counts)
+
+
+def benchmark(spec, backends=DEFAULT_BACKENDS, repeat=3, path=None):
+    """Generate spec's capture and time every backend on it
+
+    Each backend is run repeat times in its own process and the fastest
+    run is reported. Returns the results document.
+    """
+    unknown = [name for name in backends if name not in BACKENDS]
+    if unknown:
+        raise ValueError(f"Unknown backends: {', '.join(unknown)} "
+                         f"(choose from {', '.join(BACKENDS)})")
+    remove = path is None
+    if path is None:
+        handle, path = tempfile.mkstemp(suffix='.pcap', prefix='frer_bench_')
+        os.close(handle)
+    try:
+        start = time.perf_counter()
+        truth = generate_capture(path, spec)
+        generate_time = time.perf_counter() - start
+        print(f"Generated {truth['frames']} frames ({truth['bytes']} bytes) "
+              f"in {generate_time:.2f}s: {path}")
+
+        results = []
+        for name in backends:
+            runs = [run_backend(name, path) for _ in range(repeat)]
+            if 'error' in runs[0]:
+                print(f"⚠ {name}: {runs[0]['error']}")
+                results.append({'backend': name, 'error': runs[0]['error']})
+                continue
+            best = min(runs, key=lambda run: run['elapsed_ns'])
+            frames = best['frames']
+            elapsed = best['elapsed_ns']
+            result = {
+                'backend': name,
+                'frames': frames,
+                'runs_ns': [run['elapsed_ns'] for run in runs],
+                'seconds': elapsed / 1e9,
+                'frames_per_second': frames * 1e9 / elapsed if elapsed else 0.0,
+                'ns_per_frame': elapsed / frames if frames else 0.0,
+                'peak_rss_kb': max(run['peak_rss_kb'] for run in runs),
+                'rss_growth_kb': max(run['rss_growth_kb'] for run in runs),
+                'counts': best['counts'],
+                'correct': check_counts(best['counts'], truth),
+            }
+            results.append(result)
+            print(f"{'✅' if result['correct'] else '❌'} {name:8s} "
+                  f"{result['frames_per_second']:12,.0f} frames/s "
+                  f"{result['ns_per_frame']:9,.0f} ns/frame "
+                  f"peak RSS {result['peak_rss_kb'] / 1024:7.1f} MiB "
+                  f"(+{result['rss_growth_kb'] / 1024:.1f})")
+    finally:
+        if remove:
+            os.unlink(path)
+
+    startup = measure_startup()
+    for module, elapsed in startup.items():
+        print(f"{'✅' if elapsed < STARTUP_BUDGET_MS else '❌'} startup {module}: "
+              f"{elapsed:.1f} ms")
+
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'capture': {'spec': spec.as_dict(), 'truth': truth},
+        'results': results,
+        'startup_ms': startup,
+    }
+
+
+def git_commit():
+    """Short hash of the checked-out commit, or None outside a git tree"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              capture_output=True, text=True, timeout=5,
+                              cwd=os.path.dirname(os.path.abspath(__file__))
+                              ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(document, baseline, threshold=DEFAULT_THRESHOLD):
+    """Print ns/frame against a baseline document; returns the regressed backends"""
+    before = {result['backend']: result for result in baseline['results']
+              if 'error' not in result}
+    if baseline['capture']['spec'] != document['capture']['spec']:
+        print("⚠ Baseline was measured on a different capture")
+    regressions = []
+    print(f"\nAgainst baseline {baseline.get('commit') or '?'} ({baseline.get('timestamp', '?')}):")
+    for result in document['results']:
+        old = before.get(result['backend'])
+        if old is None or 'error' in result:
+            continue
+        change = result['ns_per_frame'] / old['ns_per_frame'] - 1
+        regressed = change > threshold
+        if regressed:
+            regressions.append(result['backend'])
+        print(f"{'❌' if regressed else '✅'} {result['backend']:8s} "
+              f"{old['ns_per_frame']:9,.0f} -> {result['ns_per_frame']:9,.0f} ns/frame "
+              f"({change:+.1%})")
+    return regressions
+
+
+def main():
+    # Usage: frer_benchmark.py [--sequences N] [--streams N] [--members N]
+    #            [--duplicates P] [--loss P] [--reorder P] [--sizes 64,512,1466]
+    #            [--seed N] [--backends decode,frame,batch,scapy] [--repeat N]
+    #            [--output results.json] [--baseline old.json] [--keep capture.pcap]
+    options = {}
+    args = sys.argv[1:]
+    while args:
+        name = args.pop(0)
+        if not name.startswith("--") or not args:
+            print(f"❌ Unexpected argument: {name}")
+            sys.exit(2)
+        options[name[2:]] = args.pop(0)
+
+    spec = CaptureSpec(
+        sequences=int(options.get("sequences", 100000)),
+        streams=int(options.get("streams", 8)),
+        members=int(options.get("members", 2)),
+        duplicates=float(options.get("duplicates", 1.0)),
+        loss=float(options.get("loss", 0.0)),
+        reorder=float(options.get("reorder", 0.0)),
+        sizes=[int(size) for size in options.get("sizes", "128").split(",")],
+        seed=int(options.get("seed", 1)))
+    backends = options.get("backends", ",".join(DEFAULT_BACKENDS)).split(",")
+    output = options.get("output", DEFAULT_OUTPUT)
+
+    print("=" * 60)
+    print("⏱  FRER ANALYZER BENCHMARK")
+    print("=" * 60)
+    try:
+        document = benchmark(spec, backends, int(options.get("repeat", 3)),
+                             options.get("keep"))
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+    with open(output, 'w') as f:
+        json.dump(document, f, indent=2)
+    print(f"Results saved to {output}")
+
+    failed = [result['backend'] for result in document['results']
+              if result.get('correct') is False]
+    failed += [module for module, elapsed in document['startup_ms'].items()
+               if elapsed >= STARTUP_BUDGET_MS]
+    if "baseline" in options:
+        with open(options["baseline"]) as f:
+            failed += compare(document, json.load(f))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
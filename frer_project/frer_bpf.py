@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+FRER Kernel Filter - Classic BPF program passing only R-TAG frames
+Generated in Python and attached with SO_ATTACH_FILTER (no tcpdump needed)
+"""
+
+import ctypes
+import socket
+import struct
+
+from rtag_decoder import ETH_P_RTAG, VLAN_TPIDS, RTAG_LEN
+
+SO_ATTACH_FILTER = 26
+SO_DETACH_FILTER = 27
+SOL_PACKET = 263
+PACKET_FANOUT_DATA = 22
+
+# <linux/bpf_common.h> / <linux/filter.h> opcodes
+BPF_LD_W_ABS = 0x20
+BPF_LD_H_ABS = 0x28
+BPF_LD_W_IND = 0x40
+BPF_LD_H_IND = 0x48
+BPF_LDX_IMM = 0x01
+BPF_LDX_MEM = 0x61
+BPF_ST = 0x02
+BPF_ALU_AND_K = 0x54
+BPF_ALU_ADD_K = 0x04
+BPF_ALU_MUL_K = 0x24
+BPF_ALU_RSH_K = 0x74
+BPF_ALU_XOR_X = 0xac
+BPF_JMP_JA = 0x05
+BPF_JMP_JEQ_K = 0x15
+BPF_RET_K = 0x06
+BPF_RET_A = 0x16
+BPF_MISC_TXA = 0x87
+
+ETH_P_IP = 0x0800
+
+# Ancillary loads: AF_PACKET sees 802.1Q frames with the tag stripped
+SKF_AD_OFF = -0x1000
+SKF_AD_VLAN_TAG = 44
+SKF_AD_VLAN_TAG_PRESENT = 48
+# Loads relative to the MAC header, wherever skb->data points
+SKF_LL_OFF = -0x200000
+
+IPV4_UDP_HEADERS = 20 + 8
+
+_SOCK_FILTER = struct.Struct('=HBBI')
+
+
+class _Assembler:
+    """Tiny cBPF assembler with forward labels
+
+    Conditional jumps only ever skip a few adjacent instructions; long
+    jumps go through BPF_JA, whose 32-bit offset cannot overflow however
+    many VLANs or MACs are configured.
+    """
+
+    def __init__(self):
+        self.code = []      # [code, jt, jf, k or label]
+        self.labels = {}
+
+    def label(self, name):
+        self.labels[name] = len(self.code)
+
+    def emit(self, code, k=0, jt=0, jf=0):
+        self.code.append([code, jt, jf, k & 0xFFFFFFFF])
+
+    def goto(self, name):
+        self.code.append([BPF_JMP_JA, 0, 0, name])
+
+    def if_equal_goto(self, k, name):
+        """if A == k: goto name"""
+        self.emit(BPF_JMP_JEQ_K, k, jt=0, jf=1)
+        self.goto(name)
+
+    def assemble(self):
+        program = bytearray()
+        for pc, (code, jt, jf, k) in enumerate(self.code):
+            if isinstance(k, str):
+                k = self.labels[k] - (pc + 1)
+            program += _SOCK_FILTER.pack(code, jt, jf, k)
+        return bytes(program)
+
+
+def _emit_rtag_locate(asm, check_vlan_present=False, base=0):
+    """Find the R-TAG: X = base + offset of its EtherType, A = innermost TCI
+
+    Falls through to label 'vlan'; frames without an R-TAG jump to
+    'reject'. The R-TAG EtherType is matched after zero, one or two
+    in-band VLAN tags (offsets 12, 16 and 20).
+    """
+    asm.emit(BPF_LD_H_ABS, base + 12)
+    asm.if_equal_goto(ETH_P_RTAG, 'rtag12')
+    for tpid in VLAN_TPIDS:
+        asm.if_equal_goto(tpid, 'tag16')
+    asm.goto('reject')
+
+    asm.label('tag16')
+    asm.emit(BPF_LD_H_ABS, base + 16)
+    asm.if_equal_goto(ETH_P_RTAG, 'rtag16')
+    for tpid in VLAN_TPIDS:
+        asm.if_equal_goto(tpid, 'tag20')
+    asm.goto('reject')
+
+    asm.label('tag20')
+    asm.emit(BPF_LD_H_ABS, base + 20)
+    asm.if_equal_goto(ETH_P_RTAG, 'rtag20')
+    asm.goto('reject')
+
+    # Untagged on the wire or tag stripped by the kernel: TCI from metadata
+    asm.label('rtag12')
+    asm.emit(BPF_LDX_IMM, base + 12)
+    if check_vlan_present:
+        asm.emit(BPF_LD_W_ABS, SKF_AD_OFF + SKF_AD_VLAN_TAG_PRESENT)
+        asm.if_equal_goto(0, 'reject')
+    asm.emit(BPF_LD_W_ABS, SKF_AD_OFF + SKF_AD_VLAN_TAG)
+    asm.goto('vlan')
+
+    asm.label('rtag16')
+    asm.emit(BPF_LDX_IMM, base + 16)
+    asm.emit(BPF_LD_H_ABS, base + 14)
+    asm.goto('vlan')
+
+    asm.label('rtag20')
+    asm.emit(BPF_LDX_IMM, base + 20)
+    asm.emit(BPF_LD_H_ABS, base + 18)
+
+    asm.label('vlan')
+
+
+def compile_rtag_filter(vlans=None, src_macs=None, dst_macs=None,
+                        payload_bytes=0):
+    """Build a cBPF program that accepts only R-TAG frames
+
+    vlans restricts the innermost VLAN ID,
+    taken in-band or from the stripped-tag metadata; src_macs/dst_macs
+    restrict the talker/listener addresses. Accepted frames are truncated
+    to the R-TAG plus IPv4/UDP headers and payload_bytes of payload.
+    Returns the packed struct sock_filter array.
+    """
+    asm = _Assembler()
+    _emit_rtag_locate(asm, check_vlan_present=bool(vlans))
+
+    if vlans:
+        asm.emit(BPF_ALU_AND_K, 0x0FFF)
+        for vlan in vlans:
+            asm.if_equal_goto(vlan, 'reserved')
+        asm.goto('reject')
+
+    # R-TAG reserved field must be zero, as in decode_rtag()
+    asm.label('reserved')
+    asm.emit(BPF_LD_H_IND, 2)
+    asm.if_equal_goto(0, 'src_mac')
+    asm.goto('reject')
+
+    for name, offset, macs, next_label in (('src_mac', 6, src_macs, 'dst_mac'),
+                                           ('dst_mac', 0, dst_macs, 'accept')):
+        asm.label(name)
+        for mac in macs or ():
+            if isinstance(mac, str):
+                mac = bytes.fromhex(mac.replace(':', '').replace('-', ''))
+            high, low = struct.unpack('!IH', mac)
+            # Skip this MAC's remaining three instructions on mismatch
+            asm.emit(BPF_LD_W_ABS, offset)
+            asm.emit(BPF_JMP_JEQ_K, high, jt=0, jf=3)
+            asm.emit(BPF_LD_H_ABS, offset + 4)
+            asm.emit(BPF_JMP_JEQ_K, low, jt=0, jf=1)
+            asm.goto(next_label)
+        if macs:
+            asm.goto('reject')
+
+    # Snap length: R-TAG offset + R-TAG + IPv4/UDP + requested payload
+    asm.label('accept')
+    asm.emit(BPF_MISC_TXA)
+    asm.emit(BPF_ALU_ADD_K, 2 + RTAG_LEN + IPV4_UDP_HEADERS + payload_bytes)
+    asm.emit(BPF_RET_A)
+
+    asm.label('reject')
+    asm.emit(BPF_RET_K, 0)
+
+    return asm.assemble()
+
+
+def compile_fanout_program():
+    """cBPF PACKET_FANOUT_CBPF program returning a per-stream key
+
+    The key mixes the fields of IP stream identification (dst MAC, VLAN,
+    IPv4 addresses and ports), so every copy of a stream is steered to the
+    same fanout member; the kernel takes it modulo the group size. Frames
+    without an R-TAG go to member 0.
+
+    The fanout demux runs before the Ethernet header is pushed back, so
+    every load is made relative to the MAC header (SKF_LL_OFF).
+    """
+    asm = _Assembler()
+    _emit_rtag_locate(asm, base=SKF_LL_OFF)
+
+    # M[0] = running key, M[1] = base + R-TAG offset
+    asm.emit(BPF_ALU_AND_K, 0x0FFF)
+    asm.emit(BPF_ST, 0)
+    asm.emit(BPF_MISC_TXA)
+    asm.emit(BPF_ST, 1)
+
+    def mix(load, k):
+        asm.emit(load, k)
+        asm.emit(BPF_LDX_MEM, 0)
+        asm.emit(BPF_ALU_XOR_X)
+        asm.emit(BPF_ST, 0)
+
+    # Low 32 bits of the destination MAC
+    mix(BPF_LD_W_ABS, SKF_LL_OFF + 2)
+
+    # IPv4 addresses and UDP/TCP ports behind the R-TAG (IHL 5)
+    asm.emit(BPF_LDX_MEM, 1)
+    asm.emit(BPF_LD_H_IND, 6)
+    asm.if_equal_goto(ETH_P_IP, 'ip')
+    asm.goto('hash')
+    asm.label('ip')
+    for offset in (8 + 12, 8 + 16, 8 + 20):
+        asm.emit(BPF_LDX_MEM, 1)
+        mix(BPF_LD_W_IND, offset)
+
+    # Multiplicative hash so nearby keys spread over the members
+    asm.label('hash')
+    asm.emit(BPF_LDX_MEM, 0)
+    asm.emit(BPF_MISC_TXA)
+    asm.emit(BPF_ALU_MUL_K, 0x9E3779B1)
+    asm.emit(BPF_ALU_RSH_K, 16)
+    asm.emit(BPF_RET_A)
+
+    asm.label('reject')
+    asm.emit(BPF_RET_K, 0)
+
+    return asm.assemble()
+
+
+def _sock_fprog(program):
+    """struct sock_fprog for program; keep the buffer alive during the call"""
+    length = len(program) // _SOCK_FILTER.size
+    buf = ctypes.create_string_buffer(program, len(program))
+    return struct.pack('@HP', length, ctypes.addressof(buf)), buf
+
+
+def attach_filter(sock, program):
+    """Attach a packed cBPF program to a socket with SO_ATTACH_FILTER"""
+    fprog, buf = _sock_fprog(program)
+    # The kernel copies the program, so buf only has to outlive the call
+    sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+
+
+def detach_filter(sock):
+    sock.setsockopt(socket.SOL_SOCKET, SO_DETACH_FILTER, 0)
+
+
+def attach_fanout_program(sock, program):
+    """Set the PACKET_FANOUT_CBPF steering program of the socket's group"""
+    fprog, buf = _sock_fprog(program)
+    sock.setsockopt(SOL_PACKET, PACKET_FANOUT_DATA, fprog)
+
+
+def format_filter(program):
+    """tcpdump -dd style listing of a packed program"""
+    return '\n'.join(
+        '{ 0x%02x, %d, %d, 0x%08x },' % _SOCK_FILTER.unpack_from(program, i)
+        for i in range(0, len(program), _SOCK_FILTER.size))
@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+FRER Capture Engine - AF_PACKET PACKET_MMAP (TPACKET_V3) receive ring
+Hands frames to the analyzer as memoryviews into the shared ring
+"""
+
+import errno
+import mmap
+import select
+import selectors
+import socket
+import struct
+import time
+
+from frer_bpf import attach_filter, attach_fanout_program
+
+# <linux/if_packet.h>
+SOL_PACKET = 263
+PACKET_ADD_MEMBERSHIP = 1
+PACKET_RX_RING = 5
+PACKET_STATISTICS = 6
+PACKET_VERSION = 10
+PACKET_FANOUT = 18
+PACKET_AUXDATA = 8
+PACKET_IGNORE_OUTGOING = 23
+PACKET_MR_PROMISC = 1
+TPACKET_V3 = 2
+
+PACKET_FANOUT_HASH = 0
+PACKET_FANOUT_CBPF = 6
+
+TP_STATUS_KERNEL = 0
+TP_STATUS_USER = 1 << 0
+TP_STATUS_VLAN_VALID = 1 << 4
+TP_STATUS_VLAN_TPID_VALID = 1 << 6
+
+ETH_P_8021Q = 0x8100    # TPID of a stripped tag the kernel did not report
+
+ETH_P_ALL = 0x0003
+
+# <linux/net_tstamp.h>
+SO_TIMESTAMPING = 37
+SOF_TIMESTAMPING_RX_HARDWARE = 1 << 2
+SOF_TIMESTAMPING_RX_SOFTWARE = 1 << 3
+SOF_TIMESTAMPING_SOFTWARE = 1 << 4
+SOF_TIMESTAMPING_RAW_HARDWARE = 1 << 6
+
+# struct tpacket_req3
+_TPACKET_REQ3 = struct.Struct('=IIIIIII')
+# struct tpacket_block_desc: version, offset_to_priv, then tpacket_hdr_v1
+# block_status, num_pkts, offset_to_first_pkt
+_BLOCK_DESC = struct.Struct('=IIIII')
+_BLOCK_STATUS_OFFSET = 8
+_U32 = struct.Struct('=I')
+# struct tpacket3_hdr up to hv1.tp_vlan_tpid
+_TPACKET3_HDR = struct.Struct('=IIIIIIHHIIH')
+# struct tpacket_stats_v3
+_TPACKET_STATS_V3 = struct.Struct('=III')
+# struct packet_mreq
+_PACKET_MREQ = struct.Struct('=iHH8s')
+# struct scm_timestamping: software, (deprecated), raw hardware timespecs
+_SCM_TIMESTAMPING = struct.Struct('=qqqqqq')
+# struct tpacket_auxdata
+_TPACKET_AUXDATA = struct.Struct('=IIIHHHH')
+
+
+class TPacketV3Ring:
+    """Memory-mapped TPACKET_V3 block ring on one interface
+
+    The kernel fills whole blocks and retires them after retire_tov_ms;
+    each retired block is walked once and handed back, so frames are
+    delivered in batches without a recv() call or a copy per frame.
+    """
+
+    def __init__(self, interface, block_size=1 << 22, block_nr=64,
+                 frame_size=2048, retire_tov_ms=60, promisc=False,
+                 filter_program=None, fanout_group=None,
+                 fanout_mode=PACKET_FANOUT_HASH, fanout_program=None,
+                 ignore_outgoing=False):
+        if block_size % mmap.PAGESIZE:
+            raise ValueError("block_size must be a multiple of the page size")
+        self.interface = interface
+        self.block_size = block_size
+        self.block_nr = block_nr
+        self.current_block = 0
+
+        self.sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW,
+                                  socket.htons(ETH_P_ALL))
+        try:
+            if filter_program is not None:
+                # Attach before bind so no unfiltered frame reaches the ring
+                attach_filter(self.sock, filter_program)
+            self.sock.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V3)
+            req = _TPACKET_REQ3.pack(
+                block_size, block_nr, frame_size,
+                (block_size // frame_size) * block_nr,
+                retire_tov_ms, 0, 0)
+            self.sock.setsockopt(SOL_PACKET, PACKET_RX_RING, req)
+            if ignore_outgoing:
+                # Frames sent from this host (e.g. relayed ones) never loop back
+                self.sock.setsockopt(SOL_PACKET, PACKET_IGNORE_OUTGOING, 1)
+            self._mmap = mmap.mmap(self.sock.fileno(), block_size * block_nr,
+                                   mmap.MAP_SHARED,
+                                   mmap.PROT_READ | mmap.PROT_WRITE)
+            self.sock.bind((interface, ETH_P_ALL))
+            if promisc:
+                mreq = _PACKET_MREQ.pack(socket.if_nametoindex(interface),
+                                         PACKET_MR_PROMISC, 0, b'')
+                self.sock.setsockopt(SOL_PACKET, PACKET_ADD_MEMBERSHIP, mreq)
+            if fanout_group is not None:
+                # Joining needs a bound socket; the group then shares the
+                # interface's frames among its members
+                self.sock.setsockopt(SOL_PACKET, PACKET_FANOUT,
+                                     (fanout_group & 0xFFFF) | (fanout_mode << 16))
+                if fanout_program is not None:
+                    attach_fanout_program(self.sock, fanout_program)
+        except Exception:
+            self.sock.close()
+            raise
+
+        self._view = memoryview(self._mmap)
+        self._poller = select.poll()
+        self._poller.register(self.sock.fileno(), select.POLLIN | select.POLLERR)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def read_block(self, handler, timeout_ms=100):
+        """Deliver the frames of the next retired block to handler
+
+        handler(frame, vlan_tci, timestamp_ns) gets a memoryview that is
+        only valid until it returns; the block is given back to the kernel
+        afterwards. Returns the number of frames delivered.
+        """
+        view = self._view
+        base = self.current_block * self.block_size
+        status = _U32.unpack_from(view, base + _BLOCK_STATUS_OFFSET)[0]
+        if not status & TP_STATUS_USER:
+            self._poller.poll(timeout_ms)
+            status = _U32.unpack_from(view, base + _BLOCK_STATUS_OFFSET)[0]
+            if not status & TP_STATUS_USER:
+                return 0
+
+        num_pkts, offset = _BLOCK_DESC.unpack_from(view, base)[3:5]
+        offset += base
+        for _ in range(num_pkts):
+            (next_offset, sec, nsec, snaplen, _, status,
+             mac, _, _, tci, _) = _TPACKET3_HDR.unpack_from(view, offset)
+            start = offset + mac
+            handler(view[start:start + snaplen],
+                    tci if status & TP_STATUS_VLAN_VALID else None,
+                    sec * 1000000000 + nsec)
+            offset += next_offset
+
+        _U32.pack_into(view, base + _BLOCK_STATUS_OFFSET, TP_STATUS_KERNEL)
+        self.current_block = (self.current_block + 1) % self.block_nr
+        return num_pkts
+
+    def acquire_block(self):
+        """Frames of the next retired block without giving it back
+
+        Returns [(timestamp_ns, vlan_tci, frame, vlan_tpid), ...], or None
+        if no block is ready; vlan_tpid is the TPID of the stripped tag.
+        The memoryviews stay valid until release_block(), which must be
+        called before the next acquire_block().
+        """
+        view = self._view
+        base = self.current_block * self.block_size
+        status = _U32.unpack_from(view, base + _BLOCK_STATUS_OFFSET)[0]
+        if not status & TP_STATUS_USER:
+            return None
+
+        num_pkts, offset = _BLOCK_DESC.unpack_from(view, base)[3:5]
+        offset += base
+        frames = []
+        for _ in range(num_pkts):
+            (next_offset, sec, nsec, snaplen, _, status,
+             mac, _, _, tci, tpid) = _TPACKET3_HDR.unpack_from(view, offset)
+            start = offset + mac
+            frames.append((sec * 1000000000 + nsec,
+                           tci if status & TP_STATUS_VLAN_VALID else None,
+                           view[start:start + snaplen],
+                           tpid if status & TP_STATUS_VLAN_TPID_VALID else ETH_P_8021Q))
+            offset += next_offset
+        return frames
+
+    def release_block(self):
+        """Give the block from acquire_block() back to the kernel"""
+        base = self.current_block * self.block_size
+        _U32.pack_into(self._view, base + _BLOCK_STATUS_OFFSET, TP_STATUS_KERNEL)
+        self.current_block = (self.current_block + 1) % self.block_nr
+
+    def capture(self, handler, duration=None, max_frames=None, tick=None):
+        """Run read_block() until duration seconds or max_frames elapse
+
+        tick() is called after every block or poll timeout, so periodic
+        work still runs while the link is idle.
+        """
+        deadline = time.monotonic() + duration if duration is not None else None
+        frames = 0
+        while max_frames is None or frames < max_frames:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            frames += self.read_block(handler)
+            if tick is not None:
+                tick()
+        return frames
+
+    def statistics(self):
+        """Kernel counters since the last call: (packets, drops, freeze_q_cnt)"""
+        raw = self.sock.getsockopt(SOL_PACKET, PACKET_STATISTICS,
+                                   _TPACKET_STATS_V3.size)
+        return _TPACKET_STATS_V3.unpack(raw)
+
+    def close(self):
+        self._poller.unregister(self.sock.fileno())
+        self._view.release()
+        self._mmap.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MultiInterfaceCapture:
+    """TPACKET_V3 rings on several interfaces merged in one event loop
+
+    Each interface is a member stream; the handler gets its index as a
+    fourth argument. The kernel hands out whole blocks, so frames are
+    merged by RX timestamp across the rings: the oldest pending frame is
+    delivered once every other ring either has a block waiting or has had
+    hold_ms to retire one. Elimination thus sees the copies in arrival
+    order, with one selectors loop and no thread per interface.
+    """
+
+    def __init__(self, interfaces, filter_program=None, hold_ms=None,
+                 **ring_args):
+        # Short block timeouts keep the merge delay small
+        ring_args.setdefault('retire_tov_ms', 8)
+        ring_args.setdefault('block_size', 1 << 20)
+        ring_args.setdefault('block_nr', 64)
+        self.interfaces = list(interfaces)
+        self.hold_ns = int((hold_ms if hold_ms is not None
+                            else 2 * ring_args['retire_tov_ms'] + 2) * 1000000)
+        # Everything close() reads exists before the first ring is opened
+        self.rings = []
+        self._held = []     # frames of each held block
+        self._cursor = []
+        self._selector = selectors.DefaultSelector()
+        try:
+            for index, interface in enumerate(self.interfaces):
+                ring = TPacketV3Ring(interface, filter_program=filter_program,
+                                     **ring_args)
+                self.rings.append(ring)
+                self._held.append(None)
+                self._cursor.append(0)
+                self._selector.register(ring.fileno(), selectors.EVENT_READ, index)
+        except Exception:
+            self.close()
+            raise
+
+    def _acquire(self, index):
+        """Hold the next ready block of ring index; False if none is ready"""
+        ring = self.rings[index]
+        while True:
+            frames = ring.acquire_block()
+            if frames is None:
+                self._held[index] = None
+                return False
+            if frames:
+                break
+            ring.release_block()
+        if self._held[index] is None:
+            # A held block keeps the ring readable; stop watching it
+            self._selector.unregister(ring.fileno())
+        self._held[index] = frames
+        self._cursor[index] = 0
+        return True
+
+    def _release(self, index):
+        self.rings[index].release_block()
+        if not self._acquire(index):
+            self._selector.register(self.rings[index].fileno(),
+                                    selectors.EVENT_READ, index)
+
+    def _merge(self, handler, vlan_tpid=False):
+        """Deliver every frame that is safe to order; returns (frames, wait_ns)"""
+        held = self._held
+        cursor = self._cursor
+        delivered = 0
+        while True:
+            oldest = oldest_ts = None
+            for index, frames in enumerate(held):
+                if frames is not None:
+                    timestamp = frames[cursor[index]][0]
+                    if oldest_ts is None or timestamp < oldest_ts:
+                        oldest, oldest_ts = index, timestamp
+            if oldest is None:
+                return delivered, None
+            if None in held:
+                # An idle ring may still retire a block with older frames
+                wait = oldest_ts + self.hold_ns - time.time_ns()
+                if wait > 0:
+                    return delivered, wait
+                # It may have done so since select(), if the loop fell behind
+                if any([self._acquire(index) for index, frames in enumerate(held)
+                        if frames is None]):
+                    continue
+            timestamp, tci, frame, tpid = held[oldest][cursor[oldest]]
+            if vlan_tpid:
+                handler(frame, tci, timestamp, oldest, tpid)
+            else:
+                handler(frame, tci, timestamp, oldest)
+            delivered += 1
+            cursor[oldest] += 1
+            if cursor[oldest] == len(held[oldest]):
+                self._release(oldest)
+
+    def capture(self, handler, duration=None, max_frames=None, tick=None,
+                vlan_tpid=False):
+        """Merge frames into handler(frame, vlan_tci, timestamp_ns, member)
+
+        Runs until duration seconds or max_frames elapse; tick() is called
+        after every wakeup. With vlan_tpid, the handler also gets the TPID
+        of the tag the kernel stripped, for frames that are forwarded.
+        """
+        deadline = time.monotonic() + duration if duration is not None else None
+        frames = 0
+        wait_ns = None
+        while max_frames is None or frames < max_frames:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            timeout = 0.1 if wait_ns is None else min(wait_ns / 1e9, 0.1)
+            for key, _ in self._selector.select(timeout):
+                self._acquire(key.data)
+            delivered, wait_ns = self._merge(handler, vlan_tpid)
+            frames += delivered
+            if tick is not None:
+                tick()
+        return frames
+
+    def statistics(self):
+        """Kernel (packets, drops, freeze_q_cnt) per interface"""
+        return [ring.statistics() for ring in self.rings]
+
+    def close(self):
+        for index, ring in enumerate(self.rings):
+            if self._held[index] is not None:
+                ring.release_block()
+            ring.close()
+        self.rings = []
+        self._held = []
+        self._selector.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class TimestampingSocket:
+    """AF_PACKET socket delivering frames with SO_TIMESTAMPING RX timestamps
+
+    Frames are read with recvmsg() and the timestamp is taken from the
+    SO_TIMESTAMPING control message, as hw_ts_from_msg() does in
+    tsn_toolkit.c: timespec 0 is the software stamp, 2 the raw hardware
+    stamp. Hardware stamps also need RX timestamping enabled on the NIC
+    (e.g. by ptp4l). Stripped VLAN tags come back through PACKET_AUXDATA.
+    """
+
+    def __init__(self, interface, filter_program=None, hardware=False,
+                 frame_size=2048):
+        self.interface = interface
+        self._ts_index = 2 if hardware else 0
+        flags = (SOF_TIMESTAMPING_RX_HARDWARE | SOF_TIMESTAMPING_RAW_HARDWARE
+                 if hardware else
+                 SOF_TIMESTAMPING_RX_SOFTWARE | SOF_TIMESTAMPING_SOFTWARE)
+
+        self.sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW,
+                                  socket.htons(ETH_P_ALL))
+        try:
+            if filter_program is not None:
+                attach_filter(self.sock, filter_program)
+            self.sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPING, flags)
+            self.sock.setsockopt(SOL_PACKET, PACKET_AUXDATA, 1)
+            self.sock.bind((interface, ETH_P_ALL))
+            self.sock.setblocking(False)
+        except Exception:
+            self.sock.close()
+            raise
+
+        self._buf = bytearray(frame_size)
+        self._view = memoryview(self._buf)
+        self._ancsize = (socket.CMSG_SPACE(_SCM_TIMESTAMPING.size)
+                         + socket.CMSG_SPACE(_TPACKET_AUXDATA.size))
+        self._poller = select.poll()
+        self._poller.register(self.sock.fileno(), select.POLLIN | select.POLLERR)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def read(self, handler, timeout_ms=100):
+        """Deliver every queued frame to handler(frame, vlan_tci, timestamp_ns)
+
+        Waits up to timeout_ms for the first one. The memoryview is reused
+        for the next frame. Returns the number of frames delivered.
+        """
+        if not self._poller.poll(timeout_ms):
+            return 0
+        frames = 0
+        view = self._view
+        ts_index = self._ts_index
+        while True:
+            try:
+                nbytes, ancdata, _, _ = self.sock.recvmsg_into([self._buf],
+                                                               self._ancsize)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return frames
+                raise
+            timestamp = tci = None
+            for level, kind, data in ancdata:
+                if level == socket.SOL_SOCKET and kind == SO_TIMESTAMPING:
+                    stamps = _SCM_TIMESTAMPING.unpack_from(data)
+                    sec, nsec = stamps[2 * ts_index], stamps[2 * ts_index + 1]
+                    if sec or nsec:
+                        timestamp = sec * 1000000000 + nsec
+                elif level == SOL_PACKET and kind == PACKET_AUXDATA:
+                    status, _, _, _, _, vlan_tci, _ = _TPACKET_AUXDATA.unpack_from(data)
+                    if status & TP_STATUS_VLAN_VALID:
+                        tci = vlan_tci
+            handler(view[:nbytes], tci, timestamp)
+            frames += 1
+
+    def capture(self, handler, duration=None, max_frames=None, tick=None):
+        """Run read() until duration seconds or max_frames elapse"""
+        deadline = time.monotonic() + duration if duration is not None else None
+        frames = 0
+        while max_frames is None or frames < max_frames:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            frames += self.read(handler)
+            if tick is not None:
+                tick()
+        return frames
+
+    def close(self):
+        self._poller.unregister(self.sock.fileno())
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
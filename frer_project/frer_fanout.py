@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+FRER Fanout Capture - PACKET_FANOUT receive sharded over worker processes
+Each stream is steered to one worker, so recovery state is never shared
+"""
+
+import multiprocessing
+import os
+import queue
+import signal
+import time
+
+from frer_bpf import compile_rtag_filter, compile_fanout_program
+from frer_capture import TPacketV3Ring, PACKET_FANOUT_HASH, PACKET_FANOUT_CBPF
+from frer_frame import PROBE_LEN
+
+# 'stream' hashes the stream identification fields behind the R-TAG in a
+# cBPF program. The kernel flow hash ('hash') does not parse past the
+# R-TAG EtherType, so it sends every R-TAG stream to the same worker.
+FANOUT_MODES = {
+    'stream': PACKET_FANOUT_CBPF,
+    'hash': PACKET_FANOUT_HASH,
+}
+
+STARTUP_TIMEOUT = 5.0
+RESULT_POLL = 0.5          # seconds between checks for workers that died
+
+
+def _worker(index, interface, group_id, mode, analyzer_factory, ring_args,
+            cpu, ready, stop, results):
+    """Worker process: one fanout member ring feeding its own analyzer"""
+    # Ctrl+C goes to the whole process group; the parent decides when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if cpu is not None:
+        os.sched_setaffinity(0, {cpu})
+
+    analyzer = analyzer_factory()
+    fanout_mode = FANOUT_MODES[mode]
+    try:
+        ring = TPacketV3Ring(
+            interface,
+            filter_program=compile_rtag_filter(payload_bytes=PROBE_LEN),
+            fanout_group=group_id, fanout_mode=fanout_mode,
+            fanout_program=(compile_fanout_program()
+                            if fanout_mode == PACKET_FANOUT_CBPF else None),
+            **ring_args)
+    except OSError as e:
+        ready.put((index, str(e)))
+        return
+    ready.put((index, None))
+
+    frames = 0
+    with ring:
+        cpu_start = time.process_time()
+        while not stop.is_set():
+            frames += ring.read_block(analyzer.analyze_frame)
+        # Drain the block still open when the stop came in
+        while True:
+            count = ring.read_block(analyzer.analyze_frame, timeout_ms=200)
+            if not count:
+                break
+            frames += count
+        cpu_time = time.process_time() - cpu_start
+        _, drops, _ = ring.statistics()
+
+    results.put({
+        'worker': index,
+        'cpu': cpu,
+        'frames': frames,
+        'drops': drops,
+        'cpu_time': cpu_time,
+        'analyzer': analyzer.snapshot(),
+    })
+
+
+class FanoutCapture:
+    """N worker processes sharing one interface through a PACKET_FANOUT group
+
+    analyzer_factory() is called in every worker; its analyzer must provide
+    analyze_frame() and snapshot(). Workers are pinned round-robin to the
+    CPUs this process may run on when pin_cpus is True.
+    """
+
+    def __init__(self, interface, workers=None, analyzer_factory=None,
+                 mode='stream', group_id=None, pin_cpus=True, **ring_args):
+        if mode not in FANOUT_MODES:
+            raise ValueError(f"Unknown fanout mode: {mode}")
+        cpus = sorted(os.sched_getaffinity(0))
+        self.interface = interface
+        self.workers = workers or len(cpus)
+        self.analyzer_factory = analyzer_factory
+        self.mode = mode
+        self.group_id = group_id if group_id is not None else os.getpid() & 0xFFFF
+        self.cpus = [cpus[i % len(cpus)] if pin_cpus else None
+                     for i in range(self.workers)]
+        # The default ring size is per process; share it among the workers
+        ring_args.setdefault('block_nr', max(8, 64 // self.workers))
+        self.ring_args = ring_args
+
+        # fork keeps closures as analyzer factories usable
+        self._context = multiprocessing.get_context('fork')
+        self._processes = []
+        self.start_time = None
+        self.failed = []    # workers that exited without a result, from stop()
+
+    def start(self):
+        """Start the workers; returns once every ring has joined the group"""
+        ctx = self._context
+        self._stop = ctx.Event()
+        self._ready = ctx.Queue()
+        self._results = ctx.Queue()
+        for index in range(self.workers):
+            process = ctx.Process(
+                target=_worker, daemon=True,
+                args=(index, self.interface, self.group_id, self.mode,
+                      self.analyzer_factory, self.ring_args, self.cpus[index],
+                      self._ready, self._stop, self._results))
+            process.start()
+            self._processes.append(process)
+
+        errors = []
+        for _ in range(self.workers):
+            try:
+                index, error = self._ready.get(timeout=STARTUP_TIMEOUT)
+            except queue.Empty:
+                errors.append("worker did not start")
+                break
+            if error is not None:
+                errors.append(f"worker {index}: {error}")
+        if errors:
+            self._stop.set()
+            for process in self._processes:
+                process.join()
+            self._processes = []
+            raise RuntimeError("Fanout capture failed: " + "; ".join(errors))
+        self.start_time = time.time()
+
+    def stop(self):
+        """Stop the workers and return their results, ordered by worker
+
+        A worker that exits without reporting (killed by a signal or the
+        OOM killer, or crashed) is listed in failed instead of waited on.
+        """
+        self._stop.set()
+        results = {}
+        self.failed = []
+        while len(results) + len(self.failed) < len(self._processes):
+            try:
+                result = self._results.get(timeout=RESULT_POLL)
+                results[result['worker']] = result
+                continue
+            except queue.Empty:
+                pass
+            # A result sent just before exiting is already in the pipe
+            while True:
+                try:
+                    result = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                results[result['worker']] = result
+            self.failed = [f"worker {index} exited with code {process.exitcode}"
+                           for index, process in enumerate(self._processes)
+                           if process.exitcode is not None and index not in results]
+        for process in self._processes:
+            process.join()
+        self._processes = []
+        return [results[index] for index in sorted(results)]
+
+    def run(self, duration=None):
+        """Capture until duration seconds pass or Ctrl+C; returns stop()"""
+        self.start()
+        deadline = time.monotonic() + duration if duration is not None else None
+        try:
+            while deadline is None or time.monotonic() < deadline:
+                time.sleep(1.0 if deadline is None
+                           else min(1.0, max(0.0, deadline - time.monotonic())))
+        except KeyboardInterrupt:
+            pass
+        return self.stop()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+FRER Frame Templates - Precomputed Ethernet/VLAN/R-TAG/IPv4/UDP frames
+Each stream's frame is laid out once; per-frame fields are patched in place
+"""
+
+import fcntl
+import socket
+import struct
+import time
+
+from rtag_decoder import ETH_P_IP, ETH_P_8021Q, ETH_P_RTAG, RTAG_LEN
+
+BROADCAST_MAC = b'\xff' * 6
+MAX_PAYLOAD = 9000
+
+SIOCGIFMTU = 0x8921
+SIOCGIFHWADDR = 0x8927
+IFNAMSIZ = 16
+
+IPV4_HEADER_LEN = 20
+UDP_HEADER_LEN = 8
+
+_ETH = struct.Struct('!6s6s')
+_U16 = struct.Struct('!H')
+_VLAN_TAG = struct.Struct('!HH')
+_RTAG = struct.Struct('!HHHH')
+_IPV4 = struct.Struct('!BBHHHBBH4s4s')
+_UDP = struct.Struct('!HHHH')
+
+# Latency probe at the start of the UDP payload: magic, talker stream ID,
+# path ID, TX time in ns. The time is CLOCK_REALTIME, the clock of kernel
+# software RX timestamps (and of PTP-disciplined hosts).
+PROBE_MAGIC = b'FRTS'
+_PROBE = struct.Struct('!4sHBxQ')
+_PROBE_STAMP = struct.Struct('!BxQ')    # path ID + TX time, patched per frame
+_PROBE_STAMP_OFFSET = 6
+PROBE_LEN = _PROBE.size
+
+
+def mac_to_bytes(mac):
+    """'aa:bb:cc:dd:ee:ff' -> 6 bytes"""
+    return bytes.fromhex(mac.replace(':', '').replace('-', ''))
+
+
+def interface_mac(interface):
+    """Hardware address of an interface as 6 bytes
+
+    Read from sysfs, or with the SIOCGIFHWADDR ioctl where /sys is not
+    mounted. Raises OSError for an unknown interface.
+    """
+    try:
+        with open(f'/sys/class/net/{interface}/address') as f:
+            return mac_to_bytes(f.read().strip())
+    except FileNotFoundError:
+        pass
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        ifreq = struct.pack(f'{IFNAMSIZ}s16x', interface.encode()[:IFNAMSIZ - 1])
+        # struct ifreq: name, then struct sockaddr (family, 14 data bytes)
+        return fcntl.ioctl(sock, SIOCGIFHWADDR, ifreq)[IFNAMSIZ + 2:IFNAMSIZ + 8]
+
+
+def interface_mtu(interface):
+    """MTU of an interface, from sysfs or the SIOCGIFMTU ioctl"""
+    try:
+        with open(f'/sys/class/net/{interface}/mtu') as f:
+            return int(f.read())
+    except FileNotFoundError:
+        pass
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        ifreq = struct.pack(f'{IFNAMSIZ}s16x', interface.encode()[:IFNAMSIZ - 1])
+        return struct.unpack_from('i', fcntl.ioctl(sock, SIOCGIFMTU, ifreq), IFNAMSIZ)[0]
+
+
+def max_payload(mtu, rtag=True):
+    """Largest UDP payload of a template frame that an interface will send
+
+    The kernel takes frames of up to the MTU behind the Ethernet header,
+    and 4 bytes more when they are 802.1Q tagged, so the VLAN tag is free
+    while the R-TAG and the IPv4/UDP headers count against the MTU.
+    """
+    return mtu - (RTAG_LEN if rtag else 0) - IPV4_HEADER_LEN - UDP_HEADER_LEN
+
+
+def ones_complement_sum(data, initial=0):
+    """16-bit one's complement sum of data (odd length is zero-padded)"""
+    length = len(data)
+    total = initial + sum(struct.unpack_from(f'!{length // 2}H', data))
+    if length & 1:
+        total += data[length - 1] << 8
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return total
+
+
+def internet_checksum(data, initial=0):
+    """RFC 1071 Internet checksum"""
+    return ~ones_complement_sum(data, initial) & 0xFFFF
+
+
+def checksum_update(checksum, old_word, new_word):
+    """RFC 1624 incremental update: HC' = ~(~HC + ~m + m')
+
+    old_word/new_word may also be one's complement sums of longer,
+    16-bit aligned fields that changed together.
+    """
+    total = (~checksum & 0xFFFF) + (~old_word & 0xFFFF) + new_word
+    total = (total & 0xFFFF) + (total >> 16)
+    total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+
+def tx_clock_ns():
+    """TX timestamp for latency probes"""
+    return time.clock_gettime_ns(time.CLOCK_REALTIME)
+
+
+def decode_probe(buf, header):
+    """(stream_id, path_id, tx_ns) of the latency probe behind a decoded
+    R-TAG header, or None if the frame carries none"""
+    if header.next_protocol != ETH_P_IP:
+        return None
+    offset = header.payload_offset
+    try:
+        if buf[offset + 9] != socket.IPPROTO_UDP:
+            return None
+        offset += (buf[offset] & 0x0F) * 4 + UDP_HEADER_LEN
+        magic, stream_id, path_id, tx_ns = _PROBE.unpack_from(buf, offset)
+    except (IndexError, struct.error):
+        return None
+    if magic != PROBE_MAGIC:
+        return None
+    return stream_id, path_id, tx_ns
+
+
+class FrameTemplate:
+    """Ethernet [+ 802.1Q] [+ R-TAG] + IPv4 + UDP frame in a reusable buffer
+
+    The full layout is written once into a preallocated bytearray; build()
+    only patches the R-TAG sequence number and IP ID, and updates the IPv4
+    header checksum incrementally for the new IP ID (the UDP checksum does
+    not cover either field). The memoryview it
+    returns is overwritten by the next build(), so it must be consumed
+    (sent or copied) before then.
+
+    With probe_stream set, the payload starts with a latency probe whose
+    path ID and TX time build() stamps, updating the UDP checksum
+    incrementally.
+    """
+
+    def __init__(self, src_mac, dst_mac=BROADCAST_MAC, vlan_id=100, priority=3,
+                 rtag=True, next_protocol=ETH_P_IP,
+                 src_ip="192.168.100.1", dst_ip="192.168.100.2",
+                 src_port=12345, dst_port=54321, payload=b'',
+                 max_payload=MAX_PAYLOAD, probe_stream=None):
+        self.rtag = rtag
+        self.max_payload = max_payload
+        self.probe_stream = probe_stream
+        self.path_id = 0
+        self.tx_ns = 0
+
+        offset = _ETH.size
+        self.vlan_offset = offset if vlan_id is not None else None
+        if vlan_id is not None:
+            offset += _VLAN_TAG.size
+        # EtherType position of the layer after the optional VLAN tag
+        self.ethertype_offset = offset
+        if rtag:
+            # R-TAG: EtherType(2) + Reserved(2) + Sequence(2) + Next Protocol(2)
+            self.seq_offset = offset + 4
+            offset += _RTAG.size
+        else:
+            self.seq_offset = None
+            offset += 2
+        self.ip_offset = offset
+        self.udp_offset = offset + IPV4_HEADER_LEN
+        self.payload_offset = self.udp_offset + UDP_HEADER_LEN
+
+        self._buf = bytearray(self.payload_offset + max_payload)
+        self._view = memoryview(self._buf)
+
+        buf = self._buf
+        _ETH.pack_into(buf, 0, dst_mac, src_mac)
+        if vlan_id is not None:
+            _VLAN_TAG.pack_into(buf, self.vlan_offset, ETH_P_8021Q,
+                                (priority << 13) | vlan_id)
+        if rtag:
+            _RTAG.pack_into(buf, self.ethertype_offset,
+                            ETH_P_RTAG, 0x0000, 0, next_protocol)
+        else:
+            _U16.pack_into(buf, self.ethertype_offset, ETH_P_IP)
+        _IPV4.pack_into(buf, self.ip_offset,
+                        0x45, 0x00, 0, 0, 0x4000, 64, socket.IPPROTO_UDP, 0,
+                        socket.inet_aton(src_ip), socket.inet_aton(dst_ip))
+        _UDP.pack_into(buf, self.udp_offset, src_port, dst_port, 0, 0)
+        self.ip_id = 0
+
+        # UDP pseudo-header: src IP, dst IP, zero, protocol (length added later)
+        self._pseudo_sum = ones_complement_sum(
+            socket.inet_aton(src_ip) + socket.inet_aton(dst_ip)
+            + bytes((0, socket.IPPROTO_UDP)))
+
+        self.set_payload(payload)
+
+    def set_payload(self, payload):
+        """Replace the payload and rewrite the IP/UDP lengths and checksums"""
+        if self.probe_stream is not None:
+            payload = _PROBE.pack(PROBE_MAGIC, self.probe_stream,
+                                  self.path_id, self.tx_ns) + payload
+        size = len(payload)
+        if size > self.max_payload:
+            raise ValueError(f"Payload of {size} bytes exceeds template "
+                             f"maximum ({self.max_payload} bytes)")
+        start = self.payload_offset
+        self._buf[start:start + size] = payload
+        _U16.pack_into(self._buf, self.ip_offset + 2,
+                       IPV4_HEADER_LEN + UDP_HEADER_LEN + size)
+        _U16.pack_into(self._buf, self.udp_offset + 4, UDP_HEADER_LEN + size)
+        self.length = start + size
+        self.frame = self._view[:self.length]
+        self._update_checksums()
+
+    def _update_checksums(self):
+        """Recompute the IPv4 header and UDP checksums from scratch"""
+        buf = self._buf
+        ip = self.ip_offset
+        _U16.pack_into(buf, ip + 10, 0)
+        self.ip_checksum = internet_checksum(self._view[ip:ip + IPV4_HEADER_LEN])
+        _U16.pack_into(buf, ip + 10, self.ip_checksum)
+
+        udp = self.udp_offset
+        udp_length = self.length - udp
+        _U16.pack_into(buf, udp + 6, 0)
+        checksum = internet_checksum(self._view[udp:self.length],
+                                     self._pseudo_sum + udp_length)
+        # A computed zero is sent as all ones (RFC 768)
+        self.udp_checksum = checksum or 0xFFFF
+        _U16.pack_into(buf, udp + 6, self.udp_checksum)
+
+    def build(self, seq_num, ip_id=None, path_id=0, tx_ns=None):
+        """Patch the per-frame fields and return the frame as a memoryview
+
+        Probe frames are stamped with tx_ns, or the current time; copies
+        of one frame sent on other paths should reuse template.tx_ns.
+        """
+        buf = self._buf
+        if self.probe_stream is not None:
+            self._stamp(path_id, tx_clock_ns() if tx_ns is None else tx_ns)
+        if self.seq_offset is not None:
+            _U16.pack_into(buf, self.seq_offset, seq_num & 0xFFFF)
+        ip_id = (seq_num if ip_id is None else ip_id) & 0xFFFF
+        if ip_id != self.ip_id:
+            self.ip_checksum = checksum_update(self.ip_checksum, self.ip_id, ip_id)
+            self.ip_id = ip_id
+            _U16.pack_into(buf, self.ip_offset + 4, ip_id)
+            _U16.pack_into(buf, self.ip_offset + 10, self.ip_checksum)
+        return self.frame
+
+    def _stamp(self, path_id, tx_ns):
+        """Write the probe's path ID and TX time, updating the UDP checksum"""
+        start = self.payload_offset + _PROBE_STAMP_OFFSET
+        end = start + _PROBE_STAMP.size
+        old_sum = ones_complement_sum(self._view[start:end])
+        _PROBE_STAMP.pack_into(self._buf, start, path_id, tx_ns)
+        new_sum = ones_complement_sum(self._view[start:end])
+        self.path_id = path_id
+        self.tx_ns = tx_ns
+        self.udp_checksum = checksum_update(self.udp_checksum, old_sum, new_sum) or 0xFFFF
+        _U16.pack_into(self._buf, self.udp_offset + 6, self.udp_checksum)
+
+    def __len__(self):
+        return self.length
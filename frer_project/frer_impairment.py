@@ -0,0 +1,515 @@
+#!/usr/bin/env python3
+"""
+FRER Path Impairment - Loss, bursts, delay, reordering and rogue copies per member path
+Draws each batch's impairments as NumPy vectors and records exact ground truth
+"""
+
+import sys
+import os
+import tempfile
+from collections import namedtuple
+
+import numpy as np
+
+from rtag_decoder import decode_rtag
+from frer_frame import FrameTemplate
+from frer_pcap import PcapReader, PcapWriter
+from frer_stream_id import StreamIdentificationTable, IP_STREAM_ID
+from frer_recovery import (SEQ_SPACE, SEQ_MASK, SEQ_HALF, DEFAULT_HISTORY_LENGTH,
+                           DEFAULT_RESET_TIMEOUT, PASSED, DISCARDED, OUT_OF_ORDER,
+                           ROGUE, LOST, RESETS, COUNTER_NAMES)
+
+DEFAULT_BATCH_SIZE = 8192       # sequences whose impairments are drawn at once
+JITTER_DISTRIBUTIONS = ('uniform', 'normal', 'exponential')
+
+# Event kinds
+COPY = 0            # the member copy of a sequence
+DUPLICATE = 1       # an extra copy made inside the path
+ROGUE_COPY = 2      # a copy whose sequence number was corrupted
+KIND_NAMES = ('copy', 'duplicate', 'rogue')
+
+# Counters a run can be scored on exactly
+SCORED = (PASSED, DISCARDED, OUT_OF_ORDER, ROGUE, LOST, RESETS)
+
+IMPAIR_SRC_MAC = bytes.fromhex('02000000cb02')
+FIRST_SRC_PORT = 30000          # stream s is sent from UDP port 30000 + s
+CAPTURE_START_NS = 1700000000 * 10**9
+
+
+class PathImpairment:
+    """What one member path does to the copies sent over it
+
+    loss drops each copy independently. burst_loss is the chance that a
+    loss burst starts at a copy, and bursts last burst_length copies on
+    average (Gilbert-Elliott with geometric run lengths). Every copy is
+    delayed by delay seconds plus jitter drawn from jitter_distribution
+    with scale jitter. reorder holds a copy back 1..reorder_depth sequence
+    slots. duplicate adds a second copy of a frame within the path, and
+    rogue replaces a copy's sequence number with one half the sequence
+    space away, outside any recovery window.
+    """
+
+    def __init__(self, loss=0.0, burst_loss=0.0, burst_length=1.0, delay=0.0,
+                 jitter=0.0, jitter_distribution='uniform', reorder=0.0,
+                 reorder_depth=4, duplicate=0.0, rogue=0.0):
+        for name, value in (('loss', loss), ('burst_loss', burst_loss),
+                            ('reorder', reorder), ('duplicate', duplicate),
+                            ('rogue', rogue)):
+            if not 0.0 <= value <= 1.0:
+                raise ValueError(f"{name} must be a probability, not {value}")
+        if burst_length < 1:
+            raise ValueError("burst_length must be at least 1 frame")
+        if delay < 0 or jitter < 0:
+            raise ValueError("delay and jitter must not be negative")
+        if jitter_distribution not in JITTER_DISTRIBUTIONS:
+            raise ValueError(f"Unknown jitter distribution: {jitter_distribution} "
+                             f"(choose from {', '.join(JITTER_DISTRIBUTIONS)})")
+        if reorder_depth < 1:
+            raise ValueError("reorder_depth must be at least 1")
+        self.loss = loss
+        self.burst_loss = burst_loss
+        self.burst_length = burst_length
+        self.delay = delay
+        self.jitter = jitter
+        self.jitter_distribution = jitter_distribution
+        self.reorder = reorder
+        self.reorder_depth = reorder_depth
+        self.duplicate = duplicate
+        self.rogue = rogue
+
+    def describe(self):
+        parts = []
+        if self.loss:
+            parts.append(f"loss {self.loss:.2%}")
+        if self.burst_loss:
+            parts.append(f"bursts {self.burst_loss:.2%} x{self.burst_length:g}")
+        if self.delay or self.jitter:
+            text = f"delay {self.delay * 1e6:.0f}µs"
+            if self.jitter:
+                text += f" + {self.jitter_distribution} {self.jitter * 1e6:.0f}µs"
+            parts.append(text)
+        if self.reorder:
+            parts.append(f"reorder {self.reorder:.2%} ≤{self.reorder_depth}")
+        if self.duplicate:
+            parts.append(f"duplicate {self.duplicate:.2%}")
+        if self.rogue:
+            parts.append(f"rogue {self.rogue:.2%}")
+        return ", ".join(parts) or "clean"
+
+
+class EventBatch(namedtuple('EventBatch', 'time_ns path index sequence kind')):
+    """Departures in time order, one array element per frame
+
+    time_ns is the offset from the start of the run, path the member the
+    frame goes out on, index the sequence slot it carries (stream
+    index % streams) and sequence its R-TAG sequence number.
+    """
+
+    __slots__ = ()
+
+    def __len__(self):
+        return len(self.time_ns)
+
+
+class ImpairedSchedule:
+    """Every member copy of a run of sequences, impaired and in send order
+
+    Slot n carries sequence first_sequence + n // streams of stream
+    n % streams and is nominally sent at n * period_ns, on every path.
+    batches() draws a batch's impairments for each path as whole vectors
+    (loss masks, burst runs, delays, duplicate and rogue masks), merges
+    the paths' departures with np.argsort and yields those due before
+    the next batch starts; later ones are carried over. Nothing is decided
+    per frame in Python. With record, every departure is kept in truth.
+    """
+
+    def __init__(self, paths, count, period_ns, streams=1, first_sequence=1, seed=1,
+                 batch_size=DEFAULT_BATCH_SIZE, record=True):
+        self.paths = list(paths)
+        self.count = count
+        self.period_ns = period_ns
+        self.streams = streams
+        self.first_sequence = first_sequence
+        self.seed = seed
+        self.batch_size = batch_size
+        self.truth = GroundTruth(len(self.paths), streams, count) if record else None
+        self._rng = None
+        self._bursts = None     # per path: burst mask drawn past the last batch
+
+    def batches(self):
+        """Yield EventBatch arrays in time order until every slot is sent"""
+        rng = self._rng = np.random.default_rng(self.seed)
+        self._bursts = [np.zeros(0, dtype=bool) for _ in self.paths]
+        carry = None
+        for start in range(0, self.count, self.batch_size):
+            index = np.arange(start, min(start + self.batch_size, self.count))
+            parts = [] if carry is None else [carry]
+            for path, model in enumerate(self.paths):
+                parts.extend(self._path_events(rng, path, model, index))
+            events = EventBatch(*(np.concatenate(column) for column in zip(*parts)))
+            order = np.argsort(events.time_ns, kind='stable')
+            events = EventBatch(*(column[order] for column in events))
+            if index[-1] + 1 < self.count:
+                due = np.searchsorted(events.time_ns, (index[-1] + 1) * self.period_ns)
+            else:
+                due = len(events)
+            carry = EventBatch(*(column[due:] for column in events))
+            if due:
+                events = EventBatch(*(column[:due] for column in events))
+                if self.truth is not None:
+                    self.truth.add(events)
+                yield events
+
+    def events(self):
+        """Pacer schedule: (offset_ns, (path, index, sequence)) per frame"""
+        for events in self.batches():
+            yield from zip(events.time_ns.tolist(),
+                           zip(events.path.tolist(), events.index.tolist(),
+                               events.sequence.tolist()))
+
+    def _path_events(self, rng, path, model, index):
+        """Departures of one path for a batch of slots"""
+        n = len(index)
+        nominal = index * self.period_ns
+        sequence = (self.first_sequence + index // self.streams) & SEQ_MASK
+
+        kept = np.ones(n, dtype=bool)
+        if model.loss:
+            kept &= rng.random(n) >= model.loss
+        if model.burst_loss:
+            kept &= ~self._burst_mask(rng, path, model, n)
+
+        delay = np.full(n, model.delay * 1e9)
+        if model.jitter:
+            delay += _jitter(rng, model.jitter_distribution, model.jitter * 1e9, n)
+        if model.reorder:
+            held = rng.random(n) < model.reorder
+            delay += held * rng.integers(1, model.reorder_depth + 1, n) * float(self.period_ns)
+        time_ns = nominal + delay.astype(np.int64)
+
+        kind = np.full(n, COPY, dtype=np.uint8)
+        if model.rogue:
+            rogue = rng.random(n) < model.rogue
+            # At least a quarter of the sequence space from the true number
+            offset = rng.integers(SEQ_SPACE // 4, 3 * SEQ_SPACE // 4, n)
+            sequence = np.where(rogue, (sequence + offset) & SEQ_MASK, sequence)
+            kind[rogue] = ROGUE_COPY
+        sequence = sequence.astype(np.uint16)
+        paths = np.full(n, path, dtype=np.uint8)
+        events = [(time_ns[kept], paths[kept], index[kept], sequence[kept], kind[kept])]
+
+        if model.duplicate:
+            twice = kept & (rng.random(n) < model.duplicate)
+            # The extra copy follows within one slot
+            extra = rng.integers(0, max(self.period_ns, 1), n)
+            events.append(((time_ns + extra)[twice], paths[twice], index[twice],
+                           sequence[twice], np.full(twice.sum(), DUPLICATE, dtype=np.uint8)))
+        return events
+
+    def _burst_mask(self, rng, path, model, n):
+        """Next n slots of the path's Gilbert-Elliott loss state
+
+        Good and bad run lengths are drawn in pairs from geometric
+        distributions and expanded with np.repeat; slots drawn past this
+        batch are kept for the next one.
+        """
+        parts = [self._bursts[path]]
+        total = len(parts[0])
+        cycle = 1 / model.burst_loss + model.burst_length
+        while total < n:
+            pairs = int((n - total) / cycle) + 2
+            runs = np.column_stack((rng.geometric(model.burst_loss, pairs),
+                                    rng.geometric(1 / model.burst_length, pairs))).ravel()
+            parts.append(np.repeat(np.tile([False, True], pairs), runs))
+            total += int(runs.sum())
+        mask = np.concatenate(parts)
+        self._bursts[path] = mask[n:]
+        return mask[:n]
+
+
+def _jitter(rng, distribution, scale, n):
+    """Non-negative extra delays in ns"""
+    if distribution == 'uniform':
+        return rng.uniform(0.0, scale, n)
+    if distribution == 'normal':
+        return np.abs(rng.normal(0.0, scale, n))
+    return rng.exponential(scale, n)
+
+
+class GroundTruth:
+    """Every frame a schedule sent, in send order, and what must come of it
+
+    expected() runs the departures through a reference eliminator, a
+    plain set-based VectorRecoveryAlgorithm over unwrapped sequence
+    numbers, and returns the counters each stream must show at the
+    receiver: the score of an analyzer run is an exact comparison.
+    """
+
+    def __init__(self, paths, streams, slots):
+        self.paths = paths
+        self.streams = streams
+        self.slots = slots
+        self._batches = []
+        self._events = None
+
+    def add(self, events):
+        self._batches.append(EventBatch(
+            events.time_ns, events.path, events.index.astype(np.uint32),
+            events.sequence, events.kind))
+        self._events = None
+
+    @property
+    def events(self):
+        """All departures as one EventBatch"""
+        if self._events is None:
+            if self._batches:
+                self._events = EventBatch(*(np.concatenate(column)
+                                            for column in zip(*self._batches)))
+            else:
+                self._events = EventBatch(np.zeros(0, np.int64), np.zeros(0, np.uint8),
+                                          np.zeros(0, np.uint32), np.zeros(0, np.uint16),
+                                          np.zeros(0, np.uint8))
+            self._batches = [self._events]
+        return self._events
+
+    @property
+    def frames(self):
+        return len(self.events)
+
+    def summary(self):
+        """What the impairments did, per path and in total"""
+        events = self.events
+        delivered = np.zeros(self.slots, dtype=bool)
+        copies = events.kind != ROGUE_COPY
+        delivered[events.index[copies]] = True
+        per_path = []
+        for path in range(self.paths):
+            mine = events.path == path
+            sent = np.count_nonzero(mine & (events.kind == COPY))
+            rogue = np.count_nonzero(mine & (events.kind == ROGUE_COPY))
+            per_path.append({
+                'frames': int(np.count_nonzero(mine)),
+                'lost': self.slots - sent - rogue,
+                'duplicates': int(np.count_nonzero(mine & (events.kind == DUPLICATE))),
+                'rogue': rogue,
+            })
+        return {
+            'slots': self.slots,
+            'frames': self.frames,
+            'unreached': int(self.slots - delivered.sum()),
+            'paths': per_path,
+        }
+
+    def expected(self, history_length=DEFAULT_HISTORY_LENGTH,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT):
+        """Counters each stream must report, as lists indexed like COUNTER_NAMES"""
+        events = self.events
+        counters = [[0] * len(COUNTER_NAMES) for _ in range(self.streams)]
+        # Per stream: [top position, lowest tracked position, passed positions,
+        # time of the last pass]; top is None until a frame is taken
+        states = [[None, 0, set(), 0.0] for _ in range(self.streams)]
+        streams = self.streams
+        for time_ns, index, sequence in zip(events.time_ns.tolist(),
+                                            events.index.tolist(),
+                                            events.sequence.tolist()):
+            stream = index % streams
+            state = states[stream]
+            count = counters[stream]
+            now = time_ns / 1e9
+            top = state[0]
+            if (top is not None and reset_timeout is not None
+                    and now - state[3] > reset_timeout):
+                count[RESETS] += 1
+                top = state[0] = None
+            if top is None:
+                state[0] = state[1] = sequence
+                state[2] = {sequence}
+                state[3] = now
+                count[PASSED] += 1
+                continue
+            delta = ((sequence - top + SEQ_HALF) & SEQ_MASK) - SEQ_HALF
+            if abs(delta) >= history_length:
+                count[ROGUE] += 1
+                continue
+            position = top + delta
+            passed = state[2]
+            if delta <= 0:
+                if position in passed:
+                    count[DISCARDED] += 1
+                    continue
+                if delta:
+                    count[OUT_OF_ORDER] += 1
+                    state[1] = min(state[1], position)
+            else:
+                low = position - history_length + 1
+                for old in range(state[1], low):
+                    if old in passed:
+                        passed.discard(old)
+                    else:
+                        count[LOST] += 1
+                state[1] = max(state[1], low)
+                state[0] = position
+            passed.add(position)
+            state[3] = now
+            count[PASSED] += 1
+        return counters
+
+    def save(self, path):
+        """Write the departures to an .npz file"""
+        events = self.events
+        np.savez_compressed(path, paths=self.paths, streams=self.streams,
+                            slots=self.slots, **events._asdict())
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            truth = cls(int(data['paths']), int(data['streams']), int(data['slots']))
+            truth.add(EventBatch(*(data[name] for name in EventBatch._fields)))
+        return truth
+
+
+def score(expected, received):
+    """Mismatches of received counters: [(counter, expected, received), ...]"""
+    return [(counter, expected[counter], received[counter])
+            for counter in SCORED if expected[counter] != received[counter]]
+
+
+def stream_templates(streams, src_mac=IMPAIR_SRC_MAC, payload_size=64):
+    """Frame templates of the schedule's streams, one UDP source port each"""
+    templates = []
+    for stream in range(streams):
+        template = FrameTemplate(src_mac, src_port=FIRST_SRC_PORT + stream,
+                                 probe_stream=stream + 1)
+        template.set_payload(b"X" * max(payload_size - len(template), 0))
+        templates.append(template)
+    return templates
+
+
+def write_capture(path, schedule, templates, start_ns=CAPTURE_START_NS):
+    """Write a schedule's departures to a pcap, each stamped with its send time"""
+    streams = schedule.streams
+    with PcapWriter(path) as writer:
+        for events in schedule.batches():
+            for time_ns, path_id, index, sequence in zip(
+                    events.time_ns.tolist(), events.path.tolist(),
+                    events.index.tolist(), events.sequence.tolist()):
+                timestamp_ns = start_ns + time_ns
+                frame = templates[index % streams].build(sequence, path_id=path_id,
+                                                         tx_ns=timestamp_ns)
+                writer.write(frame, timestamp_ns)
+        return writer.frames
+
+
+def score_capture(path, schedule, templates):
+    """Analyze a written capture and compare it with the schedule's truth
+
+    Returns {stream: [(counter, expected, received), ...]} of mismatches.
+    """
+    from frer_analysis_tool import FRERAnalyzer
+
+    analyzer = FRERAnalyzer(verbose=False)
+    with PcapReader(path) as reader:
+        reader.replay(analyzer.analyze_frame)
+    snapshot = analyzer.snapshot()
+    counters = {snapshot['stream_keys'][handle]: values
+                for handle, values in snapshot['stream_counters'].items()}
+    table = StreamIdentificationTable(IP_STREAM_ID)
+    results = {}
+    for stream, expected in enumerate(schedule.truth.expected(analyzer.history_length,
+                                                              analyzer.reset_timeout)):
+        frame = templates[stream].build(0)
+        received = counters.get(table.frame_key(frame, decode_rtag(frame)),
+                                [0] * len(COUNTER_NAMES))
+        results[stream] = (expected, received, score(expected, received))
+    return results
+
+
+def _per_path(text, paths, convert=float):
+    """'a,b' gives one value per path; a single value applies to all"""
+    values = [convert(value) for value in text.split(',')]
+    if len(values) == 1:
+        values *= paths
+    if len(values) != paths:
+        raise ValueError(f"{text}: expected 1 or {paths} values")
+    return values
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Write an impaired FRER capture and score the analyzer on it")
+    parser.add_argument('pcap', nargs='?', help="capture to write (default: temporary)")
+    parser.add_argument('--sequences', type=int, default=100000)
+    parser.add_argument('--streams', type=int, default=4)
+    parser.add_argument('--paths', type=int, default=2)
+    parser.add_argument('--rate', type=float, default=100000.0, help="sequences/s")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--loss', default='0')
+    parser.add_argument('--burst-loss', default='0')
+    parser.add_argument('--burst-length', default='1')
+    parser.add_argument('--delay', default='0', help="seconds, per path")
+    parser.add_argument('--jitter', default='0', help="seconds, per path")
+    parser.add_argument('--jitter-distribution', default='uniform')
+    parser.add_argument('--reorder', default='0')
+    parser.add_argument('--reorder-depth', default='4')
+    parser.add_argument('--duplicate', default='0')
+    parser.add_argument('--rogue', default='0')
+    parser.add_argument('--truth', help="save the ground truth to this .npz file")
+    args = parser.parse_args()
+
+    n = args.paths
+    try:
+        options = zip(_per_path(args.loss, n), _per_path(args.burst_loss, n),
+                      _per_path(args.burst_length, n), _per_path(args.delay, n),
+                      _per_path(args.jitter, n), _per_path(args.jitter_distribution, n, str),
+                      _per_path(args.reorder, n), _per_path(args.reorder_depth, n, int),
+                      _per_path(args.duplicate, n), _per_path(args.rogue, n))
+        paths = [PathImpairment(*values) for values in options]
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+
+    print("=" * 60)
+    print("🧪 FRER PATH IMPAIRMENT")
+    print("=" * 60)
+    for path, model in enumerate(paths):
+        print(f"Path {path}: {model.describe()}")
+
+    schedule = ImpairedSchedule(paths, args.sequences, round(1e9 / args.rate),
+                                streams=args.streams, seed=args.seed)
+    templates = stream_templates(args.streams)
+    temporary = args.pcap is None
+    pcap = args.pcap or tempfile.mkstemp(suffix='.pcap')[1]
+    try:
+        frames = write_capture(pcap, schedule, templates)
+        summary = schedule.truth.summary()
+        print(f"\nWrote {frames} frames for {args.sequences} sequences"
+              f" ({summary['unreached']} with no copy)")
+        for path, counts in enumerate(summary['paths']):
+            print(f"  Path {path}: {counts['frames']} frames, {counts['lost']} lost, "
+                  f"{counts['duplicates']} duplicated, {counts['rogue']} rogue")
+        if args.truth:
+            schedule.truth.save(args.truth)
+            print(f"Ground truth saved to {args.truth}")
+
+        results = score_capture(pcap, schedule, templates)
+    finally:
+        if temporary:
+            os.unlink(pcap)
+
+    print(f"\n{'Stream':<8}" + "".join(f"{COUNTER_NAMES[c]:>14}" for c in SCORED))
+    failed = 0
+    for stream, (expected, received, mismatches) in results.items():
+        print(f"{stream:<8}" + "".join(f"{received[c]:>14}" for c in SCORED))
+        for counter, want, got in mismatches:
+            print(f"  ❌ {COUNTER_NAMES[counter]}: expected {want}, analyzer {got}")
+        failed += bool(mismatches)
+    if failed:
+        print(f"\n❌ {failed} of {len(results)} streams differ from the ground truth")
+        sys.exit(1)
+    print(f"\n✅ All {len(results)} streams match the ground truth exactly")
+
+
+if __name__ == "__main__":
+    main()
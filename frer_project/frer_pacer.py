@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+FRER Pacer - Absolute-deadline traffic pacing on the monotonic clock
+Sleeps most of the way to each deadline and busy-waits the rest
+"""
+
+import heapq
+import itertools
+import time
+from collections import namedtuple
+
+from frer_stats import LogHistogram
+
+# Wakeups from time.sleep() land 50-100µs late (timer slack); the last
+# stretch before a deadline is spent polling the clock instead
+DEFAULT_SPIN_NS = 150000
+# A frame sent this long after its deadline counts as late
+DEFAULT_LATE_NS = 20000
+
+
+def sleep_until(deadline_ns, spin_ns=DEFAULT_SPIN_NS):
+    """Wait until time.monotonic_ns() reaches deadline_ns"""
+    remaining = deadline_ns - time.monotonic_ns()
+    if remaining > spin_ns:
+        time.sleep((remaining - spin_ns) / 1e9)
+    while time.monotonic_ns() < deadline_ns:
+        pass
+
+
+def constant_rate(pps):
+    """Schedule of one frame every 1/pps seconds: (offset_ns, frame index)"""
+    period = 1e9 / pps
+    for index in itertools.count():
+        # From the index, not by adding periods: rounding never accumulates
+        yield round(index * period), index
+
+
+def bursts(burst_size, pps):
+    """Bursts of burst_size back-to-back frames averaging pps frames/s"""
+    interval = burst_size * 1e9 / pps
+    for index in itertools.count():
+        yield round(index // burst_size * interval), index
+
+
+def periodic(periods_ns, phases_ns=None, counts=None):
+    """Merged schedule of periodic streams: (offset_ns, stream index)
+
+    Stream i sends every periods_ns[i], starting at phases_ns[i], as in a
+    TSN cycle, and stops after counts[i] frames if counts is given. List
+    the streams highest priority first: frames due at the same instant go
+    out in stream order.
+    """
+    phases = phases_ns or [0] * len(periods_ns)
+    heap = [(phase, index, 0) for index, phase in enumerate(phases)
+            if counts is None or counts[index] > 0]
+    heapq.heapify(heap)
+    while heap:
+        offset, index, count = heap[0]
+        yield offset, index
+        count += 1
+        if counts is not None and count >= counts[index]:
+            heapq.heappop(heap)
+        else:
+            heapq.heapreplace(heap, (phases[index] + count * periods_ns[index],
+                                     index, count))
+
+
+class PaceReport(namedtuple('PaceReport', 'frames elapsed lateness late')):
+    """Achieved rate and send-time jitter of a paced run"""
+
+    __slots__ = ()
+
+    @property
+    def pps(self):
+        # elapsed spans first to last send: frames - 1 intervals
+        return (self.frames - 1) / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self):
+        return (f"{self.frames} frames in {self.elapsed:.3f}s: {self.pps:,.1f} pps, "
+                f"{self.late} late; send time - deadline: "
+                f"{self.lateness.summary(1000, 'µs')}")
+
+
+class Pacer:
+    """Runs a schedule against absolute deadlines from one start time
+
+    run() calls send(tag) for every (offset_ns, tag) of the schedule at
+    start + offset_ns, and flush() once the frames due at that moment are
+    queued, so a burst costs one syscall. Each deadline is fixed up front,
+    so an oversleep or a slow send() delays one frame instead of shifting
+    every later one. Frames that are already due are sent at once.
+    """
+
+    def __init__(self, spin_ns=DEFAULT_SPIN_NS, late_ns=DEFAULT_LATE_NS):
+        self.spin_ns = spin_ns
+        self.late_ns = late_ns
+        self.lateness = LogHistogram()  # ns from deadline to send()
+        self.frames = 0
+        self.late = 0       # frames sent more than late_ns after deadline
+        self.first_ns = None
+        self.last_ns = None
+
+    def run(self, schedule, send, flush=None, count=None, duration=None):
+        """Send count frames or for duration seconds; returns a PaceReport"""
+        start = time.monotonic_ns()
+        end = start + int(duration * 1e9) if duration is not None else None
+        record = self.lateness.record
+        pending = False
+        for offset, tag in schedule:
+            if count is not None and self.frames >= count:
+                break
+            deadline = start + offset
+            if end is not None and deadline > end:
+                break
+            now = time.monotonic_ns()
+            if now < deadline:
+                if pending and flush is not None:
+                    flush()
+                    pending = False
+                sleep_until(deadline, self.spin_ns)
+                now = time.monotonic_ns()
+            send(tag)
+            pending = True
+            if self.first_ns is None:
+                self.first_ns = now
+            self.last_ns = now
+            self.frames += 1
+            lateness = now - deadline
+            record(lateness)
+            if lateness > self.late_ns:
+                self.late += 1
+        if pending and flush is not None:
+            flush()
+        return self.report()
+
+    def report(self):
+        elapsed = 0.0
+        if self.first_ns is not None:
+            elapsed = (self.last_ns - self.first_ns) / 1e9
+        return PaceReport(self.frames, elapsed, self.lateness, self.late)
+
+
+class GapTimer:
+    """Per-frame gaps measured from one running deadline
+
+    wait(gap) returns gap seconds after the previous deadline rather than
+    after the call, so the time spent sending and oversleeping does not
+    add up over a sequence; after a stall the next frames go out early
+    until the schedule is met again. The first deadline is the first call.
+    """
+
+    def __init__(self, spin_ns=DEFAULT_SPIN_NS):
+        self.spin_ns = spin_ns
+        self.deadline = None
+
+    def wait(self, gap):
+        if self.deadline is None:
+            self.deadline = time.monotonic_ns()
+        self.deadline += round(gap * 1e9)
+        sleep_until(self.deadline, self.spin_ns)
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+FRER Offline Input - Memory-mapped pcap/pcapng reader and pcap writer
+Walks capture records in place and feeds frames to the analyzer pipeline
+"""
+
+import mmap
+import struct
+
+LINKTYPE_ETHERNET = 1
+
+# Classic pcap magic numbers (as read little-endian)
+PCAP_MAGIC_USEC = 0xA1B2C3D4
+PCAP_MAGIC_NSEC = 0xA1B23C4D
+
+# pcapng block types
+PCAPNG_SHB = 0x0A0D0D0A
+PCAPNG_IDB = 0x00000001
+PCAPNG_SPB = 0x00000003
+PCAPNG_EPB = 0x00000006
+PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+PCAPNG_OPT_ENDOFOPT = 0
+PCAPNG_OPT_IF_TSRESOL = 9
+
+_PCAP_HEADER = struct.Struct('<IHHiIII')
+_PCAP_RECORD = struct.Struct('<IIII')
+
+
+class PcapReader:
+    """Zero-copy reader for pcap and pcapng Ethernet captures
+
+    The file is mapped read-only and records are handed out as memoryview
+    slices of the mapping, so multi-gigabyte captures are processed at
+    page-cache speed without loading them into memory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file
+            self._file.close()
+            raise ValueError(f"{path}: empty capture file")
+        if hasattr(self._mmap, 'madvise'):
+            self._mmap.madvise(mmap.MADV_SEQUENTIAL)
+        self._view = memoryview(self._mmap)
+
+        magic = self._view[:4].tobytes()
+        if len(magic) < 4:
+            self.close()
+            raise ValueError(f"{path}: not a pcap or pcapng file")
+        if magic == struct.pack('<I', PCAPNG_SHB):
+            self.format = 'pcapng'
+        elif struct.unpack('<I', magic)[0] in (PCAP_MAGIC_USEC, PCAP_MAGIC_NSEC):
+            self.format = 'pcap'
+            self._endian = '<'
+        elif struct.unpack('>I', magic)[0] in (PCAP_MAGIC_USEC, PCAP_MAGIC_NSEC):
+            self.format = 'pcap'
+            self._endian = '>'
+        else:
+            self.close()
+            raise ValueError(f"{path}: not a pcap or pcapng file")
+
+    def replay(self, handler, max_frames=None):
+        """Call handler(frame, vlan_tci, timestamp_ns) for every Ethernet frame
+
+        Frames are memoryviews into the mapping and are only valid while
+        the reader is open. Returns the number of frames delivered.
+        """
+        if self.format == 'pcap':
+            return self._replay_pcap(handler, max_frames)
+        return self._replay_pcapng(handler, max_frames)
+
+    def _replay_pcap(self, handler, max_frames):
+        view = self._view
+        size = len(view)
+        endian = self._endian
+        magic, _, _, _, _, _, linktype = struct.unpack_from(endian + 'IHHiIII', view, 0)
+        if linktype != LINKTYPE_ETHERNET:
+            raise ValueError(f"{self.path}: unsupported link type {linktype}")
+        ts_scale = 1 if magic == PCAP_MAGIC_NSEC else 1000
+
+        record = struct.Struct(endian + 'IIII')
+        offset = 24
+        frames = 0
+        while offset + 16 <= size:
+            if max_frames is not None and frames >= max_frames:
+                break
+            sec, frac, caplen, _ = record.unpack_from(view, offset)
+            offset += 16
+            end = offset + caplen
+            if end > size:
+                # Truncated last record
+                break
+            handler(view[offset:end], None, sec * 1000000000 + frac * ts_scale)
+            offset = end
+            frames += 1
+        return frames
+
+    def _replay_pcapng(self, handler, max_frames):
+        view = self._view
+        size = len(view)
+        offset = 0
+        frames = 0
+        endian = '<'
+        block_header = struct.Struct('<II')
+        epb = struct.Struct('<IIIII')
+        interfaces = []  # per section: (linktype, ts_units_per_second)
+
+        while offset + 12 <= size:
+            if max_frames is not None and frames >= max_frames:
+                break
+            block_type = struct.unpack_from('<I', view, offset)[0]
+            if block_type == PCAPNG_SHB:
+                # Section header: byte order decides the rest of the section
+                bom = struct.unpack_from('<I', view, offset + 8)[0]
+                endian = '<' if bom == PCAPNG_BYTE_ORDER_MAGIC else '>'
+                block_header = struct.Struct(endian + 'II')
+                epb = struct.Struct(endian + 'IIIII')
+                interfaces = []
+            block_type, block_len = block_header.unpack_from(view, offset)
+            if block_len < 12 or offset + block_len > size:
+                # Corrupt or truncated block
+                break
+            body = offset + 8
+
+            if block_type == PCAPNG_EPB:
+                if_id, ts_high, ts_low, caplen, _ = epb.unpack_from(view, body)
+                if if_id >= len(interfaces):
+                    # Packet for an interface never described: corrupt
+                    break
+                linktype, ts_rate = interfaces[if_id]
+                if linktype == LINKTYPE_ETHERNET:
+                    ts = (ts_high << 32) | ts_low
+                    if ts_rate == 1000000000:
+                        ts_ns = ts
+                    else:
+                        ts_ns = ts * 1000000000 // ts_rate
+                    start = body + 20
+                    handler(view[start:start + caplen], None, ts_ns)
+                    frames += 1
+            elif block_type == PCAPNG_SPB:
+                if not interfaces:
+                    break
+                linktype, _ = interfaces[0]
+                if linktype == LINKTYPE_ETHERNET:
+                    orig_len = struct.unpack_from(endian + 'I', view, body)[0]
+                    caplen = min(orig_len, block_len - 16)
+                    handler(view[body + 4:body + 4 + caplen], None, None)
+                    frames += 1
+            elif block_type == PCAPNG_IDB:
+                linktype = struct.unpack_from(endian + 'H', view, body)[0]
+                interfaces.append((linktype, self._idb_ts_rate(
+                    view, body + 8, offset + block_len - 4, endian)))
+
+            offset += block_len
+        return frames
+
+    @staticmethod
+    def _idb_ts_rate(view, offset, end, endian):
+        """Timestamp units per second from the if_tsresol option"""
+        option = struct.Struct(endian + 'HH')
+        while offset + 4 <= end:
+            code, length = option.unpack_from(view, offset)
+            if code == PCAPNG_OPT_ENDOFOPT:
+                break
+            if code == PCAPNG_OPT_IF_TSRESOL and length >= 1:
+                resol = view[offset + 4]
+                if resol & 0x80:
+                    return 1 << (resol & 0x7F)
+                return 10 ** resol
+            offset += 4 + ((length + 3) & ~3)
+        return 1000000  # default: microseconds
+
+    def close(self):
+        self._view.release()
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PcapWriter:
+    """Classic pcap writer with nanosecond timestamps
+
+    Records are written through a large buffer; the files are read back
+    by PcapReader, Wireshark and tcpdump.
+    """
+
+    def __init__(self, path, snaplen=0xFFFF, linktype=LINKTYPE_ETHERNET):
+        self.path = path
+        self.snaplen = snaplen
+        self.frames = 0
+        self.bytes = 0
+        self._file = open(path, 'wb', buffering=1 << 20)
+        self._file.write(_PCAP_HEADER.pack(PCAP_MAGIC_NSEC, 2, 4, 0, 0,
+                                           snaplen, linktype))
+
+    def write(self, frame, timestamp_ns):
+        """Append one frame captured at timestamp_ns"""
+        length = len(frame)
+        caplen = min(length, self.snaplen)
+        sec, nsec = divmod(timestamp_ns, 1000000000)
+        self._file.write(_PCAP_RECORD.pack(sec, nsec, caplen, length))
+        self._file.write(frame[:caplen])
+        self.frames += 1
+        self.bytes += caplen
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
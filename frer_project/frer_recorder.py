@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+FRER Capture Recorder - Columnar per-frame records for post-run analysis
+Fills preallocated column buffers and writes full chunks from a background thread
+"""
+
+import sys
+import os
+import glob
+import json
+import queue
+import threading
+import time
+from array import array
+
+import numpy as np
+
+# (column, array typecode, NumPy dtype)
+COLUMNS = (
+    ('timestamp_ns', 'q', np.int64),   # capture timestamp, or monotonic clock
+    ('member', 'b', np.int8),          # capture interface index, -1 if unknown
+    ('stream', 'I', np.uint32),        # stream handle
+    ('sequence', 'i', np.int32),       # R-TAG sequence number, -1 if tagless
+    ('vlan', 'h', np.int16),           # VLAN ID, -1 if untagged
+    ('pcp', 'b', np.int8),             # priority, -1 if untagged
+    ('length', 'H', np.uint16),        # frame length in bytes
+    ('decision', 'b', np.int8),        # DISCARDED, PASSED or TAGLESS
+)
+COLUMN_NAMES = tuple(name for name, _, _ in COLUMNS)
+
+# decision column values
+DISCARDED = 0
+PASSED = 1
+TAGLESS = 2
+
+DEFAULT_CHUNK_ROWS = 1 << 20   # ~23 MiB of columns per chunk
+DEFAULT_BUFFERS = 4            # chunks that can wait for the writer
+META_FILE = 'recording.json'
+
+
+def _chunk_path(directory, chunk, column):
+    return os.path.join(directory, f"chunk-{chunk:08d}.{column}.npy")
+
+
+class CaptureRecorder:
+    """Per-frame records in columnar .npy chunks
+
+    record() stores one frame's fields at the next row of preallocated
+    column arrays, a few array stores and no allocation. A full set of
+    columns is handed to a writer thread, which saves one .npy file per
+    column and returns the buffers to the pool. If the writer falls
+    behind and no buffer is free, frames are counted in dropped instead
+    of stalling the capture loop. close() writes the remaining rows and
+    the recording metadata.
+    """
+
+    def __init__(self, directory, members=(), chunk_rows=DEFAULT_CHUNK_ROWS,
+                 buffers=DEFAULT_BUFFERS):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.members = list(members)
+        self.chunk_rows = chunk_rows
+        self.stream_keys = {}   # handle -> packed key, for streams later forgotten
+        self.rows = 0           # rows written to disk
+        self.chunks = 0
+        self.dropped = 0
+        self.error = None
+        self.closed = False
+        self._chunk = 0
+        self._columns = None
+        self._free = queue.Queue()
+        self._full = queue.Queue()
+        for _ in range(buffers):
+            self._free.put(tuple(array(code, bytes(array(code).itemsize * chunk_rows))
+                                 for _, code, _ in COLUMNS))
+        self._use(self._free.get())
+        self._writer = threading.Thread(target=self._write_chunks, daemon=True)
+        self._writer.start()
+
+    def _use(self, columns):
+        self._columns = columns
+        (self._timestamp, self._member, self._stream, self._sequence,
+         self._vlan, self._pcp, self._length, self._decision) = columns
+        self.count = 0
+
+    def record(self, timestamp_ns, member, stream, sequence, vlan, pcp, length, decision):
+        """Append one frame; None for member, vlan or pcp is stored as -1"""
+        i = self.count
+        if i == self.chunk_rows and not self._next_buffer():
+            self.dropped += 1
+            return
+        i = self.count
+        self._timestamp[i] = timestamp_ns
+        self._member[i] = -1 if member is None else member
+        self._stream[i] = stream
+        self._sequence[i] = sequence
+        self._vlan[i] = -1 if vlan is None else vlan
+        self._pcp[i] = -1 if pcp is None else pcp
+        self._length[i] = length
+        self._decision[i] = decision
+        self.count = i + 1
+
+    def record_tagless(self, timestamp_ns, member, stream, vlan, pcp, length):
+        """Append a frame of a known stream that carried no R-TAG"""
+        self.record(timestamp_ns, member, stream, -1, vlan, pcp, length, TAGLESS)
+
+    def _next_buffer(self):
+        """Queue the full buffer for writing and switch to a free one"""
+        if self._columns is not None:
+            self._full.put((self._chunk, self._columns, self.count))
+            self._chunk += 1
+            self._columns = None
+        try:
+            columns = self._free.get_nowait()
+        except queue.Empty:
+            # Writer behind: drop rather than stall the capture loop
+            return False
+        self._use(columns)
+        return True
+
+    def _write_chunks(self):
+        while True:
+            item = self._full.get()
+            if item is None:
+                break
+            chunk, columns, count = item
+            try:
+                for (name, _, dtype), column in zip(COLUMNS, columns):
+                    path = _chunk_path(self.directory, chunk, name)
+                    with open(path + '.tmp', 'wb') as f:
+                        np.save(f, np.frombuffer(column, dtype=dtype, count=count))
+                    # A chunk is complete once every column file exists
+                    os.replace(path + '.tmp', path)
+                self.rows += count
+                self.chunks += 1
+            except Exception as e:
+                # Reported by summary(); the writer keeps serving buffers
+                self.error = e
+            finally:
+                self._free.put(columns)
+
+    def close(self, stream_keys=None):
+        """Write the pending rows and the metadata; stops the writer"""
+        if self.closed:
+            return
+        self.closed = True
+        if self._columns is not None and self.count:
+            self._full.put((self._chunk, self._columns, self.count))
+            self._chunk += 1
+            self._columns = None
+        self._full.put(None)
+        self._writer.join()
+        self.stream_keys.update(stream_keys or {})
+        meta = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'columns': [[name, np.dtype(dtype).name] for name, _, dtype in COLUMNS],
+            'members': self.members,
+            'chunk_rows': self.chunk_rows,
+            'chunks': self.chunks,
+            'rows': self.rows,
+            'dropped': self.dropped,
+            # Packed keys exceed 64 bits: stored as hex
+            'stream_keys': {str(handle): f"{key:x}"
+                            for handle, key in self.stream_keys.items()},
+        }
+        with open(os.path.join(self.directory, META_FILE), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+    def summary(self):
+        text = f"Recorded {self.rows} frames in {self.chunks} chunks to {self.directory}/"
+        if self.dropped:
+            text += f" ({self.dropped} dropped: writer too slow)"
+        if self.error is not None:
+            text += f" ⚠ write error: {self.error}"
+        return text
+
+
+def read_metadata(directory):
+    """Recording metadata, or None for a run that was not closed"""
+    try:
+        with open(os.path.join(directory, META_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def load_recording(directory, columns=None, mmap=False):
+    """DataFrame of a recording, one row per frame in capture order
+
+    columns selects the columns to load (all by default); only their
+    files are read, and with mmap they are mapped instead of read. Chunks
+    missing a column (a run killed mid-write) are skipped. The member
+    column becomes an interface category when the interfaces are known.
+    """
+    import pandas as pd
+
+    names = list(columns or COLUMN_NAMES)
+    chunks = sorted({int(os.path.basename(path).split('.')[0][6:])
+                     for path in glob.glob(os.path.join(directory, 'chunk-*.npy'))})
+    chunks = [chunk for chunk in chunks
+              if all(os.path.exists(_chunk_path(directory, chunk, name)) for name in names)]
+    mode = 'r' if mmap else None
+    data = {}
+    for name in names:
+        parts = [np.load(_chunk_path(directory, chunk, name), mmap_mode=mode)
+                 for chunk in chunks]
+        dtype = dict((column, dtype) for column, _, dtype in COLUMNS)[name]
+        data[name] = np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+    frame = pd.DataFrame(data)
+
+    meta = read_metadata(directory)
+    if meta and meta['members'] and 'member' in frame:
+        frame['interface'] = pd.Categorical.from_codes(
+            frame['member'], categories=meta['members'])
+    return frame
+
+
+def print_recording(directory, plot=None):
+    """Summary of a recording per interface and stream; optional rate plot"""
+    meta = read_metadata(directory)
+    frame = load_recording(directory)
+
+    print("=" * 60)
+    print("🗂  FRER RECORDING")
+    print("=" * 60)
+    print(f"Directory: {directory}")
+    if meta is None:
+        print("⚠ No metadata: the run did not finish, complete chunks only")
+    elif meta['dropped']:
+        print(f"⚠ {meta['dropped']} frames were dropped while recording")
+    print(f"Frames: {len(frame)}")
+    if not len(frame):
+        return
+    span = (frame['timestamp_ns'].max() - frame['timestamp_ns'].min()) / 1e9
+    print(f"Time span: {span:.3f}s")
+
+    decisions = frame['decision']
+    if 'interface' in frame:
+        print("\nPer interface:")
+        by_interface = frame.groupby('interface', observed=False)['decision']
+        print(by_interface.agg(frames='size',
+                               passed=lambda d: (d == PASSED).sum()).to_string())
+
+    print("\nPer stream:")
+    streams = frame.assign(passed=decisions == PASSED,
+                           discarded=decisions == DISCARDED,
+                           tagless=decisions == TAGLESS).groupby('stream').agg(
+        frames=('decision', 'size'), passed=('passed', 'sum'),
+        discarded=('discarded', 'sum'), tagless=('tagless', 'sum'),
+        vlan=('vlan', 'first'), first_ns=('timestamp_ns', 'min'),
+        last_ns=('timestamp_ns', 'max'))
+    print(streams.to_string())
+
+    if plot:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+
+        seconds = (frame['timestamp_ns'] - frame['timestamp_ns'].min()) / 1e9
+        bins = np.linspace(0, max(span, 1e-9), 200)
+        fig, ax = plt.subplots(figsize=(10, 4))
+        groups = frame.groupby('interface', observed=False) if 'interface' in frame else [("all", frame)]
+        for name, group in groups:
+            counts, edges = np.histogram(seconds[group.index], bins)
+            ax.plot(edges[:-1], counts / (edges[1] - edges[0]), label=f"{name} received")
+        counts, edges = np.histogram(seconds[decisions == PASSED], bins)
+        ax.plot(edges[:-1], counts / (edges[1] - edges[0]), 'k--', label="passed")
+        ax.set_xlabel("time (s)")
+        ax.set_ylabel("frames/s")
+        ax.legend()
+        fig.tight_layout()
+        fig.savefig(plot)
+        print(f"\nRate plot saved to {plot}")
+
+
+if __name__ == "__main__":
+    # Usage: frer_recorder.py <recording directory> [--plot rates.png]
+    plot = None
+    if "--plot" in sys.argv:
+        position = sys.argv.index("--plot")
+        plot = sys.argv[position + 1]
+        del sys.argv[position:position + 2]
+    if len(sys.argv) < 2:
+        print("Usage: frer_recorder.py <recording directory> [--plot rates.png]")
+        sys.exit(2)
+    print_recording(sys.argv[1], plot)
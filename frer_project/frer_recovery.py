@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+FRER Sequence Recovery - IEEE 802.1CB VectorRecoveryAlgorithm
+Bounded per-stream duplicate elimination with 16-bit wraparound
+"""
+
+import time
+from array import array
+
+SEQ_SPACE = 1 << 16             # RecovSeqSpace for the 16-bit R-TAG sequence
+SEQ_MASK = SEQ_SPACE - 1
+SEQ_HALF = SEQ_SPACE >> 1
+
+DEFAULT_HISTORY_LENGTH = 32     # frerSeqRcvyHistoryLength
+DEFAULT_RESET_TIMEOUT = 1.0     # frerSeqRcvyResetMSec, in seconds
+
+# Latent error detection (IEEE 802.1CB 7.4.4)
+DEFAULT_LATENT_ERROR_PATHS = 2          # frerSeqRcvyLatentErrorPaths
+DEFAULT_LATENT_ERROR_DIFFERENCE = 50    # frerSeqRcvyLatentErrorDifference
+DEFAULT_LATENT_ERROR_PERIOD = 2.0       # frerSeqRcvyLatentErrorPeriod, seconds
+DEFAULT_LATENT_RESET_PERIOD = 30.0      # frerSeqRcvyLatentResetPeriod, seconds
+
+# Indexes into SequenceRecovery.counters (frerCpsSeqRcvy*, IEEE 802.1CB 10.8)
+PASSED = 0
+DISCARDED = 1
+OUT_OF_ORDER = 2
+ROGUE = 3
+LOST = 4
+TAGLESS = 5
+RESETS = 6
+LATENT_ERRORS = 7
+LATENT_ERROR_RESETS = 8
+
+COUNTER_NAMES = ('passed', 'discarded', 'out_of_order', 'rogue', 'lost',
+                 'tagless', 'resets', 'latent_errors', 'latent_error_resets')
+
+
+# Table rows keep SequenceHistory in one 64-bit word
+MAX_TABLE_HISTORY = 64
+
+# RecoveryTable.flags bits
+_TAKE_ANY = 1
+_LATENT_ERROR = 2
+_LATENT_STARTED = 4
+
+
+def sequence_delta(sequence, reference):
+    """Signed distance from reference to sequence in 16-bit sequence space"""
+    return ((sequence - reference + SEQ_HALF) & SEQ_MASK) - SEQ_HALF
+
+
+class RecoveryTable:
+    """VectorRecoveryAlgorithm state for many streams (IEEE 802.1CB 7.4.3.4)
+
+    Every variable of the algorithm is an array with one entry per row, so
+    a stream costs row_bytes and no Python object of its own. Rows are
+    added with grow() and handed out by a StreamStateStore; clear() puts a
+    row back in its initial state for the next stream.
+
+    SequenceHistory is a bitmap of history_length bits where bit n records
+    whether RecovSeqNum - n has been passed. Each decision is O(1). A
+    sequence number is counted lost when it leaves the window without
+    having been passed. Latent error detection expects latent_error_paths
+    copies of every frame; set it to None to disable the test.
+    """
+
+    # recov_seq_num, history, fill, flags, last_pass, counters,
+    # base_difference, next_latent_test, next_latent_reset
+    row_bytes = 2 + 8 + 1 + 1 + 8 + 8 * len(COUNTER_NAMES) + 8 + 8 + 8
+
+    def __init__(self, history_length=DEFAULT_HISTORY_LENGTH,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT,
+                 latent_error_paths=DEFAULT_LATENT_ERROR_PATHS,
+                 latent_error_difference=DEFAULT_LATENT_ERROR_DIFFERENCE,
+                 latent_error_period=DEFAULT_LATENT_ERROR_PERIOD,
+                 latent_reset_period=DEFAULT_LATENT_RESET_PERIOD, rows=0):
+        if not 1 <= history_length <= MAX_TABLE_HISTORY:
+            raise ValueError(f"history_length must be in 1..{MAX_TABLE_HISTORY}")
+        self.history_length = history_length
+        self.reset_timeout = reset_timeout
+        self.latent_error_paths = latent_error_paths
+        self.latent_error_difference = latent_error_difference
+        self.latent_error_period = latent_error_period
+        self.latent_reset_period = latent_reset_period
+        self._window_mask = (1 << history_length) - 1
+
+        self.recov_seq_num = array('H')
+        self.history = array('Q')
+        self.fill = array('B')          # window positions filled since reset
+        self.flags = array('B')
+        self.last_pass = array('d')
+        self.counters = array('Q')      # len(COUNTER_NAMES) per row
+        self.base_difference = array('q')
+        self.next_latent_test = array('d')
+        self.next_latent_reset = array('d')
+        self.rows = 0
+        self.grow(rows)
+
+    def grow(self, rows):
+        """Add rows in their initial state"""
+        self.recov_seq_num.extend(array('H', [SEQ_MASK]) * rows)
+        self.history.extend(array('Q', bytes(8 * rows)))
+        self.fill.extend(bytes(rows))
+        self.flags.extend(array('B', [_TAKE_ANY]) * rows)
+        self.last_pass.extend(array('d', bytes(8 * rows)))
+        self.counters.extend(array('Q', bytes(8 * len(COUNTER_NAMES) * rows)))
+        self.base_difference.extend(array('q', bytes(8 * rows)))
+        self.next_latent_test.extend(array('d', bytes(8 * rows)))
+        self.next_latent_reset.extend(array('d', bytes(8 * rows)))
+        self.rows += rows
+
+    def clear(self, row):
+        """Initial state and zero counters: the row is reused for a new stream"""
+        self.recov_seq_num[row] = SEQ_MASK
+        self.history[row] = 0
+        self.fill[row] = 0
+        self.flags[row] = _TAKE_ANY
+        self.last_pass[row] = 0.0
+        start = row * len(COUNTER_NAMES)
+        self.counters[start:start + len(COUNTER_NAMES)] = array(
+            'Q', bytes(8 * len(COUNTER_NAMES)))
+        self.base_difference[row] = 0
+
+    def row_counters(self, row):
+        """Copy of a row's counters, indexed by PASSED, DISCARDED, ..."""
+        start = row * len(COUNTER_NAMES)
+        return self.counters[start:start + len(COUNTER_NAMES)]
+
+    def add_counters(self, row, values):
+        """Add counter values (e.g. from another analyzer) to a row"""
+        base = row * len(COUNTER_NAMES)
+        for index, value in enumerate(values):
+            self.counters[base + index] += value
+
+    def latent_error(self, row):
+        return bool(self.flags[row] & _LATENT_ERROR)
+
+    def reset(self, row):
+        """SequenceRecoveryReset: accept the next frame unconditionally"""
+        self.recov_seq_num[row] = SEQ_MASK
+        self.history[row] = 0
+        self.fill[row] = 0
+        self.flags[row] |= _TAKE_ANY
+        self.counters[row * len(COUNTER_NAMES) + RESETS] += 1
+
+    def tagless(self, row):
+        """Count a frame of this stream that carried no sequence number"""
+        self.counters[row * len(COUNTER_NAMES) + TAGLESS] += 1
+
+    def accept(self, row, sequence, now):
+        """Return True if the frame passes, False if it is discarded
+
+        now is in seconds, on any clock that is consistent for the table.
+        """
+        counters = self.counters
+        base = row * len(COUNTER_NAMES)
+        flags = self.flags[row]
+
+        if self.latent_error_paths is not None:
+            if not flags & _LATENT_STARTED:
+                # Latent error timers start with the first frame
+                self.next_latent_test[row] = now + self.latent_error_period
+                self.next_latent_reset[row] = now + self.latent_reset_period
+                flags |= _LATENT_STARTED
+                self.flags[row] = flags
+            elif now >= self.next_latent_test[row]:
+                self._latent_error_test(row, now)
+                flags = self.flags[row]
+
+        # RecoveryTimeout: no frame passed for reset_timeout seconds
+        if (not flags & _TAKE_ANY and self.reset_timeout is not None
+                and now - self.last_pass[row] > self.reset_timeout):
+            self.reset(row)
+            flags = self.flags[row]
+
+        if flags & _TAKE_ANY:
+            self.flags[row] = flags & ~_TAKE_ANY
+            self.recov_seq_num[row] = sequence
+            self.history[row] = 1
+            self.fill[row] = 1
+            self.last_pass[row] = now
+            counters[base + PASSED] += 1
+            return True
+
+        recov_seq_num = self.recov_seq_num[row]
+        delta = ((sequence - recov_seq_num + SEQ_HALF) & SEQ_MASK) - SEQ_HALF
+
+        # Outside the history window: rogue frame
+        history_length = self.history_length
+        if delta >= history_length or delta <= -history_length:
+            counters[base + ROGUE] += 1
+            return False
+
+        history = self.history[row]
+        if delta <= 0:
+            # Old or repeated sequence number inside the window
+            bit = 1 << -delta
+            if history & bit:
+                counters[base + DISCARDED] += 1
+                return False
+            self.history[row] = history | bit
+            if delta:
+                counters[base + OUT_OF_ORDER] += 1
+                # Older than anything passed since the reset: the window
+                # now holds it, so it must be accounted when it leaves
+                if -delta >= self.fill[row]:
+                    self.fill[row] = 1 - delta
+        else:
+            # New sequence number: slide the window forward. Positions
+            # pushed out that were never passed are lost; positions from
+            # before the last reset are not counted.
+            shift = history_length - delta
+            leaving = self.fill[row] - shift
+            if leaving > 0:
+                passed = (history >> shift).bit_count()
+                counters[base + LOST] += leaving - passed
+                self.fill[row] = history_length
+            else:
+                self.fill[row] += delta
+            self.history[row] = ((history << delta) | 1) & self._window_mask
+            self.recov_seq_num[row] = sequence
+
+        self.last_pass[row] = now
+        counters[base + PASSED] += 1
+        return True
+
+    def _latent_error_test(self, row, now):
+        """LatentErrorTest: compare discards with the expected copies"""
+        base = row * len(COUNTER_NAMES)
+        counters = self.counters
+        difference = (counters[base + PASSED] * (self.latent_error_paths - 1)
+                      - counters[base + DISCARDED])
+        if now >= self.next_latent_reset[row]:
+            # LatentErrorReset: take the current difference as the baseline
+            self.base_difference[row] = difference
+            self.flags[row] &= ~_LATENT_ERROR
+            counters[base + LATENT_ERROR_RESETS] += 1
+            self.next_latent_reset[row] = now + self.latent_reset_period
+        elif abs(difference - self.base_difference[row]) > self.latent_error_difference:
+            if not self.flags[row] & _LATENT_ERROR:
+                counters[base + LATENT_ERRORS] += 1
+            self.flags[row] |= _LATENT_ERROR
+        self.next_latent_test[row] = now + self.latent_error_period
+
+
+class SequenceRecovery:
+    """VectorRecoveryAlgorithm state for one stream
+
+    A one-row RecoveryTable: counters is that row's counter array, indexed
+    by PASSED, DISCARDED, ... Without now, accept() uses the monotonic
+    clock.
+    """
+
+    __slots__ = ('table', 'counters')
+
+    def __init__(self, history_length=DEFAULT_HISTORY_LENGTH,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT,
+                 latent_error_paths=DEFAULT_LATENT_ERROR_PATHS,
+                 latent_error_difference=DEFAULT_LATENT_ERROR_DIFFERENCE,
+                 latent_error_period=DEFAULT_LATENT_ERROR_PERIOD,
+                 latent_reset_period=DEFAULT_LATENT_RESET_PERIOD):
+        self.table = RecoveryTable(history_length, reset_timeout,
+                                   latent_error_paths, latent_error_difference,
+                                   latent_error_period, latent_reset_period, rows=1)
+        self.counters = self.table.counters
+
+    @property
+    def recov_seq_num(self):
+        return self.table.recov_seq_num[0]
+
+    @property
+    def sequence_history(self):
+        return self.table.history[0]
+
+    @property
+    def take_any(self):
+        return bool(self.table.flags[0] & _TAKE_ANY)
+
+    @property
+    def latent_error(self):
+        return self.table.latent_error(0)
+
+    def reset(self):
+        self.table.reset(0)
+
+    def tagless(self):
+        self.table.tagless(0)
+
+    def accept(self, sequence, now=None):
+        """Return True if the frame passes, False if it is discarded"""
+        return self.table.accept(0, sequence, time.monotonic() if now is None else now)
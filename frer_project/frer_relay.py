@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+FRER Relay - Software sequence recovery between interfaces
+Eliminates duplicate R-TAG frames on ingress and forwards the survivors
+"""
+
+import struct
+import time
+
+from rtag_decoder import decode_rtag, ETH_P_8021Q, RTAG_LEN
+from frer_bpf import compile_rtag_filter
+from frer_capture import MultiInterfaceCapture
+from frer_transmit import TxRing
+from frer_stats import LogHistogram
+
+RELAY_SNAPLEN = 0xFFFF  # accept whole frames, not just the headers
+DEFAULT_BATCH_SIZE = 256
+
+_ETHERTYPE = struct.Struct('!H')
+_VLAN_HEADER = struct.Struct('!HH')   # TPID, TCI
+
+
+class FRERRelay:
+    """Sequence recovery function between ingress and egress interfaces
+
+    Member streams arrive on the ingress TPACKET_V3 rings and go through
+    analyzer.analyze_frame(); frames it passes are copied from the RX ring
+    straight into the egress TX ring, optionally without their R-TAG, and
+    flushed every batch_size frames or once per wakeup. VLAN tags the
+    kernel stripped on receive are put back in-band with their TPID.
+    Frames elimination does not decide on (unidentified streams, tagless
+    frames) are dropped unless passthrough is set.
+    """
+
+    def __init__(self, ingress, egress, analyzer, strip=False, passthrough=False,
+                 batch_size=DEFAULT_BATCH_SIZE, **ring_args):
+        # Small blocks retired quickly: the relay is on the forwarding path
+        ring_args.setdefault('retire_tov_ms', 1)
+        ring_args.setdefault('block_size', 1 << 16)
+        ring_args.setdefault('block_nr', 256)
+        self.ingress = list(ingress)
+        self.egress = egress
+        self.analyzer = analyzer
+        self.strip = strip
+        self.passthrough = passthrough
+        self.batch_size = batch_size
+        self.received = 0
+        self.forwarded = 0
+        self.bytes = 0
+        self.forward_latency = LogHistogram()  # kernel RX stamp -> TX flush, ns
+        self._pending = []  # RX timestamps of frames queued for transmit
+
+        program = compile_rtag_filter(payload_bytes=RELAY_SNAPLEN)
+        # Merged by RX time: a block holds hundreds of frames, more than the
+        # recovery window, so member streams must not be drained one by one
+        self.capture = MultiInterfaceCapture(self.ingress, program,
+                                             ignore_outgoing=True, **ring_args)
+        try:
+            self.tx = TxRing(egress)
+        except Exception:
+            self.capture.close()
+            raise
+        self.start_time = None
+
+    def _forward(self, frame, vlan_tci, timestamp_ns, member, vlan_tpid=ETH_P_8021Q):
+        self.received += 1
+        passed = self.analyzer.analyze_frame(frame, vlan_tci, timestamp_ns, member)
+        if not passed and (passed is False or not self.passthrough):
+            return
+
+        tag = _VLAN_HEADER.pack(vlan_tpid, vlan_tci) if vlan_tci is not None else b''
+        header = decode_rtag(frame, vlan_tci) if self.strip else None
+        if header is not None:
+            rtag = header.payload_offset - 2 - RTAG_LEN
+            parts = (frame[:12], tag, frame[12:rtag],
+                     _ETHERTYPE.pack(header.next_protocol),
+                     frame[header.payload_offset:])
+        else:
+            parts = (frame[:12], tag, frame[12:])
+        self.tx.queue_parts(parts)
+        self.forwarded += 1
+        self.bytes += sum(len(part) for part in parts)
+        self._pending.append(timestamp_ns)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Transmit the queued frames and record their forwarding latency"""
+        if not self._pending:
+            self.analyzer.tick()
+            return
+        self.tx.flush()
+        now = time.time_ns()
+        record = self.forward_latency.record
+        for timestamp in self._pending:
+            record(now - timestamp)
+        self._pending.clear()
+        self.analyzer.tick()
+
+    def run(self, duration=None):
+        """Relay until duration seconds pass (or Ctrl+C); returns frames received"""
+        self.start_time = time.time()
+        try:
+            self.capture.capture(self._forward, duration, tick=self.flush,
+                                 vlan_tpid=True)
+        finally:
+            self.flush()
+        return self.received
+
+    def print_statistics(self):
+        """Print forwarding counters and latency"""
+        runtime = time.time() - self.start_time if self.start_time else 0.0
+        drops = sum(stats[1] for stats in self.capture.statistics())
+
+        print("\n" + "="*60)
+        print("🔀 FRER RELAY STATISTICS")
+        print("="*60)
+        print(f"Ingress: {', '.join(self.ingress)} -> egress: {self.egress}"
+              f"{' (R-TAG stripped)' if self.strip else ''}")
+        print(f"Frames received: {self.received} ({drops} dropped by the kernel)")
+        print(f"Frames forwarded: {self.forwarded} ({self.bytes} bytes)")
+        print(f"Frames eliminated: {self.received - self.forwarded}")
+        if runtime > 0:
+            print(f"Forwarding rate: {self.forwarded / runtime:,.0f} frames/s")
+        print(f"Forwarding latency: {self.forward_latency.summary(1000, 'µs')}")
+        if self.tx.wrong_format:
+            print(f"⚠ {self.tx.wrong_format} frames rejected by the egress driver")
+        print("="*60)
+
+    def close(self):
+        self.capture.close()
+        self.tx.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+FRER Replication - Talker-side sequence generation and stream splitting
+One sequence counter per stream; every frame goes out on all member interfaces
+"""
+
+import time
+
+from frer_transmit import TxRing, TxReport
+from frer_pacer import GapTimer
+
+SEQUENCE_SPACE = 1 << 16  # R-TAG sequence_number is 16 bits
+# Frames per flush. Members are flushed one after the other, so this bounds
+# how far the copies drift apart; keep it well inside the recovery window
+DEFAULT_BATCH_SIZE = 32
+
+
+class SequenceGenerator:
+    """802.1CB sequence generation function (7.4.1)
+
+    Keeps GenSeqNum per stream handle and wraps it at 16 bits, so every
+    member copy of a frame carries the same sequence number.
+    """
+
+    def __init__(self, start=0):
+        self.start = start % SEQUENCE_SPACE
+        self.counters = {}  # stream handle -> next sequence number
+
+    def next(self, stream):
+        sequence = self.counters.get(stream, self.start)
+        self.counters[stream] = (sequence + 1) % SEQUENCE_SPACE
+        return sequence
+
+    def reset(self, stream=None):
+        """SequenceGenerationReset for one stream, or for all of them"""
+        if stream is None:
+            self.counters.clear()
+        else:
+            self.counters.pop(stream, None)
+
+
+class Replicator:
+    """Stream splitting onto member interfaces, one TX ring per member
+
+    queue() numbers a frame from the shared generator and queues one copy
+    per member, path ID = member index, all stamped with the same TX time.
+    flush() hands every member ring to its driver with one non-blocking
+    send() each, back to back, so the copies leave as close together as
+    the interfaces allow.
+    """
+
+    def __init__(self, interfaces, batch_size=DEFAULT_BATCH_SIZE, sequence=None, **ring_args):
+        self.interfaces = list(interfaces)
+        self.batch_size = batch_size
+        self.sequence = sequence or SequenceGenerator()
+        self.rings = []
+        try:
+            for interface in self.interfaces:
+                self.rings.append(TxRing(interface, **ring_args))
+        except Exception:
+            self.close()
+            raise
+        self.timer = GapTimer()
+        self.pending = 0
+        self.frames = 0     # frames replicated (copies = frames * members)
+        self.bytes = 0      # bytes per member
+        self.start_time = None
+        self.end_time = None
+
+    def queue(self, stream, template):
+        """Replicate the next frame of stream; returns its sequence number"""
+        if self.start_time is None:
+            self.start_time = time.perf_counter()
+        sequence = self.sequence.next(stream)
+        tx_ns = None
+        for path_id, ring in enumerate(self.rings):
+            ring.queue(template.build(sequence, path_id=path_id, tx_ns=tx_ns))
+            tx_ns = template.tx_ns
+        self.pending += 1
+        self.frames += 1
+        self.bytes += len(template)
+        if self.pending >= self.batch_size:
+            self.flush()
+        return sequence
+
+    def send(self, stream, template, gap=0.0):
+        """Replicate one frame now and wait gap seconds (without drift)"""
+        sequence = self.queue(stream, template)
+        self.flush()
+        if gap:
+            self.timer.wait(gap)
+        return sequence
+
+    def send_batch(self, frames):
+        """Replicate (stream, template) pairs; one send() per member per batch"""
+        for stream, template in frames:
+            self.queue(stream, template)
+        self.flush()
+
+    def flush(self):
+        if self.pending:
+            for ring in self.rings:
+                ring.flush(wait=False)
+            self.pending = 0
+        self.end_time = time.perf_counter()
+
+    def report(self):
+        """Achieved rate per member interface since the first frame"""
+        if self.start_time is None:
+            return TxReport(0, 0, 0.0)
+        end = self.end_time if self.end_time is not None else time.perf_counter()
+        return TxReport(self.frames, self.bytes, end - self.start_time)
+
+    def close(self):
+        """Wait for the last frames to leave, then close the rings"""
+        for ring in self.rings:
+            ring.flush(wait=True)
+        if self.start_time is not None:
+            # report() covers the transmission of the last batch
+            self.end_time = time.perf_counter()
+        for ring in self.rings:
+            ring.close()
+        self.rings = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
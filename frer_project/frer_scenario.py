@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+FRER Scenario Engine - Declared test streams sent concurrently and verified
+Scenarios share batched TX rings; a receiver process checks every stream's counts
+"""
+
+import heapq
+import multiprocessing
+import queue
+import signal
+import time
+
+from rtag_decoder import decode_rtag
+from frer_frame import FrameTemplate, PROBE_LEN
+from frer_transmit import TxRing
+from frer_pacer import Pacer, periodic
+from frer_stream_id import StreamIdentificationTable, IP_STREAM_ID
+from frer_bpf import compile_rtag_filter
+from frer_capture import MultiInterfaceCapture
+from frer_recovery import (PASSED, DISCARDED, OUT_OF_ORDER, ROGUE, LOST, COUNTER_NAMES,
+                           DEFAULT_HISTORY_LENGTH, DEFAULT_RESET_TIMEOUT)
+
+FIRST_SRC_PORT = 12344     # stream handle h is sent from UDP port 12344 + h
+SETTLE_TIME = 0.5          # seconds for the last frames to reach the receiver
+STARTUP_TIMEOUT = 5.0
+RESULT_POLL = 0.5          # seconds between checks for a receiver that died
+DEFAULT_BATCH_SIZE = 32
+RECEIVER_RETIRE_TOV_MS = 60
+
+
+class ScenarioStream:
+    """One declared stream: how many frames, which members, how paced
+
+    Frames are numbered first_sequence, first_sequence + 1, ... (mod 2**16)
+    and each one is sent once per entry of members. gap is the time
+    between frames and start the offset of the first one, in seconds.
+
+    paths, one frer_impairment.PathImpairment per member, sends every
+    copy through its path's loss, delay, reordering, duplication and
+    rogue model instead (drawn from seed); the counts the receiver must
+    report then come from the ground truth of what was sent.
+    """
+
+    def __init__(self, frames, first_sequence=1, members=("enp2s0", "enp2s0"),
+                 vlan_id=100, priority=3, payload_size=64, gap=0.0, start=0.0,
+                 paths=None, seed=1):
+        self.frames = frames
+        self.first_sequence = first_sequence
+        self.members = tuple(members)
+        self.vlan_id = vlan_id
+        self.priority = priority
+        self.payload_size = payload_size
+        self.gap = gap
+        self.start = start
+        self.paths = list(paths) if paths is not None else None
+        if self.paths is not None and len(self.paths) != len(self.members):
+            raise ValueError("paths needs one PathImpairment per member")
+        self.seed = seed
+        self.handle = None      # assigned by the runner, unique over all scenarios
+        self.schedule = None    # ImpairedSchedule of the last run, with paths
+
+
+class Scenario:
+    """A named group of streams and the counts a receiver must report"""
+
+    def __init__(self, name, streams, description=""):
+        self.name = name
+        self.streams = list(streams)
+        self.description = description
+
+    def frames(self, scale=1):
+        """Frames put on the wire (every member copy)"""
+        return sum(stream.schedule.truth.frames if stream.schedule is not None
+                   else stream.frames * scale * len(stream.members)
+                   for stream in self.streams)
+
+    def expected(self, stream, scale=1):
+        """Counters the receiver should report for one of the streams"""
+        if stream.schedule is not None:
+            counters = stream.schedule.truth.expected(DEFAULT_HISTORY_LENGTH,
+                                                      DEFAULT_RESET_TIMEOUT)[0]
+            return {counter: counters[counter]
+                    for counter in (PASSED, DISCARDED, OUT_OF_ORDER, ROGUE, LOST)}
+        frames = stream.frames * scale
+        return {
+            PASSED: frames,
+            DISCARDED: frames * (len(stream.members) - 1),
+            OUT_OF_ORDER: 0,
+            ROGUE: 0,
+            LOST: 0,
+        }
+
+
+def _receiver(interfaces, ready, stop, results):
+    """Receiver process: elimination over every listening interface"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from frer_analysis_tool import FRERAnalyzer
+
+    analyzer = FRERAnalyzer(verbose=False, members=interfaces)
+    try:
+        # Fuller blocks buffer more frames while the sender has the CPU
+        capture = MultiInterfaceCapture(
+            interfaces, compile_rtag_filter(payload_bytes=PROBE_LEN),
+            ignore_outgoing=True, retire_tov_ms=RECEIVER_RETIRE_TOV_MS)
+    except OSError as e:
+        ready.put(str(e))
+        return
+    ready.put(None)
+
+    with capture:
+        while not stop.is_set():
+            capture.capture(analyzer.analyze_frame, duration=0.1)
+        # Frames still held for the merge come out within the hold time
+        capture.capture(analyzer.analyze_frame,
+                        duration=2 * capture.hold_ns / 1e9 + 0.1)
+        drops = sum(stats[1] for stats in capture.statistics())
+
+    results.put({'drops': drops, 'analyzer': analyzer.snapshot()})
+
+
+class ScenarioRunner:
+    """Runs scenarios at the same time and checks them against a receiver
+
+    Every stream gets its own handle (UDP source port), so concurrent
+    scenarios never share a sequence space. All frames go through one TX
+    ring per interface, flushed every batch_size frames and whenever the
+    pacer waits. scale multiplies every stream's frame count and divides
+    its gap, so a scenario keeps its duration while growing to millions of
+    frames; line_rate drops the gaps altogether. Copies of impaired
+    streams leave in their schedule's order: the rings are flushed before
+    a copy goes to another interface than the frames still queued.
+    """
+
+    def __init__(self, scenarios, src_mac, listen=("enp2s0", "enp11s0"),
+                 scale=1, line_rate=False, batch_size=DEFAULT_BATCH_SIZE):
+        self.scenarios = list(scenarios)
+        self.src_mac = src_mac
+        self.listen = list(listen)
+        self.scale = scale
+        self.line_rate = line_rate
+        self.batch_size = batch_size
+        self.streams = [stream for scenario in self.scenarios
+                        for stream in scenario.streams]
+        for handle, stream in enumerate(self.streams, 1):
+            stream.handle = handle
+        self.report = None
+        self.drops = 0
+        self.snapshot = None    # receiver's analyzer snapshot of the last run
+
+    def template(self, stream):
+        """Frame template of a stream; the probe follows its payload size"""
+        payload = b"X" * max(stream.payload_size - PROBE_LEN, 0)
+        return FrameTemplate(self.src_mac, vlan_id=stream.vlan_id,
+                             priority=stream.priority,
+                             src_port=FIRST_SRC_PORT + stream.handle,
+                             payload=payload, probe_stream=stream.handle)
+
+    def _send(self):
+        """Send every stream on its schedule; returns the PaceReport"""
+        interfaces = sorted({member for stream in self.streams
+                             for member in stream.members})
+        rings = {interface: TxRing(interface) for interface in interfaces}
+        templates = [self.template(stream) for stream in self.streams]
+        sent = [0] * len(self.streams)
+        pending = 0
+        last_ring = None
+
+        def flush():
+            nonlocal pending
+            for ring in rings.values():
+                ring.flush(wait=False)
+            pending = 0
+
+        def send(tag):
+            nonlocal pending, last_ring
+            index, copy = tag
+            stream = self.streams[index]
+            template = templates[index]
+            if copy is not None:
+                # One impaired copy: (path, slot, sequence)
+                path_id, _, sequence = copy
+                ring = rings[stream.members[path_id]]
+                if ring is not last_ring and pending:
+                    flush()
+                ring.queue(template.build(sequence, path_id=path_id))
+                last_ring = ring
+            else:
+                sequence = (stream.first_sequence + sent[index]) & 0xFFFF
+                sent[index] += 1
+                tx_ns = None
+                for path_id, member in enumerate(stream.members):
+                    last_ring = rings[member]
+                    last_ring.queue(template.build(sequence, path_id=path_id,
+                                                   tx_ns=tx_ns))
+                    tx_ns = template.tx_ns
+            pending += 1
+            if pending >= self.batch_size:
+                flush()
+
+        counts = [0 if stream.paths else stream.frames * self.scale
+                  for stream in self.streams]
+        # A 1ns period interleaves line-rate streams round-robin
+        periods = [1 if self.line_rate else max(1, round(stream.gap * 1e9 / self.scale))
+                   for stream in self.streams]
+        phases = [0 if self.line_rate else round(stream.start * 1e9)
+                  for stream in self.streams]
+        schedules = [((offset, (index, None)) for offset, index
+                      in periodic(periods, phases, counts))]
+        for index, stream in enumerate(self.streams):
+            if stream.paths:
+                schedules.append(self._impaired(index, stream, periods[index],
+                                                phases[index]))
+        try:
+            return Pacer().run(heapq.merge(*schedules, key=lambda event: event[0]),
+                               send, flush)
+        finally:
+            for ring in rings.values():
+                ring.close()
+
+    def _impaired(self, index, stream, period, phase):
+        """Pacer schedule of an impaired stream's copies"""
+        # NumPy is only needed once a scenario impairs its paths
+        from frer_impairment import ImpairedSchedule
+
+        stream.schedule = ImpairedSchedule(stream.paths, stream.frames * self.scale,
+                                           period, first_sequence=stream.first_sequence,
+                                           seed=stream.seed)
+        for offset, copy in stream.schedule.events():
+            yield phase + offset, (index, copy)
+
+    def run(self):
+        """Send all scenarios with a receiver running; returns the results"""
+        context = multiprocessing.get_context('fork')
+        ready, results = context.Queue(), context.Queue()
+        stop = context.Event()
+        receiver = context.Process(target=_receiver, daemon=True,
+                                   args=(self.listen, ready, stop, results))
+        receiver.start()
+        try:
+            error = ready.get(timeout=STARTUP_TIMEOUT)
+        except queue.Empty:
+            receiver.terminate()
+            error = "receiver did not start"
+        if error is not None:
+            receiver.join()
+            raise RuntimeError(f"Scenario receiver failed: {error}")
+
+        try:
+            self.report = self._send()
+            time.sleep(SETTLE_TIME)
+        finally:
+            stop.set()
+        result = None
+        while result is None:
+            try:
+                result = results.get(timeout=RESULT_POLL)
+            except queue.Empty:
+                if receiver.exitcode is None:
+                    continue
+                # A result sent just before exiting is already in the pipe
+                try:
+                    result = results.get(timeout=RESULT_POLL)
+                except queue.Empty:
+                    raise RuntimeError(f"Scenario receiver exited with code "
+                                       f"{receiver.exitcode}")
+        receiver.join()
+        self.drops = result['drops']
+        self.snapshot = result['analyzer']
+        return self.check(self.snapshot)
+
+    def check(self, snapshot):
+        """Compare an analyzer snapshot with every scenario's expectations
+
+        Returns [(scenario, [(stream, counter, expected, received), ...])]
+        listing the mismatches of each scenario.
+        """
+        results = []
+        for scenario in self.scenarios:
+            mismatches = []
+            for stream in scenario.streams:
+                received = self.received(stream, snapshot)
+                for counter, expected in scenario.expected(stream, self.scale).items():
+                    if received[counter] != expected:
+                        mismatches.append((stream, counter, expected, received[counter]))
+            results.append((scenario, mismatches))
+        return results
+
+    def received(self, stream, snapshot=None):
+        """Counters the receiver reported for a stream (zeros if never seen)"""
+        snapshot = snapshot or self.snapshot
+        frame = self.template(stream).build(stream.first_sequence)
+        key = StreamIdentificationTable(IP_STREAM_ID).frame_key(frame, decode_rtag(frame))
+        for handle, values in snapshot['stream_counters'].items():
+            if snapshot['stream_keys'][handle] == key:
+                return values
+        return [0] * len(COUNTER_NAMES)
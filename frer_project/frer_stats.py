@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+FRER Statistics - Constant-time aggregates for long-running analysis
+HDR-style histograms, per-sequence copy and arrival tracking, event log
+"""
+
+import sys
+from array import array
+
+from frer_recovery import sequence_delta
+
+DEFAULT_SUB_BUCKET_BITS = 7     # 64 sub-buckets per power of two: < 1.6% error
+
+
+class LogHistogram:
+    """HDR-style log-linear histogram of non-negative integers
+
+    Values below 2**sub_bucket_bits are counted exactly; above that each
+    power of two is split into 2**(sub_bucket_bits - 1) linear buckets.
+    record() is O(1) and the bucket array never grows.
+    """
+
+    def __init__(self, sub_bucket_bits=DEFAULT_SUB_BUCKET_BITS, max_bits=64):
+        self.sub_bucket_bits = sub_bucket_bits
+        self._half = 1 << (sub_bucket_bits - 1)
+        self._exact = 1 << sub_bucket_bits
+        self.counts = [0] * ((max_bits - sub_bucket_bits + 2) * self._half)
+        self.reset()
+
+    def reset(self):
+        for index in range(len(self.counts)):
+            self.counts[index] = 0
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _index(self, value):
+        if value < self._exact:
+            return value
+        shift = value.bit_length() - self.sub_bucket_bits
+        return shift * self._half + (value >> shift)
+
+    def _value(self, index):
+        """Highest value counted in bucket index"""
+        if index < self._exact:
+            return index
+        shift = (index >> (self.sub_bucket_bits - 1)) - 1
+        top = index - shift * self._half
+        return ((top + 1) << shift) - 1
+
+    def record(self, value, count=1):
+        if value < 0:
+            value = 0
+        self.counts[self._index(value)] += count
+        self.count += count
+        self.total += value * count
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percent):
+        """Value at or below which percent of the recorded values fall"""
+        if not self.count:
+            return 0
+        target = max(1, -(-self.count * percent // 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self._value(index), self.max)
+        return self.max
+
+    def merge(self, other):
+        """Add another histogram with the same bucket layout"""
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                if self.min is None or value < self.min:
+                    self.min = value
+                if self.max is None or value > self.max:
+                    self.max = value
+
+    def distribution(self):
+        """(bucket upper value, count) for every non-empty bucket"""
+        return [(self._value(index), count)
+                for index, count in enumerate(self.counts) if count]
+
+    def summary(self, scale=1, unit=''):
+        """One-line p50/p99/max summary, values divided by scale"""
+        if not self.count:
+            return "no samples"
+        fmt = lambda value: f"{value / scale:,.1f}{unit}"
+        return (f"n={self.count} min={fmt(self.min)} p50={fmt(self.percentile(50))} "
+                f"p99={fmt(self.percentile(99))} p99.9={fmt(self.percentile(99.9))} "
+                f"max={fmt(self.max)}")
+
+
+class _SequenceRingTable:
+    """Slots for the most recent window sequence numbers of many streams
+
+    Each row is one stream's ring. slot() maps a sequence number to its
+    slot and retires the slots that newer sequence numbers push out, so
+    per-sequence bookkeeping costs O(1) per sequence number and nothing
+    is kept for older ones. Rows are added with grow() and reused after
+    finish() and clear().
+
+    Subclasses define _retire(slot), which accounts for the sequence
+    number in slot and clears it, and _skip(count), which accounts for
+    count sequence numbers that never had a slot.
+    """
+
+    def __init__(self, window, rows=0):
+        self.size = 1 << (window - 1).bit_length()
+        self.mask = self.size - 1
+        self.newest = array('l')    # -1: nothing seen yet
+        self.filled = array('H')    # slots holding a sequence number since start
+        self.rows = 0
+        self.grow(rows)
+
+    def grow(self, rows):
+        self.newest.extend(array('l', [-1]) * rows)
+        self.filled.extend(array('H', bytes(2 * rows)))
+        self.rows += rows
+
+    def slot(self, row, sequence):
+        """Index of sequence's slot in the row's storage, or None if it is
+        older than the ring"""
+        newest = self.newest[row]
+        base = row * self.size
+        if newest < 0:
+            self.newest[row] = sequence
+            self.filled[row] = 1
+            return base + (sequence & self.mask)
+        delta = sequence_delta(sequence, newest)
+        if delta > 0:
+            size = self.size
+            filled = self.filled[row]
+            if delta >= size:
+                # Every slot held is pushed out; sequence numbers that
+                # skipped the ring altogether are accounted in bulk
+                for step in range(filled):
+                    self._retire(base + ((newest - step) & self.mask))
+                if delta > size:
+                    self._skip(delta - size)
+                filled = size
+            else:
+                # Slots reused for newest+1 .. sequence are finished
+                for step in range(1, delta + 1):
+                    if filled >= size:
+                        self._retire(base + ((newest + step) & self.mask))
+                    else:
+                        filled += 1
+            self.filled[row] = filled
+            self.newest[row] = sequence
+        elif -delta > self.mask:
+            return None
+        elif -delta >= self.filled[row]:
+            # Older than anything seen since the start: the ring now
+            # holds it, so it is retired when it leaves
+            self.filled[row] = 1 - delta
+        return base + (sequence & self.mask)
+
+    def finish(self, row):
+        """Retire every sequence number still in the row"""
+        newest = self.newest[row]
+        if newest < 0:
+            return
+        base = row * self.size
+        for step in range(self.filled[row]):
+            self._retire(base + ((newest - step) & self.mask))
+        self.newest[row] = -1
+        self.filled[row] = 0
+
+    def clear(self, row):
+        """Forget a row without accounting for it (slots are already clear
+        after finish())"""
+        self.newest[row] = -1
+        self.filled[row] = 0
+
+
+class CopyTable(_SequenceRingTable):
+    """Copies received per sequence number, for many streams
+
+    A sequence number's count is recorded into histogram (0 for a lost
+    frame) when it leaves its stream's ring.
+    """
+
+    def __init__(self, histogram, window=64, rows=0):
+        self.histogram = histogram
+        self.counts = bytearray()
+        super().__init__(window, rows)
+        self.row_bytes = 4 + 2 + self.size
+
+    def grow(self, rows):
+        self.counts.extend(bytes(rows * self.size))
+        super().grow(rows)
+
+    def clear(self, row):
+        super().clear(row)
+        start = row * self.size
+        self.counts[start:start + self.size] = bytes(self.size)
+
+    def add(self, row, sequence):
+        slot = self.slot(row, sequence)
+        if slot is not None and self.counts[slot] < 255:
+            self.counts[slot] += 1
+
+    def _retire(self, slot):
+        self.histogram.record(self.counts[slot])
+        self.counts[slot] = 0
+
+    def _skip(self, count):
+        self.histogram.record(0, count)
+
+
+class ArrivalTable(_SequenceRingTable):
+    """Which member stream delivered each sequence number, for many streams
+
+    The first copy of a sequence number is a win for its member; later
+    copies record their skew behind it in skew[member]. When the
+    sequence number leaves the ring, every member that never delivered
+    it counts a loss. Members are small integers (interface indexes, at
+    most 16).
+    """
+
+    def __init__(self, wins, losses, skew, window=64, rows=0):
+        self.wins = wins
+        self.losses = losses
+        self.skew = skew
+        self.members = len(wins)
+        self.seen = array('H')          # bitmask of members
+        self.first_ns = array('q')
+        super().__init__(window, rows)
+        self.row_bytes = 4 + 2 + self.size * (2 + 8)
+
+    def grow(self, rows):
+        self.seen.extend(array('H', bytes(2 * rows * self.size)))
+        self.first_ns.extend(array('q', bytes(8 * rows * self.size)))
+        super().grow(rows)
+
+    def clear(self, row):
+        super().clear(row)
+        start = row * self.size
+        self.seen[start:start + self.size] = array('H', bytes(2 * self.size))
+
+    def add(self, row, sequence, member, arrival_ns):
+        slot = self.slot(row, sequence)
+        if slot is None:
+            return
+        seen = self.seen[slot]
+        if not seen:
+            self.first_ns[slot] = arrival_ns
+            self.wins[member] += 1
+        else:
+            self.skew[member].record(arrival_ns - self.first_ns[slot])
+        self.seen[slot] = seen | (1 << member)
+
+    def _retire(self, slot):
+        seen = self.seen[slot]
+        for member in range(self.members):
+            if not seen >> member & 1:
+                self.losses[member] += 1
+        self.seen[slot] = 0
+
+    def _skip(self, count):
+        for member in range(self.members):
+            self.losses[member] += count
+
+
+class EventLog:
+    """Sampled, buffered per-frame event log
+
+    Every sample_every-th event is kept; kept events are written in one
+    call once buffer_size of them have accumulated, or on flush(). Events
+    are stored as tuples and only formatted when written.
+    """
+
+    def __init__(self, formatter, sample_every=1, buffer_size=256, output=None):
+        self.formatter = formatter
+        self.sample_every = max(1, sample_every)
+        self.buffer_size = buffer_size
+        self.output = output or sys.stdout
+        self.events = 0
+        self.skipped = 0
+        self._buffer = []
+
+    def log(self, *event):
+        self.events += 1
+        if self.events % self.sample_every:
+            self.skipped += 1
+            return
+        self._buffer.append(event)
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            formatter = self.formatter
+            self.output.write(''.join(formatter(*event) + '\n'
+                                      for event in self._buffer))
+            self.output.flush()
+            self._buffer.clear()
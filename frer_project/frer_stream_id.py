@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+FRER Stream Identification - IEEE 802.1CB clause 6 stream identity table
+Maps received frames to stream handles through a packed integer key
+"""
+
+import socket
+import struct
+
+from rtag_decoder import ETH_P_IP
+
+# Key fields and their width in the packed key (bits)
+FIELD_WIDTHS = {
+    'dst_mac': 48,
+    'src_mac': 48,
+    'vlan': 12,
+    'pcp': 3,
+    'ip5': 104,   # src IP(32) + dst IP(32) + protocol(8) + src port(16) + dst port(16)
+}
+
+# Standard identification functions expressed as key field sets
+NULL_STREAM_ID = ('dst_mac', 'vlan')          # 6.4 Null stream identification
+SOURCE_STREAM_ID = ('src_mac', 'vlan')        # 6.5 Source MAC and VLAN
+ACTIVE_STREAM_ID = ('dst_mac', 'vlan')        # 6.6 matches the rewritten dst MAC/VLAN
+IP_STREAM_ID = ('dst_mac', 'vlan', 'ip5')     # 6.7 IP stream identification
+
+_MAC = struct.Struct('!HI')
+_IPV4_ADDRS = struct.Struct('!II')
+_PORTS = struct.Struct('!HH')
+
+
+def _mac_from_frame(buf, offset):
+    hi, lo = _MAC.unpack_from(buf, offset)
+    return (hi << 32) | lo
+
+
+def _ip5_from_frame(buf, header):
+    """Pack the IPv4 5-tuple following the R-TAG, 0 for non-IPv4 payloads"""
+    if header.next_protocol != ETH_P_IP:
+        return 0
+    offset = header.payload_offset
+    try:
+        ihl = (buf[offset] & 0x0F) * 4
+        protocol = buf[offset + 9]
+        src, dst = _IPV4_ADDRS.unpack_from(buf, offset + 12)
+        if protocol in (socket.IPPROTO_UDP, socket.IPPROTO_TCP):
+            sport, dport = _PORTS.unpack_from(buf, offset + ihl)
+        else:
+            sport = dport = 0
+    except (IndexError, struct.error):
+        return 0
+    return (src << 72) | (dst << 40) | (protocol << 32) | (sport << 16) | dport
+
+
+# Extractors from a raw frame plus its decoded RTagHeader
+_FRAME_EXTRACTORS = {
+    'dst_mac': lambda buf, header: _mac_from_frame(buf, 0),
+    'src_mac': lambda buf, header: _mac_from_frame(buf, 6),
+    'vlan': lambda buf, header: header.vlan or 0,
+    'pcp': lambda buf, header: header.pcp or 0,
+    'ip5': _ip5_from_frame,
+}
+
+
+def _mac_from_value(value):
+    if isinstance(value, str):
+        value = bytes.fromhex(value.replace(':', '').replace('-', ''))
+    return int.from_bytes(value, 'big')
+
+
+def _ip5_from_value(value):
+    src, dst, protocol, sport, dport = value
+    src = int.from_bytes(socket.inet_aton(src), 'big')
+    dst = int.from_bytes(socket.inet_aton(dst), 'big')
+    return (src << 72) | (dst << 40) | (protocol << 32) | (sport << 16) | dport
+
+
+# Converters from configured values (MAC strings, VLAN ints, 5-tuples)
+_VALUE_CONVERTERS = {
+    'dst_mac': _mac_from_value,
+    'src_mac': _mac_from_value,
+    'vlan': int,
+    'pcp': int,
+    'ip5': _ip5_from_value,
+}
+
+
+class StreamIdentificationTable:
+    """Stream identity table: packed key -> stream handle
+
+    Configured streams are added with add_stream(). When learn is True,
+    frames that match no configured entry are given a new handle so every
+    distinct key gets its own recovery state; otherwise identify() returns
+    None for them.
+    """
+
+    def __init__(self, key_fields=IP_STREAM_ID, learn=True, first_handle=1):
+        for field in key_fields:
+            if field not in FIELD_WIDTHS:
+                raise ValueError(f"Unknown stream key field: {field}")
+        self.key_fields = tuple(key_fields)
+        self.learn = learn
+        self.next_handle = first_handle
+        self.handles = {}   # packed key -> stream handle
+        self.keys = {}      # stream handle -> packed key
+        self.configured = set()  # handles from add_stream(), never forgotten
+        self._extractors = [(_FRAME_EXTRACTORS[f], FIELD_WIDTHS[f])
+                            for f in self.key_fields]
+
+    def frame_key(self, buf, header):
+        """Build the packed key of a frame"""
+        key = 0
+        for extract, width in self._extractors:
+            key = (key << width) | extract(buf, header)
+        return key
+
+    def value_key(self, **values):
+        """Build the packed key from configured field values"""
+        key = 0
+        for field in self.key_fields:
+            if field not in values:
+                raise ValueError(f"Missing stream key field: {field}")
+            key = (key << FIELD_WIDTHS[field]) | _VALUE_CONVERTERS[field](values[field])
+        return key
+
+    def add_stream(self, handle=None, **values):
+        """Configure a stream; returns its handle"""
+        if handle is None:
+            handle = self.next_handle
+        self.next_handle = max(self.next_handle, handle + 1)
+        key = self.value_key(**values)
+        self.handles[key] = handle
+        self.keys[handle] = key
+        self.configured.add(handle)
+        return handle
+
+    def identify(self, buf, header):
+        """Return the stream handle of a frame, or None if unidentified"""
+        key = self.frame_key(buf, header)
+        handle = self.handles.get(key)
+        if handle is None and self.learn:
+            handle = self.handle_for_key(key)
+        return handle
+
+    def lookup(self, buf, header):
+        """Return the handle of a known stream without learning new ones"""
+        return self.handles.get(self.frame_key(buf, header))
+
+    def handle_for_key(self, key):
+        """Return the handle of a packed key, allocating one if it is new"""
+        handle = self.handles.get(key)
+        if handle is None:
+            handle = self.next_handle
+            self.next_handle += 1
+            self.handles[key] = handle
+            self.keys[handle] = key
+        return handle
+
+    def forget(self, handle):
+        """Drop a learned stream; it gets a new handle if it comes back"""
+        if handle in self.configured:
+            return
+        key = self.keys.pop(handle, None)
+        if key is not None:
+            del self.handles[key]
+
+    def __len__(self):
+        return len(self.handles)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+FRER Stream State - Array-backed per-stream state with idle eviction
+Maps stream handles to rows of slab tables; quiet streams are evicted
+"""
+
+import heapq
+from array import array
+
+DEFAULT_MAX_STREAMS = 65536
+DEFAULT_IDLE_TIMEOUT = 60.0     # seconds without a frame before a stream is evicted
+SLAB_ROWS = 1024                # rows added to every table at a time
+SWEEPS_PER_TIMEOUT = 4          # idle sweeps per idle_timeout of traffic
+# A full store evicts its least recently seen 1/EVICT_FRACTION at once,
+# so finding them is paid once per many new streams
+EVICT_FRACTION = 16
+# Per stream outside the slabs: handle -> row entry, and the learned key in
+# the stream identification table (two dict entries and an int)
+INDEX_BYTES = 250
+
+
+class StreamStateStore:
+    """Stream handle -> row of a set of array-backed state tables
+
+    Each table keeps one row per stream in preallocated arrays and has
+    row_bytes, grow(rows) and clear(row). The store grows every table by
+    SLAB_ROWS rows at a time up to capacity: max_streams, or fewer if
+    max_bytes does not fit them, so memory never exceeds the cap.
+
+    row() is called with a stream's time for every frame. A stream that
+    has not been seen for idle_timeout seconds is evicted by a periodic
+    sweep; when the store is full, the least recently seen streams go
+    first. on_evict(handle, row) is called before a row is reused, to
+    fold its state into totals.
+    """
+
+    def __init__(self, tables, max_streams=DEFAULT_MAX_STREAMS, max_bytes=None,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT, on_evict=None):
+        self.tables = list(tables)
+        # handles and last_seen entries, plus the indexes
+        self.row_bytes = sum(table.row_bytes for table in self.tables) + 16 + INDEX_BYTES
+        capacity = max_streams
+        if max_bytes is not None:
+            capacity = min(capacity, max_bytes // self.row_bytes)
+        if capacity < 1:
+            raise ValueError(f"max_bytes must allow one stream ({self.row_bytes} bytes)")
+        self.capacity = capacity
+        self.idle_timeout = idle_timeout
+        self.on_evict = on_evict
+        self.rows = {}              # stream handle -> row
+        self.handles = array('q')   # row -> stream handle, -1 when free
+        self.last_seen = array('d')
+        self.free = array('l')      # rows not in use
+        self.size = 0               # rows allocated in every table
+        self.evicted = 0
+        self.now = 0.0              # latest time passed to row()
+        self._next_sweep = float('inf') if idle_timeout is None else 0.0
+
+    def row(self, handle, now=None):
+        """Row of a stream's state, allocated on its first frame
+
+        now is the frame's time in seconds; without it the latest time
+        seen is used.
+        """
+        if now is None:
+            now = self.now
+        elif now > self.now:
+            self.now = now
+        row = self.rows.get(handle)
+        if row is None:
+            row = self._allocate(handle)
+        self.last_seen[row] = now
+        if now >= self._next_sweep:
+            self.sweep()
+        return row
+
+    def _allocate(self, handle):
+        if not self.free:
+            if self.size < self.capacity:
+                self._grow(min(SLAB_ROWS, self.capacity - self.size))
+            else:
+                self.sweep()
+                if not self.free:
+                    self._evict_oldest()
+        row = self.free.pop()
+        for table in self.tables:
+            table.clear(row)
+        self.rows[handle] = row
+        self.handles[row] = handle
+        return row
+
+    def _grow(self, rows):
+        for table in self.tables:
+            table.grow(rows)
+        self.handles.extend(array('q', [-1]) * rows)
+        self.last_seen.extend(array('d', bytes(8 * rows)))
+        # Lowest rows are handed out first
+        self.free.extend(range(self.size + rows - 1, self.size - 1, -1))
+        self.size += rows
+
+    def sweep(self):
+        """Evict every stream idle for more than idle_timeout"""
+        if self.idle_timeout is None:
+            return
+        cutoff = self.now - self.idle_timeout
+        last_seen = self.last_seen
+        for handle in [handle for handle, row in self.rows.items()
+                       if last_seen[row] < cutoff]:
+            self.evict(handle)
+        self._next_sweep = self.now + self.idle_timeout / SWEEPS_PER_TIMEOUT
+
+    def _evict_oldest(self):
+        last_seen = self.last_seen
+        rows = self.rows
+        count = max(1, self.capacity // EVICT_FRACTION)
+        for handle in heapq.nsmallest(count, rows, key=lambda h: last_seen[rows[h]]):
+            self.evict(handle)
+
+    def evict(self, handle):
+        """Release a stream's row"""
+        row = self.rows.pop(handle)
+        if self.on_evict is not None:
+            self.on_evict(handle, row)
+        self.handles[row] = -1
+        self.free.append(row)
+        self.evicted += 1
+
+    def memory_bytes(self):
+        """Approximate bytes held for the allocated rows"""
+        return self.size * self.row_bytes
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, handle):
+        return handle in self.rows
+
+    def items(self):
+        """(stream handle, row) of every stream in the store"""
+        return self.rows.items()
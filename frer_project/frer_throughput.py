@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+FRER Throughput Sweep - RFC 2544-style zero-loss rate per frame size
+Binary-searches the highest offered rate whose frames all survive elimination
+"""
+
+import sys
+import json
+import platform
+import socket
+import struct
+import fcntl
+import time
+from array import array
+from collections import namedtuple
+
+from frer_frame import interface_mac, interface_mtu, max_payload
+from frer_scenario import Scenario, ScenarioStream, ScenarioRunner
+from frer_recovery import PASSED
+from frer_benchmark import git_commit
+
+DEFAULT_PAYLOADS = (64, 128, 256, 512, 1024)    # the MTU's largest is added
+DEFAULT_DURATION = 1.0          # seconds per trial (RFC 2544 uses 60)
+DEFAULT_RESOLUTION = 0.01       # search stops within 1% of the top rate
+DEFAULT_TOP_FRAMES = 50000      # back-to-back trial that finds the top rate
+RATE_TOLERANCE = 0.02           # a trial must reach 98% of its offered rate
+DEFAULT_OUTPUT = 'frer_throughput.json'
+# Preamble, start delimiter, FCS and inter-frame gap on the wire
+ETHERNET_OVERHEAD = 24
+
+SIOCETHTOOL = 0x8946
+ETHTOOL_GDRVINFO = 3
+# struct ethtool_drvinfo: cmd, driver, version, fw_version, bus_info, ...
+_DRVINFO = struct.Struct('I32s32s32s32s32s12s5I')
+
+
+class Trial(namedtuple('Trial', 'rate frames achieved passed drops latency')):
+    """One run at an offered rate (None: back to back)
+
+    rate and achieved are sequences/s, each sent once on every member;
+    passed is what elimination let through, drops the receiver's capture
+    drops and latency the LogHistogram (ns) of the passed frames.
+    """
+
+    __slots__ = ()
+
+    @property
+    def loss(self):
+        return 1 - self.passed / self.frames if self.frames else 0.0
+
+    @property
+    def sender_bound(self):
+        """The sender could not offer the rate"""
+        return self.rate is not None and self.achieved < self.rate * (1 - RATE_TOLERANCE)
+
+    @property
+    def ok(self):
+        return self.passed == self.frames and not self.sender_bound
+
+    def as_dict(self):
+        return {
+            'rate': self.rate,
+            'frames': self.frames,
+            'achieved_pps': round(self.achieved, 1),
+            'passed': self.passed,
+            'capture_drops': self.drops,
+            'zero_loss': self.passed == self.frames,
+        }
+
+
+def interface_info(interface):
+    """Driver, versions and link parameters of an interface, for the report"""
+    info = {'interface': interface, 'mtu': interface_mtu(interface)}
+    try:
+        with open(f'/sys/class/net/{interface}/speed') as f:
+            speed = int(f.read())
+        info['speed_mbps'] = speed if speed > 0 else None
+    except (OSError, ValueError):
+        info['speed_mbps'] = None
+    # ETHTOOL_GDRVINFO, as ethtool -i
+    data = array('B', _DRVINFO.pack(ETHTOOL_GDRVINFO, *[b''] * 6, 0, 0, 0, 0, 0))
+    ifreq = struct.pack(f'16sP{40 - 16 - struct.calcsize("P")}x',
+                        interface.encode()[:15], data.buffer_info()[0])
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            fcntl.ioctl(sock, SIOCETHTOOL, ifreq)
+        fields = _DRVINFO.unpack(data.tobytes())
+        for name, value in zip(('driver', 'version', 'firmware', 'bus'), fields[1:5]):
+            info[name] = value.split(b'\0', 1)[0].decode(errors='replace') or None
+    except OSError:
+        pass
+    return info
+
+
+def line_rate(speed_mbps, frame_len):
+    """Frames/s a link of speed_mbps carries back to back"""
+    return speed_mbps * 1e6 / ((frame_len + ETHERNET_OVERHEAD) * 8)
+
+
+class ThroughputSweep:
+    """RFC 2544 throughput, latency and frame loss for each payload size
+
+    For every size a back-to-back trial of top_frames sequences measures
+    the frame loss at the highest rate the sender reaches (or the line
+    rate, if lower), which becomes the top of a binary search for the
+    highest offered rate at which elimination passes every sequence. Each
+    trial sends one replicated stream over members for duration seconds,
+    with a fresh receiver on listen. Trials the sender could not pace
+    count as failures, and the result is marked sender-bound.
+    """
+
+    def __init__(self, members=("enp2s0", "enp11s0"), listen=("enp2s0", "enp11s0"),
+                 duration=DEFAULT_DURATION, resolution=DEFAULT_RESOLUTION,
+                 top_frames=DEFAULT_TOP_FRAMES):
+        self.members = list(members)
+        self.listen = list(listen)
+        self.duration = duration
+        self.resolution = resolution
+        self.top_frames = top_frames
+        self.src_mac = interface_mac(self.members[0])
+        self.interfaces = [interface_info(interface)
+                           for interface in dict.fromkeys(self.members + self.listen)]
+        self.mtu = min(interface_mtu(interface) for interface in self.members)
+        self.max_payload = max_payload(self.mtu)
+
+    def payloads(self, sizes=None):
+        """Sizes to sweep: the defaults and the largest the MTU allows"""
+        if sizes is None:
+            sizes = [size for size in DEFAULT_PAYLOADS if size < self.max_payload]
+            sizes.append(self.max_payload)
+        return list(sizes)
+
+    def trial(self, payload_size, rate=None):
+        """Run one trial; rate None sends top_frames back to back"""
+        frames = self.top_frames if rate is None else max(1, round(rate * self.duration))
+        stream = ScenarioStream(frames, members=self.members, payload_size=payload_size,
+                                gap=0.0 if rate is None else 1.0 / rate)
+        runner = ScenarioRunner([Scenario(f"{payload_size} bytes", [stream])],
+                                self.src_mac, listen=self.listen, line_rate=rate is None)
+        runner.run()
+        return Trial(rate, frames, runner.report.pps, runner.received(stream)[PASSED],
+                     runner.drops, runner.snapshot['latency'])
+
+    def frame_len(self, payload_size):
+        """Ethernet frame length (without FCS) carrying payload_size bytes"""
+        stream = ScenarioStream(1, payload_size=payload_size)
+        stream.handle = 1
+        return len(ScenarioRunner([], self.src_mac).template(stream))
+
+    def search(self, payload_size, progress=None):
+        """Throughput, latency and frame loss of one payload size"""
+        frame_len = self.frame_len(payload_size)
+        top = self.trial(payload_size)
+        trials = [top]
+        if progress:
+            progress(top)
+        top_rate = top.achieved
+        speeds = [info['speed_mbps'] for info in self.interfaces
+                  if info['interface'] in self.members and info['speed_mbps']]
+        if speeds:
+            top_rate = min(top_rate, line_rate(min(speeds), frame_len))
+
+        best = top if top.passed == top.frames else None
+        if best is None:
+            low, high = 0.0, top_rate
+            while high - low > self.resolution * top_rate:
+                rate = (low + high) / 2
+                trial = self.trial(payload_size, rate)
+                trials.append(trial)
+                if progress:
+                    progress(trial)
+                if trial.ok:
+                    low, best = rate, trial
+                else:
+                    high = rate
+        throughput = 0.0
+        if best is not None:
+            throughput = best.achieved if best.rate is None else best.rate
+        latency = best.latency if best is not None else None
+        return {
+            'payload': payload_size,
+            'frame': frame_len,
+            'throughput_pps': round(throughput, 1),
+            'throughput_mbps': round(throughput * frame_len * 8 / 1e6, 2),
+            # Zero loss back to back: the receiver outran the sender
+            'sender_bound': best is top or any(t.sender_bound for t in trials),
+            'top_rate_pps': round(top_rate, 1),
+            'loss_at_top': round(top.loss, 6),
+            'latency_us': None if latency is None or not latency.count else {
+                'p50': latency.percentile(50) / 1000,
+                'p99': latency.percentile(99) / 1000,
+                'max': latency.max / 1000,
+            },
+            'trials': [trial.as_dict() for trial in trials],
+        }
+
+    def run(self, sizes=None, progress=None):
+        """Sweep every payload size; returns the JSON-ready report"""
+        results = []
+        for size in self.payloads(sizes):
+            if size > self.max_payload:
+                print(f"⚠ {size} bytes skipped: over the {self.max_payload}-byte "
+                      f"payload an MTU of {self.mtu} allows")
+                continue
+            print(f"\n📦 {size}-byte payload ({self.frame_len(size)}-byte frames)")
+            results.append(self.search(size, progress))
+        return {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'commit': git_commit(),
+            'kernel': platform.release(),
+            'platform': platform.platform(),
+            'members': self.members,
+            'listen': self.listen,
+            'interfaces': self.interfaces,
+            'mtu': self.mtu,
+            'max_payload': self.max_payload,
+            'duration': self.duration,
+            'resolution': self.resolution,
+            'results': results,
+        }
+
+
+def print_report(document):
+    print(f"\nKernel {document['kernel']}, MTU {document['mtu']} "
+          f"(largest payload {document['max_payload']} bytes)")
+    for info in document['interfaces']:
+        print(f"  {info['interface']}: driver {info.get('driver') or '?'} "
+              f"{info.get('version') or ''}, firmware {info.get('firmware') or '-'}, "
+              f"{info['speed_mbps'] or '?'} Mbit/s")
+    print(f"\n{'Payload':>7} {'Frame':>6} {'Throughput':>13} {'Mbit/s':>9} "
+          f"{'Latency p50/p99/max (µs)':>26} {'Loss @ top':>11}")
+    for result in document['results']:
+        latency = result['latency_us']
+        text = "-" if latency is None else (
+            f"{latency['p50']:.1f}/{latency['p99']:.1f}/{latency['max']:.1f}")
+        note = "  sender-bound" if result['sender_bound'] else ""
+        print(f"{result['payload']:>7} {result['frame']:>6} "
+              f"{result['throughput_pps']:>9,.0f} pps {result['throughput_mbps']:>9,.1f} "
+              f"{text:>26} {result['loss_at_top']:>10.3%}{note}")
+    print("(rates in sequences/s, each sent once per member; Mbit/s per member, "
+          "frames without FCS)")
+
+
+def compare(document, baseline):
+    """Print the throughput change of each payload size against a baseline"""
+    before = {result['payload']: result for result in baseline['results']}
+    print(f"\nAgainst baseline: kernel {baseline.get('kernel', '?')}, "
+          + ", ".join(f"{info['interface']} {info.get('driver') or '?'} "
+                      f"{info.get('version') or ''}".rstrip()
+                      for info in baseline.get('interfaces', [])))
+    for result in document['results']:
+        old = before.get(result['payload'])
+        if old is None:
+            continue
+        if old['throughput_pps']:
+            change = f"{result['throughput_pps'] / old['throughput_pps'] - 1:+.1%}"
+        else:
+            change = "new"
+        print(f"  {result['payload']:>5} bytes: {old['throughput_pps']:>10,.0f} -> "
+              f"{result['throughput_pps']:>10,.0f} pps ({change})")
+
+
+def main():
+    # Usage: frer_throughput.py [--members enp2s0,enp11s0] [--listen enp2s0,enp11s0]
+    #            [--sizes 64,512,1466] [--duration 1.0] [--resolution 0.01]
+    #            [--top-frames N] [--output results.json] [--baseline old.json]
+    options = {}
+    args = sys.argv[1:]
+    while args:
+        name = args.pop(0)
+        if not name.startswith("--") or not args:
+            print(f"❌ Unexpected argument: {name}")
+            sys.exit(2)
+        options[name[2:]] = args.pop(0)
+
+    print("=" * 60)
+    print("📶 FRER THROUGHPUT SWEEP (RFC 2544)")
+    print("=" * 60)
+    try:
+        sweep = ThroughputSweep(
+            members=options.get("members", "enp2s0,enp11s0").split(","),
+            listen=options.get("listen", "enp2s0,enp11s0").split(","),
+            duration=float(options.get("duration", DEFAULT_DURATION)),
+            resolution=float(options.get("resolution", DEFAULT_RESOLUTION)),
+            top_frames=int(options.get("top-frames", DEFAULT_TOP_FRAMES)))
+    except OSError as e:
+        print(f"❌ Interface error: {e}")
+        sys.exit(2)
+    sizes = None
+    if "sizes" in options:
+        sizes = [int(size) for size in options["sizes"].split(",")]
+    print(f"Members: {' + '.join(sweep.members)}, receiver on {', '.join(sweep.listen)}")
+    print(f"Payloads: {', '.join(map(str, sweep.payloads(sizes)))} bytes, "
+          f"{sweep.duration:g}s trials")
+
+    def progress(trial):
+        rate = "back to back" if trial.rate is None else f"{trial.rate:,.0f} pps"
+        verdict = "✅" if trial.ok else ("⏱" if trial.sender_bound else "❌")
+        print(f"  {verdict} {rate}: sent {trial.frames} at {trial.achieved:,.0f} pps, "
+              f"passed {trial.passed} ({trial.loss:.3%} lost)")
+
+    try:
+        document = sweep.run(sizes, progress)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print_report(document)
+
+    output = options.get("output", DEFAULT_OUTPUT)
+    with open(output, 'w') as f:
+        json.dump(document, f, indent=2)
+    print(f"\nResults saved to {output}")
+    if "baseline" in options:
+        with open(options["baseline"]) as f:
+            compare(document, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
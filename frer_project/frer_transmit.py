@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+FRER Transmit Engine - AF_PACKET PACKET_TX_RING batched sender
+Queues frames in a memory-mapped TX ring and flushes them with one syscall
+"""
+
+import mmap
+import select
+import socket
+import struct
+import time
+from collections import namedtuple
+
+from frer_pacer import GapTimer
+
+# <linux/if_packet.h>
+SOL_PACKET = 263
+PACKET_VERSION = 10
+PACKET_TX_RING = 13
+PACKET_QDISC_BYPASS = 20
+TPACKET_V2 = 1
+
+TP_STATUS_AVAILABLE = 0
+TP_STATUS_SEND_REQUEST = 1 << 0
+TP_STATUS_SENDING = 1 << 1
+TP_STATUS_WRONG_FORMAT = 1 << 2
+
+# struct tpacket_req
+_TPACKET_REQ = struct.Struct('=IIII')
+# struct tpacket2_hdr: tp_status, tp_len
+_TPACKET2_STATUS_LEN = struct.Struct('=II')
+_U32 = struct.Struct('=I')
+# Frame data starts at TPACKET2_HDRLEN - sizeof(struct sockaddr_ll)
+TX_DATA_OFFSET = 32
+
+
+class TxReport(namedtuple('TxReport', 'frames bytes elapsed')):
+    """Achieved transmit rate"""
+
+    __slots__ = ()
+
+    @property
+    def pps(self):
+        return self.frames / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def bps(self):
+        return self.bytes * 8 / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self):
+        return (f"{self.frames} frames in {self.elapsed:.3f}s: "
+                f"{self.pps:,.0f} pps, {self.bps / 1e6:,.1f} Mbit/s")
+
+
+class TxRing:
+    """Memory-mapped TPACKET_V2 transmit ring on one interface
+
+    queue() copies a frame into the next free slot and marks it
+    TP_STATUS_SEND_REQUEST; flush() hands every pending slot to the
+    driver with a single send() call.
+    """
+
+    def __init__(self, interface, frame_size=2048, frame_nr=4096,
+                 block_size=1 << 16, qdisc_bypass=False):
+        if block_size % mmap.PAGESIZE or block_size % frame_size:
+            raise ValueError("block_size must be a multiple of page and frame size")
+        frames_per_block = block_size // frame_size
+        frame_nr -= frame_nr % frames_per_block
+        self.interface = interface
+        self.frame_size = frame_size
+        self.frame_nr = frame_nr
+        self.max_frame_len = frame_size - TX_DATA_OFFSET
+        self.current = 0
+        self.pending = 0
+        self.in_flight = False  # flushed without waiting for transmission
+        self.wrong_format = 0
+
+        self.sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW)
+        try:
+            self.sock.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V2)
+            if qdisc_bypass:
+                self.sock.setsockopt(SOL_PACKET, PACKET_QDISC_BYPASS, 1)
+            req = _TPACKET_REQ.pack(block_size, frame_nr // frames_per_block,
+                                    frame_size, frame_nr)
+            self.sock.setsockopt(SOL_PACKET, PACKET_TX_RING, req)
+            self._mmap = mmap.mmap(self.sock.fileno(), frame_size * frame_nr,
+                                   mmap.MAP_SHARED,
+                                   mmap.PROT_READ | mmap.PROT_WRITE)
+            self.sock.bind((interface, 0))
+        except Exception:
+            self.sock.close()
+            raise
+
+        self._view = memoryview(self._mmap)
+        self._poller = select.poll()
+        self._poller.register(self.sock.fileno(), select.POLLOUT)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def _wait_slot(self, base):
+        """Wait until the slot at base is free, flushing if needed"""
+        view = self._view
+        while True:
+            status = _U32.unpack_from(view, base)[0]
+            if status == TP_STATUS_AVAILABLE:
+                return
+            if status & TP_STATUS_WRONG_FORMAT:
+                # Kernel rejected the frame; reclaim the slot
+                self.wrong_format += 1
+                _U32.pack_into(view, base, TP_STATUS_AVAILABLE)
+                return
+            if status & TP_STATUS_SEND_REQUEST:
+                self.flush()
+            self._poller.poll(100)
+
+    def queue(self, frame):
+        """Copy one frame into the ring without sending it"""
+        self.queue_parts((frame,))
+
+    def queue_parts(self, parts):
+        """Queue one frame given as consecutive pieces (bytes or memoryviews)
+
+        The pieces are copied straight into the ring slot, so a frame can
+        be rebuilt around a received buffer without an intermediate copy.
+        """
+        length = sum(len(part) for part in parts)
+        if length > self.max_frame_len:
+            raise ValueError(f"Frame of {length} bytes exceeds ring slot "
+                             f"({self.max_frame_len} bytes)")
+        base = self.current * self.frame_size
+        self._wait_slot(base)
+
+        data = base + TX_DATA_OFFSET
+        for part in parts:
+            end = data + len(part)
+            self._view[data:end] = part
+            data = end
+        _TPACKET2_STATUS_LEN.pack_into(self._view, base, TP_STATUS_AVAILABLE, length)
+        # Publish the slot last
+        _U32.pack_into(self._view, base, TP_STATUS_SEND_REQUEST)
+
+        self.current = (self.current + 1) % self.frame_nr
+        self.pending += 1
+
+    def flush(self, wait=True):
+        """Send every queued frame with one syscall; returns bytes sent
+
+        With wait=False the call returns once the frames are handed to the
+        driver instead of waiting for their transmission to complete; a
+        later flush() with wait waits for those frames too.
+        """
+        if not self.pending and not (wait and self.in_flight):
+            return 0
+        self.pending = 0
+        self.in_flight = not wait
+        return self.sock.send(b'', 0 if wait else socket.MSG_DONTWAIT)
+
+    def close(self):
+        self.flush()
+        self._poller.unregister(self.sock.fileno())
+        self._view.release()
+        self._mmap.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class BatchTransmitter:
+    """Frame sender for the test scenarios, paced or at line rate
+
+    In paced mode send() transmits immediately and waits for the given
+    gap, measured from the previous frame's deadline so that gaps do not
+    drift. With line_rate the gaps are ignored and frames are flushed
+    every batch_size frames.
+    """
+
+    def __init__(self, interface, line_rate=False, batch_size=256, **ring_args):
+        self.interface = interface
+        self.line_rate = line_rate
+        self.batch_size = batch_size
+        self.ring = TxRing(interface, **ring_args)
+        self.timer = GapTimer()
+        self.frames = 0
+        self.bytes = 0
+        self.start_time = None
+        self.end_time = None
+
+    def send(self, frame, gap=0.0):
+        """Queue one frame; in paced mode send it now and wait gap seconds"""
+        if self.start_time is None:
+            self.start_time = time.perf_counter()
+        self.ring.queue(frame)
+        self.frames += 1
+        self.bytes += len(frame)
+
+        if not self.line_rate:
+            self.ring.flush()
+            if gap:
+                self.timer.wait(gap)
+        elif self.ring.pending >= self.batch_size:
+            self.ring.flush()
+
+    def send_batch(self, frames):
+        """Queue a sequence of frames and flush them together"""
+        if self.start_time is None:
+            self.start_time = time.perf_counter()
+        for frame in frames:
+            self.ring.queue(frame)
+            self.frames += 1
+            self.bytes += len(frame)
+            if self.ring.pending >= self.batch_size:
+                self.ring.flush()
+        self.ring.flush()
+
+    def flush(self):
+        self.ring.flush()
+        self.end_time = time.perf_counter()
+
+    def report(self):
+        """Achieved rate since the first frame"""
+        if self.start_time is None:
+            return TxReport(0, 0, 0.0)
+        end = self.end_time if self.end_time is not None else time.perf_counter()
+        return TxReport(self.frames, self.bytes, end - self.start_time)
+
+    def close(self):
+        self.flush()
+        self.ring.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -6,17 +6,10 @@ Using proper packet structure for official dissector recognition
 
 import sys
 import os
-import time
 import struct
-import socket
 
-sys.path.insert(0, '/home/kim/tsn_venv/lib/python3.12/site-packages')
-
-try:
-    from scapy.all import *
-except ImportError:
-    os.system("source /home/kim/tsn_venv/bin/activate && pip install scapy")
-    from scapy.all import *
+from frer_transmit import BatchTransmitter
+from frer_frame import FrameTemplate, interface_mac
 
 def check_wireshark_version():
     """Check Wireshark version and R-TAG support"""
@@ -29,102 +22,45 @@ def check_wireshark_version():
         print("  • ieee8021cb.reserved (Reserved)")
         print("  • ieee8021cb.seq (Sequence)")
         print("")
-    except:
+    except OSError:
         print("Could not determine Wireshark version")
 
-def create_proper_rtag_frame(seq_num, next_protocol=0x0800):
-    """Create R-TAG frame that Wireshark can properly dissect"""
-    
-    # Ethernet header
-    dst_mac = bytes.fromhex('ffffffffffff')  # Broadcast
+def get_src_mac(interface="enp2s0"):
+    """Source MAC of the test interface"""
     try:
-        src_mac_str = get_if_hwaddr("enp2s0").replace(':', '')
-        src_mac = bytes.fromhex(src_mac_str)
-    except:
-        src_mac = bytes.fromhex('68050cabd96e7')
-    
-    # VLAN tag: 0x8100 + Priority(3) + VLAN(100)
-    vlan_tci = (3 << 13) | 100
-    vlan_tag = struct.pack('!HH', 0x8100, vlan_tci)
+        return interface_mac(interface)
+    except OSError:
+        return bytes.fromhex('6805cabd96e7')
+
+def official_rtag_template(next_protocol=0x0800):
+    """R-TAG frame template that Wireshark can properly dissect"""
     
+    # Ethernet (broadcast) + VLAN tag: 0x8100 + Priority(3) + VLAN(100)
     # R-TAG structure according to IEEE 802.1CB
     # Note: In VLAN frames, R-TAG replaces the normal EtherType position
-    rtag_ethertype = 0xF1C1
-    rtag_reserved = 0x0000
-    rtag_sequence = seq_num
-    
-    # R-TAG: EtherType + Reserved + Sequence + Next Protocol
-    rtag_header = struct.pack('!HHHH', 
-                             rtag_ethertype,  # 0xF1C1
-                             rtag_reserved,   # 0x0000
-                             rtag_sequence,   # sequence number
-                             next_protocol)   # next protocol (IP = 0x0800)
-    
-    # IP packet payload
-    payload_text = f"Official R-TAG Test #{seq_num}"
-    
-    # Build minimal IP/UDP packet
-    ip_header = struct.pack('!BBHHHBBH4s4s',
-        0x45,  # Version + IHL
-        0x00,  # TOS
-        20 + 8 + len(payload_text),  # Total length
-        seq_num,  # ID
-        0x4000,  # Flags + Fragment
-        64,    # TTL
-        17,    # Protocol (UDP)
-        0,     # Checksum (simplified)
-        socket.inet_aton("192.168.100.1"),  # Src IP
-        socket.inet_aton("192.168.100.2")   # Dst IP
-    )
-    
-    udp_header = struct.pack('!HHHH',
-        12345,  # Src port
-        54321,  # Dst port
-        8 + len(payload_text),  # Length
-        0       # Checksum (simplified)
-    )
-    
-    # Complete frame
-    frame = (dst_mac + src_mac + vlan_tag + rtag_header + 
-             ip_header + udp_header + payload_text.encode())
+    # R-TAG: EtherType(0xF1C1) + Reserved(0x0000) + Sequence + Next Protocol
+    # followed by a minimal IP/UDP packet; sequence and IP ID are patched
+    # per frame by build()
+    return FrameTemplate(get_src_mac(), vlan_id=100, priority=3,
+                         next_protocol=next_protocol,
+                         payload=b"Official R-TAG Test", probe_stream=1)
+
+def reference_vlan_template():
+    """Reference VLAN frame template without R-TAG"""
     
-    return frame
+    # Direct IP EtherType (no R-TAG)
+    return FrameTemplate(get_src_mac(), vlan_id=100, priority=3, rtag=False,
+                         payload=b"Reference VLAN")
+
+def create_proper_rtag_frame(seq_num, next_protocol=0x0800):
+    """Create R-TAG frame that Wireshark can properly dissect"""
+    return bytes(official_rtag_template(next_protocol).build(seq_num))
 
 def create_reference_vlan_frame(seq_num):
     """Create reference VLAN frame without R-TAG"""
-    
-    dst_mac = bytes.fromhex('ffffffffffff')
-    try:
-        src_mac_str = get_if_hwaddr("enp2s0").replace(':', '')
-        src_mac = bytes.fromhex(src_mac_str)
-    except:
-        src_mac = bytes.fromhex('68050cabd96e7')
-    
-    # VLAN tag
-    vlan_tci = (3 << 13) | 100
-    vlan_tag = struct.pack('!HH', 0x8100, vlan_tci)
-    
-    # Direct IP EtherType (no R-TAG)
-    ip_ethertype = struct.pack('!H', 0x0800)
-    
-    # Simple IP/UDP payload
-    payload_text = f"Reference VLAN #{seq_num}"
-    
-    ip_udp = (
-        b'\x45\x00'  # IP version, header length, TOS
-        + struct.pack('!H', 20 + 8 + len(payload_text))  # Total length
-        + struct.pack('!H', seq_num)  # ID
-        + b'\x40\x00\x40\x11\x00\x00'  # Flags, TTL, protocol, checksum
-        + socket.inet_aton("192.168.100.1")  # Source IP
-        + socket.inet_aton("192.168.100.2")  # Dest IP
-        + struct.pack('!HHHH', 12345, 54321, 8 + len(payload_text), 0)  # UDP
-        + payload_text.encode()
-    )
-    
-    frame = dst_mac + src_mac + vlan_tag + ip_ethertype + ip_udp
-    return frame
+    return bytes(reference_vlan_template().build(seq_num))
 
-def send_official_rtag_test():
+def send_official_rtag_test(line_rate=False):
     """Send R-TAG frames designed for Wireshark official dissector"""
     
     print("=" * 80)
@@ -140,10 +76,9 @@ def send_official_rtag_test():
     print("  • Sequence numbers: 1-5 with duplicates")
     print("")
     
-    # Create raw socket
+    # Create raw socket with TX ring
     try:
-        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW)
-        sock.bind(("enp2s0", 0))
+        tx = BatchTransmitter("enp2s0", line_rate=line_rate)
     except PermissionError:
         print("❌ Need root permissions")
         return
@@ -154,41 +89,40 @@ def send_official_rtag_test():
     try:
         # Phase 1: Reference frames
         print("📤 Phase 1: Reference VLAN frames (no R-TAG)")
+        reference = reference_vlan_template()
         for i in range(3):
-            frame = create_reference_vlan_frame(i + 1)
-            sock.send(frame)
+            frame = reference.build(i + 1)
+            tx.send(frame, gap=0.3)
             print(f"   ✓ Reference #{i+1} sent ({len(frame)} bytes)")
-            time.sleep(0.3)
         
         print("")
         
         # Phase 2: Official R-TAG frames
         print("📤 Phase 2: Official R-TAG frames with FRER")
+        template = official_rtag_template()
         for i in range(5):
             seq_num = i + 1
-            frame = create_proper_rtag_frame(seq_num)
+            frame = template.build(seq_num)
             
             # Show R-TAG details
             rtag_bytes = struct.pack('!HHH', 0xF1C1, 0x0000, seq_num)
             print(f"   🏷️  Seq {seq_num}: R-TAG = {rtag_bytes.hex()}")
             
             # Send original
-            sock.send(frame)
+            tx.send(frame, gap=0.001)
             print(f"   ✓ Original sent ({len(frame)} bytes)")
             
-            time.sleep(0.001)
-            
-            # Send duplicate (FRER replication)
-            sock.send(frame)
+            # Send duplicate (FRER replication, path 1)
+            frame = template.build(seq_num, path_id=1, tx_ns=template.tx_ns)
+            tx.send(frame, gap=0.5)
             print(f"   ✓ Duplicate sent")
             print("")
             
-            time.sleep(0.5)
-            
     except Exception as e:
         print(f"❌ Error: {e}")
     finally:
-        sock.close()
+        tx.close()
+        print(f"📈 {tx.report().summary()}")
     
     print("=" * 80)
     print("✅ OFFICIAL R-TAG TEST COMPLETED")
@@ -221,4 +155,4 @@ def send_official_rtag_test():
     print("💡 Wireshark should now show 'IEEE 802.1CB' in Protocol column!")
 
 if __name__ == "__main__":
-    send_official_rtag_test()
\ No newline at end of file
+    send_official_rtag_test(line_rate="--line-rate" in sys.argv)
\ No newline at end of file
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+R-TAG Header Decoder - Fixed-offset IEEE 802.1CB parsing
+Walks the Ethernet / 802.1Q / QinQ tag chain without copying the frame
+"""
+
+import struct
+from collections import namedtuple
+
+# EtherTypes
+ETH_P_IP = 0x0800
+ETH_P_8021Q = 0x8100
+ETH_P_8021AD = 0x88A8
+ETH_P_QINQ_LEGACY = 0x9100
+ETH_P_RTAG = 0xF1C1
+
+VLAN_TPIDS = (ETH_P_8021Q, ETH_P_8021AD, ETH_P_QINQ_LEGACY)
+MAX_VLAN_TAGS = 2  # single-tagged and QinQ
+
+ETH_HEADER_LEN = 14
+VLAN_TAG_LEN = 4
+RTAG_LEN = 6  # Reserved(2) + Sequence(2) + Next Protocol(2), after the EtherType
+
+# Precompiled layouts, unpacked in place with unpack_from()
+_ETHERTYPE = struct.Struct('!H')
+_VLAN_TAG = struct.Struct('!HH')      # TCI, next EtherType
+_RTAG = struct.Struct('!HHH')         # Reserved, Sequence, Next Protocol
+
+# vlan/pcp are taken from the innermost tag (None for untagged frames),
+# payload_offset is the first byte after the R-TAG
+RTagHeader = namedtuple('RTagHeader',
+                        'vlan pcp sequence next_protocol payload_offset')
+
+
+def decode_rtag(buf, vlan_tci=None):
+    """Decode the R-TAG of a raw Ethernet frame in a single pass.
+
+    buf may be bytes, bytearray or memoryview; nothing is copied.
+    vlan_tci is the out-of-band TCI of a tag the kernel stripped on
+    receive (AF_PACKET auxdata); it is used when no tag is left in-band.
+    Returns an RTagHeader, or None if the frame carries no valid R-TAG.
+    """
+    try:
+        offset = 12
+        ethertype = _ETHERTYPE.unpack_from(buf, offset)[0]
+        tci = vlan_tci
+        for _ in range(MAX_VLAN_TAGS):
+            if ethertype not in VLAN_TPIDS:
+                break
+            tci, ethertype = _VLAN_TAG.unpack_from(buf, offset + 2)
+            offset += VLAN_TAG_LEN
+        if ethertype != ETH_P_RTAG:
+            return None
+        reserved, sequence, next_protocol = _RTAG.unpack_from(buf, offset + 2)
+    except struct.error:
+        # Truncated frame
+        return None
+
+    if reserved != 0x0000:
+        return None
+
+    if tci is None:
+        vlan = pcp = None
+    else:
+        vlan = tci & 0x0FFF
+        pcp = tci >> 13
+
+    return RTagHeader(vlan, pcp, sequence, next_protocol,
+                      offset + 2 + RTAG_LEN)
+
+
+def decode_tagless(buf, vlan_tci=None):
+    """Decode the headers of a frame that carries no R-TAG.
+
+    Returns an RTagHeader with sequence None, next_protocol set to the
+    frame's EtherType and payload_offset at the start of its payload, so
+    the frame can still be matched against identified streams. Returns
+    None for R-TAG or truncated frames.
+    """
+    try:
+        offset = 12
+        ethertype = _ETHERTYPE.unpack_from(buf, offset)[0]
+        tci = vlan_tci
+        for _ in range(MAX_VLAN_TAGS):
+            if ethertype not in VLAN_TPIDS:
+                break
+            tci, ethertype = _VLAN_TAG.unpack_from(buf, offset + 2)
+            offset += VLAN_TAG_LEN
+    except struct.error:
+        return None
+
+    if ethertype == ETH_P_RTAG:
+        return None
+
+    if tci is None:
+        vlan = pcp = None
+    else:
+        vlan = tci & 0x0FFF
+        pcp = tci >> 13
+
+    return RTagHeader(vlan, pcp, None, ethertype, offset + 2)
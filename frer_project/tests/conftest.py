@@ -0,0 +1,7 @@
+"""Unit tests for the NIC-independent modules: no root, no interfaces"""
+
+import os
+import sys
+
+# The modules are flat scripts next to this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,38 @@
+"""FRERAnalyzer on frames built in memory"""
+
+from frer_analysis_tool import FRERAnalyzer
+from frer_frame import FrameTemplate
+from frer_recovery import DISCARDED, PASSED, ROGUE
+
+SRC_MAC = bytes.fromhex('020000000001')
+
+
+def test_rogue_frame_stays_out_of_copy_and_arrival_stats():
+    analyzer = FRERAnalyzer(verbose=False, members=['a', 'b'])
+    template = FrameTemplate(SRC_MAC)
+    sequences = list(range(100)) + [30000] + list(range(100, 200))
+    for sequence in sequences:
+        for member in ((0,) if sequence == 30000 else (0, 1)):
+            analyzer.analyze_frame(bytes(template.build(sequence)), member=member)
+    analyzer.finish()
+    totals = analyzer.stream_totals()
+    assert (totals[PASSED], totals[DISCARDED], totals[ROGUE]) == (200, 200, 1)
+    assert analyzer.copy_histogram.distribution() == [(2, 200)]
+    assert list(analyzer.member_wins) == [200, 0]
+    assert list(analyzer.member_losses) == [0, 0]
+
+
+def test_latency_per_path_and_after_elimination():
+    analyzer = FRERAnalyzer(verbose=False)
+    template = FrameTemplate(SRC_MAC, probe_stream=1)
+    for sequence in range(10):
+        tx_ns = 1000000 * sequence
+        for path_id, delay in ((0, 5000), (1, 9000)):
+            frame = bytes(template.build(sequence, path_id=path_id, tx_ns=tx_ns))
+            analyzer.analyze_frame(frame, timestamp_ns=tx_ns + delay)
+    paths = analyzer.path_latency
+    assert sorted(paths) == [0, 1]
+    assert (paths[0].count, paths[0].min, paths[0].max) == (10, 5000, 5000)
+    assert (paths[1].count, paths[1].min, paths[1].max) == (10, 9000, 9000)
+    # Only the copies elimination passed: every first copy came over path 0
+    assert (analyzer.latency.count, analyzer.latency.max) == (10, 5000)
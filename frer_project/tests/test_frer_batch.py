@@ -0,0 +1,95 @@
+"""Vectorized batch analysis of in-memory frames"""
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import struct
+
+from frer_batch import decode_batch, sequence_statistics, BatchAnalyzer, SNAPLEN
+from frer_frame import FrameTemplate
+from rtag_decoder import decode_rtag
+
+SRC_MAC = bytes.fromhex('020000000001')
+
+
+def frames():
+    """Two streams, two copies each, stream 1 missing sequence 40"""
+    templates = [FrameTemplate(SRC_MAC, src_port=12345 + n) for n in range(2)]
+    result = []
+    for sequence in range(100):
+        for stream, template in enumerate(templates):
+            if stream == 1 and sequence == 40:
+                continue
+            result.extend([bytes(template.build(sequence))] * 2)
+    return result
+
+
+@pytest.mark.parametrize('convert', [bytes, bytearray, memoryview,
+                                     lambda frame: np.frombuffer(frame, np.uint8)])
+def test_statistics_for_any_buffer(convert):
+    analyzer = BatchAnalyzer(batch_size=64)
+    for n, frame in enumerate(frames()):
+        analyzer.add(convert(frame), timestamp_ns=n)
+    stats = analyzer.statistics()
+    assert (stats.frames, stats.rtag_frames, stats.streams) == (398, 398, 2)
+    assert (stats.unique, stats.duplicates, stats.lost) == (199, 199, 1)
+    assert stats.out_of_order == 0
+
+
+def test_short_and_non_rtag_frames():
+    analyzer = BatchAnalyzer(batch_size=4)
+    template = FrameTemplate(SRC_MAC, rtag=False)
+    analyzer.add(bytes(template.build(1)))
+    analyzer.add(b'\x00' * 10)
+    analyzer.add(bytes(FrameTemplate(SRC_MAC).build(5)))
+    stats = analyzer.statistics()
+    assert (stats.frames, stats.rtag_frames, stats.unique) == (3, 1, 1)
+
+
+def test_decode_batch_matches_decode_rtag():
+    tagged = bytes(FrameTemplate(SRC_MAC, vlan_id=100, priority=5).build(7))
+    untagged = bytes(FrameTemplate(SRC_MAC, vlan_id=None).build(8))
+    qinq = tagged[:12] + struct.pack('!HH', 0x88A8, 33) + tagged[12:]
+    reserved = bytearray(untagged)
+    reserved[15] = 1
+    cases = [(tagged, None), (untagged, None), (untagged, (6 << 13) | 300), (qinq, None),
+             (bytes(reserved), None), (untagged[:17], None),
+             (bytes(FrameTemplate(SRC_MAC, rtag=False).build(1)), None)]
+    rows = np.zeros((len(cases), SNAPLEN), np.uint8)
+    for i, (frame, _) in enumerate(cases):
+        size = min(len(frame), SNAPLEN)
+        rows[i, :size] = np.frombuffer(frame, np.uint8, size)
+    lengths = np.array([len(frame) for frame, _ in cases])
+    tci = np.array([-1 if tci is None else tci for _, tci in cases])
+    valid, sequence, vlan, pcp, _ = decode_batch(rows, lengths, tci)
+    for i, (frame, vlan_tci) in enumerate(cases):
+        header = decode_rtag(frame, vlan_tci)
+        assert bool(valid[i]) == (header is not None)
+        if header is not None:
+            assert (sequence[i], vlan[i], pcp[i]) == (header.sequence, header.vlan or 0,
+                                                      header.pcp or 0)
+
+
+def statistics(stream, sequence, timestamps=None):
+    if timestamps is None:
+        timestamps = range(len(sequence))
+    return sequence_statistics(np.array(stream, np.int64), np.array(sequence, np.int64),
+                               np.array(timestamps, np.int64))
+
+
+def test_sequence_statistics():
+    sequence = [1, 2, 2, 4, 3, 7, 7, 7, 8]
+    stats = statistics([0] * len(sequence), sequence, [0, 10, 30, 40, 50, 60, 65, 90, 100])
+    assert (stats['unique'], stats['duplicates']) == (6, 3)
+    assert (stats['lost'], stats['gap_events']) == (2, 1)
+    assert stats['out_of_order'] == 1
+    assert list(stats['copy_counts'][:4]) == [0, 4, 1, 1]
+    assert sorted(stats['copy_spread_ns']) == [20, 30]
+
+
+def test_sequence_statistics_unwraps_per_stream():
+    sequence = [65534, 65535, 0, 1, 65535, 0, 2]
+    stats = statistics([0, 0, 0, 0, 1, 1, 1], sequence)
+    assert stats['unique'] == 7
+    assert (stats['lost'], stats['out_of_order']) == (1, 0)
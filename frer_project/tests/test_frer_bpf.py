@@ -0,0 +1,159 @@
+"""Generated cBPF programs, run on a small interpreter instead of a socket"""
+
+import struct
+
+import pytest
+
+from frer_bpf import (compile_fanout_program, compile_rtag_filter, format_filter, _Assembler, BPF_ALU_ADD_K,
+                      BPF_ALU_AND_K, BPF_ALU_MUL_K, BPF_ALU_RSH_K, BPF_ALU_XOR_X,
+                      BPF_JMP_JA, BPF_JMP_JEQ_K, BPF_LD_H_ABS, BPF_LD_H_IND, BPF_LD_W_ABS,
+                      BPF_LD_W_IND, BPF_LDX_IMM, BPF_LDX_MEM, BPF_MISC_TXA, BPF_RET_A,
+                      BPF_RET_K, BPF_ST, IPV4_UDP_HEADERS, SKF_AD_OFF, SKF_AD_VLAN_TAG,
+                      SKF_AD_VLAN_TAG_PRESENT, SKF_LL_OFF, _SOCK_FILTER)
+from rtag_decoder import ETH_P_8021AD, ETH_P_8021Q, ETH_P_IP, ETH_P_RTAG, RTAG_LEN
+
+SRC = bytes.fromhex('020000000001')
+DST = bytes.fromhex('ffffffffffff')
+PAYLOAD = b'\x45' + bytes(63)
+MASK = 0xFFFFFFFF
+
+
+def run(program, frame, vlan_tci=None):
+    """Return value of a packed program; out-of-bounds loads return 0 as
+    in the kernel"""
+    code = [_SOCK_FILTER.unpack_from(program, i) for i in range(0, len(program), 8)]
+    a = x = pc = 0
+    memory = [0] * 16
+
+    def load(offset, size):
+        if offset >= 0x80000000:
+            offset -= 1 << 32
+        if offset >= SKF_AD_OFF and offset < 0:
+            if offset == SKF_AD_OFF + SKF_AD_VLAN_TAG:
+                return vlan_tci or 0
+            if offset == SKF_AD_OFF + SKF_AD_VLAN_TAG_PRESENT:
+                return int(vlan_tci is not None)
+            raise AssertionError(f"unexpected ancillary load {offset}")
+        if offset < 0:
+            offset -= SKF_LL_OFF
+        if offset + size > len(frame):
+            return None
+        return int.from_bytes(frame[offset:offset + size], 'big')
+
+    for _ in range(10000):
+        op, jt, jf, k = code[pc]
+        pc += 1
+        if op in (BPF_LD_W_ABS, BPF_LD_H_ABS, BPF_LD_W_IND, BPF_LD_H_IND):
+            offset = k + (x if op in (BPF_LD_W_IND, BPF_LD_H_IND) else 0)
+            a = load(offset & MASK, 4 if op in (BPF_LD_W_ABS, BPF_LD_W_IND) else 2)
+            if a is None:
+                return 0
+        elif op == BPF_LDX_IMM:
+            x = k
+        elif op == BPF_LDX_MEM:
+            x = memory[k]
+        elif op == BPF_ST:
+            memory[k] = a
+        elif op == BPF_MISC_TXA:
+            a = x
+        elif op == BPF_ALU_AND_K:
+            a &= k
+        elif op == BPF_ALU_ADD_K:
+            a = (a + k) & MASK
+        elif op == BPF_ALU_MUL_K:
+            a = (a * k) & MASK
+        elif op == BPF_ALU_RSH_K:
+            a >>= k
+        elif op == BPF_ALU_XOR_X:
+            a ^= x
+        elif op == BPF_JMP_JA:
+            pc += k
+        elif op == BPF_JMP_JEQ_K:
+            pc += jt if a == k else jf
+        elif op == BPF_RET_K:
+            return k
+        elif op == BPF_RET_A:
+            return a
+        else:
+            raise AssertionError(f"unexpected opcode {op:#x}")
+    raise AssertionError("program does not terminate")
+
+
+def frame(tags=(), rtag=True, reserved=0, src=SRC, dst=DST):
+    data = dst + src
+    for tpid, vlan in tags:
+        data += struct.pack('!HH', tpid, (3 << 13) | vlan)
+    if rtag:
+        data += struct.pack('!HHHH', ETH_P_RTAG, reserved, 1, ETH_P_IP)
+    else:
+        data += struct.pack('!H', ETH_P_IP)
+    return data + PAYLOAD
+
+
+def snap(tags, payload_bytes=0):
+    return 12 + 4 * tags + 2 + RTAG_LEN + IPV4_UDP_HEADERS + payload_bytes
+
+
+def test_assembler_resolves_forward_labels():
+    asm = _Assembler()
+    asm.goto('end')
+    asm.emit(BPF_RET_K, 1)
+    asm.emit(BPF_RET_K, 2)
+    asm.label('end')
+    asm.emit(BPF_RET_K, 3)
+    program = asm.assemble()
+    assert _SOCK_FILTER.unpack_from(program, 0) == (BPF_JMP_JA, 0, 0, 2)
+    assert run(program, b'') == 3
+    assert len(format_filter(program).splitlines()) == 4
+
+
+def test_accepts_rtag_frames_only():
+    program = compile_rtag_filter(payload_bytes=16)
+    assert run(program, frame()) == snap(0, 16)
+    assert run(program, frame([(ETH_P_8021Q, 100)])) == snap(1, 16)
+    assert run(program, frame([(ETH_P_8021AD, 200), (ETH_P_8021Q, 100)])) == snap(2, 16)
+    assert run(program, frame(rtag=False)) == 0
+    assert run(program, frame([(ETH_P_8021Q, 100)], rtag=False)) == 0
+    assert run(program, frame(reserved=1)) == 0
+    assert run(program, frame()[:13]) == 0
+
+
+def test_vlan_filter():
+    program = compile_rtag_filter(vlans=[100, 300])
+    assert run(program, frame([(ETH_P_8021Q, 100)])) == snap(1)
+    assert run(program, frame([(ETH_P_8021AD, 5), (ETH_P_8021Q, 300)])) == snap(2)
+    assert run(program, frame([(ETH_P_8021Q, 200)])) == 0
+    # Tag stripped by the kernel: VLAN from the metadata
+    assert run(program, frame(), vlan_tci=(3 << 13) | 100) == snap(0)
+    assert run(program, frame(), vlan_tci=(3 << 13) | 200) == 0
+    # Untagged: VLAN 0 from the metadata must not match
+    assert run(compile_rtag_filter(vlans=[0]), frame()) == 0
+
+
+def test_many_vlans_use_long_jumps():
+    vlans = list(range(1, 1001))
+    program = compile_rtag_filter(vlans=vlans)
+    for vlan in (1, 500, 1000):
+        assert run(program, frame([(ETH_P_8021Q, vlan)])) == snap(1)
+    assert run(program, frame([(ETH_P_8021Q, 1001)])) == 0
+
+
+@pytest.mark.parametrize('mac', [SRC, '02:00:00:00:00:01', '02-00-00-00-00-01'])
+def test_mac_filters(mac):
+    other = bytes.fromhex('020000000002')
+    program = compile_rtag_filter(src_macs=[other, mac], dst_macs=[DST])
+    assert run(program, frame()) == snap(0)
+    assert run(program, frame(src=bytes.fromhex('020000000003'))) == 0
+    assert run(program, frame(dst=other)) == 0
+
+
+def test_fanout_key_follows_the_stream():
+    program = compile_fanout_program()
+    key = run(program, frame([(ETH_P_8021Q, 100)]))
+    assert run(program, frame(), vlan_tci=(3 << 13) | 100) == key
+    later = bytearray(frame([(ETH_P_8021Q, 100)]))
+    struct.pack_into('!H', later, 20, 0xBEEF)     # R-TAG sequence number
+    assert run(program, later) == key
+    assert run(program, frame([(ETH_P_8021Q, 101)])) != key
+    assert run(program, frame([(ETH_P_8021Q, 100)], dst=bytes.fromhex('01005e000001'))) != key
+    assert run(program, frame(rtag=False)) == 0
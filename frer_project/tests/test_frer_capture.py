@@ -0,0 +1,86 @@
+"""TPACKET_V3 block walking on synthetic blocks in a plain buffer"""
+
+import struct
+from types import SimpleNamespace
+
+from frer_capture import (TPacketV3Ring, ETH_P_8021Q, TP_STATUS_KERNEL, TP_STATUS_USER,
+                          TP_STATUS_VLAN_TPID_VALID, TP_STATUS_VLAN_VALID, _BLOCK_DESC, _BLOCK_STATUS_OFFSET,
+                          _TPACKET3_HDR)
+
+BLOCK_SIZE = 4096
+FIRST_PACKET = 48
+MAC_OFFSET = 64     # frame data after the tpacket3_hdr and sockaddr_ll
+
+
+def ring(blocks):
+    """A TPacketV3Ring over blocks of [(sec, nsec, frame, status, tci, tpid), ...]
+
+    A block of None is still owned by the kernel.
+    """
+    buf = bytearray(BLOCK_SIZE * len(blocks))
+    for index, packets in enumerate(blocks):
+        base = index * BLOCK_SIZE
+        if packets is None:
+            continue
+        _BLOCK_DESC.pack_into(buf, base, 3, 0, TP_STATUS_USER, len(packets), FIRST_PACKET)
+        offset = base + FIRST_PACKET
+        for sec, nsec, frame, status, tci, tpid in packets:
+            next_offset = (MAC_OFFSET + len(frame) + 15) & ~15
+            _TPACKET3_HDR.pack_into(buf, offset, next_offset, sec, nsec, len(frame),
+                                    len(frame), status, MAC_OFFSET, 0, 0, tci, tpid)
+            buf[offset + MAC_OFFSET:offset + MAC_OFFSET + len(frame)] = frame
+            offset += next_offset
+    capture = TPacketV3Ring.__new__(TPacketV3Ring)
+    capture.block_size = BLOCK_SIZE
+    capture.block_nr = len(blocks)
+    capture.current_block = 0
+    capture._view = memoryview(buf)
+    capture._poller = SimpleNamespace(poll=lambda timeout: [])
+    return capture, buf
+
+
+def block_status(buf, index):
+    return struct.unpack_from('=I', buf, index * BLOCK_SIZE + _BLOCK_STATUS_OFFSET)[0]
+
+
+def test_read_block_delivers_frames_and_hands_the_block_back():
+    packets = [(1, 5, b'\x01' * 60, 0, 0, 0),
+               (2, 999999999, b'\x02' * 1514, TP_STATUS_VLAN_VALID, 0x6064, 0x8100)]
+    capture, buf = ring([packets, None])
+    seen = []
+    handler = lambda frame, tci, ts: seen.append((bytes(frame), tci, ts))
+    assert capture.read_block(handler) == 2
+    assert seen == [(b'\x01' * 60, None, 1000000005),
+                    (b'\x02' * 1514, 0x6064, 2999999999)]
+    assert block_status(buf, 0) == TP_STATUS_KERNEL
+    assert capture.current_block == 1
+    # The next block is still the kernel's: nothing after the poll timeout
+    assert capture.read_block(handler, timeout_ms=0) == 0
+    assert capture.current_block == 1
+
+
+def test_blocks_wrap_around():
+    frame = b'\x03' * 64
+    capture, buf = ring([[(0, 0, frame, 0, 0, 0)]] * 2)
+    handler = lambda frame, tci, ts: None
+    assert capture.read_block(handler) == 1
+    assert capture.read_block(handler) == 1
+    assert capture.current_block == 0
+
+
+def test_acquire_block_reports_the_stripped_tpid():
+    both = TP_STATUS_VLAN_VALID | TP_STATUS_VLAN_TPID_VALID
+    packets = [(0, 1, b'\x04' * 60, both, 0x2005, 0x88A8),
+               (0, 2, b'\x05' * 60, TP_STATUS_VLAN_VALID, 0x2006, 0),
+               (0, 3, b'\x06' * 60, 0, 0, 0)]
+    capture, buf = ring([packets])
+    frames = capture.acquire_block()
+    assert [(ts, tci, bytes(frame), tpid) for ts, tci, frame, tpid in frames] == [
+        (1, 0x2005, b'\x04' * 60, 0x88A8),
+        (2, 0x2006, b'\x05' * 60, ETH_P_8021Q),
+        (3, None, b'\x06' * 60, ETH_P_8021Q)]
+    assert block_status(buf, 0) == TP_STATUS_USER
+    del frames
+    capture.release_block()
+    assert block_status(buf, 0) == TP_STATUS_KERNEL
+    assert capture.acquire_block() is None
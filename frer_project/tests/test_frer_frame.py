@@ -0,0 +1,111 @@
+"""Frame templates: layout and incrementally updated IPv4/UDP checksums"""
+
+import socket
+import struct
+
+import pytest
+
+from frer_frame import (checksum_update, decode_probe, internet_checksum, FrameTemplate,
+                        IPV4_HEADER_LEN, PROBE_LEN, UDP_HEADER_LEN)
+from rtag_decoder import decode_rtag, ETH_P_IP
+
+SRC_MAC = bytes.fromhex('020000000001')
+
+
+def reference_checksum(data):
+    """RFC 1071 the slow way, independent of frer_frame"""
+    data = bytes(data) + b'\x00' * (len(data) & 1)
+    total = sum(int.from_bytes(data[i:i + 2], 'big') for i in range(0, len(data), 2))
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+
+def assert_checksums_valid(frame, ip_offset):
+    frame = bytes(frame)
+    ip = frame[ip_offset:ip_offset + IPV4_HEADER_LEN]
+    assert reference_checksum(ip) == 0
+    udp = frame[ip_offset + IPV4_HEADER_LEN:]
+    assert struct.unpack_from('!H', udp, 4)[0] == len(udp)
+    pseudo = ip[12:20] + struct.pack('!BBH', 0, socket.IPPROTO_UDP, len(udp))
+    assert reference_checksum(pseudo + udp) == 0
+
+
+def test_internet_checksum_matches_reference():
+    for data in (b'', b'\x01', bytes(range(20)), bytes(range(255)) * 3):
+        assert internet_checksum(data) == reference_checksum(data)
+
+
+def test_checksum_update_matches_recompute():
+    header = bytearray(range(20))
+    for old, new in ((0x0405, 0x0000), (0x0000, 0xFFFF), (0xFFFF, 0x1234)):
+        struct.pack_into('!H', header, 4, old)
+        struct.pack_into('!H', header, 10, 0)
+        checksum = internet_checksum(header)
+        struct.pack_into('!H', header, 4, new)
+        assert checksum_update(checksum, old, new) == internet_checksum(header)
+
+
+@pytest.mark.parametrize('vlan_id', [100, None])
+@pytest.mark.parametrize('payload', [b'', b'x', b'odd-length payload!', bytes(1400)])
+def test_build_keeps_checksums_valid(vlan_id, payload):
+    template = FrameTemplate(SRC_MAC, vlan_id=vlan_id, payload=payload)
+    for sequence in list(range(0, 70000, 997)) + [0xFFFF, 0x10000, 5, 5]:
+        frame = template.build(sequence)
+        header = decode_rtag(frame)
+        assert header.sequence == sequence & 0xFFFF
+        assert header.next_protocol == ETH_P_IP
+        assert header.vlan == vlan_id
+        assert len(frame) == header.payload_offset + IPV4_HEADER_LEN + UDP_HEADER_LEN + len(payload)
+        assert_checksums_valid(frame, template.ip_offset)
+
+
+def test_explicit_ip_id():
+    template = FrameTemplate(SRC_MAC)
+    frame = template.build(7, ip_id=0xBEEF)
+    assert struct.unpack_from('!H', frame, template.ip_offset + 4)[0] == 0xBEEF
+    assert_checksums_valid(frame, template.ip_offset)
+
+
+def test_set_payload_rewrites_lengths():
+    template = FrameTemplate(SRC_MAC, payload=b'short')
+    template.build(1)
+    template.set_payload(b'a much longer payload than before')
+    assert_checksums_valid(template.build(2), template.ip_offset)
+    with pytest.raises(ValueError):
+        template.set_payload(bytes(template.max_payload + 1))
+
+
+def test_without_rtag():
+    template = FrameTemplate(SRC_MAC, rtag=False, payload=b'abc')
+    frame = template.build(9)
+    assert decode_rtag(frame) is None
+    assert_checksums_valid(frame, template.ip_offset)
+
+
+@pytest.mark.parametrize('payload', [b'', b'odd', bytes(100)])
+def test_probe_stamps_keep_udp_checksum_valid(payload):
+    template = FrameTemplate(SRC_MAC, probe_stream=7, payload=payload)
+    assert len(template) == template.payload_offset + PROBE_LEN + len(payload)
+    stamps = [(0, 0), (1, 1700000000123456789), (255, (1 << 64) - 1), (2, 5), (2, 5)]
+    for sequence, (path_id, tx_ns) in enumerate(stamps):
+        frame = template.build(sequence, path_id=path_id, tx_ns=tx_ns)
+        assert_checksums_valid(frame, template.ip_offset)
+        assert decode_probe(frame, decode_rtag(frame)) == (7, path_id, tx_ns)
+
+
+def test_probe_copies_share_the_tx_time():
+    template = FrameTemplate(SRC_MAC, probe_stream=1)
+    first = bytes(template.build(1, path_id=0))
+    second = bytes(template.build(1, path_id=1, tx_ns=template.tx_ns))
+    probes = [decode_probe(frame, decode_rtag(frame)) for frame in (first, second)]
+    assert [probe[1] for probe in probes] == [0, 1]
+    assert probes[0][2] == probes[1][2]
+    assert_checksums_valid(second, template.ip_offset)
+
+
+def test_frames_without_probe():
+    frame = bytes(FrameTemplate(SRC_MAC, payload=bytes(32)).build(1))
+    assert decode_probe(frame, decode_rtag(frame)) is None
+    short = bytes(FrameTemplate(SRC_MAC).build(1))
+    assert decode_probe(short, decode_rtag(short)) is None
@@ -0,0 +1,141 @@
+"""Impairment model and the ground-truth oracle it is scored against"""
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from frer_impairment import (EventBatch, GroundTruth, ImpairedSchedule, PathImpairment,
+                             COPY, DUPLICATE, ROGUE_COPY, SCORED)
+from frer_recovery import (RecoveryTable, DISCARDED, LOST, OUT_OF_ORDER, PASSED, RESETS,
+                           ROGUE)
+
+
+def truth_of(departures, streams=1):
+    """GroundTruth of (time_ns, index, sequence) copies on path 0"""
+    time_ns, index, sequence = zip(*departures)
+    truth = GroundTruth(1, streams, max(index) + 1)
+    truth.add(EventBatch(np.array(time_ns, np.int64), np.zeros(len(time_ns), np.uint8),
+                         np.array(index, np.uint32), np.array(sequence, np.uint16),
+                         np.full(len(time_ns), COPY, np.uint8)))
+    return truth
+
+
+def counters(expected, *names):
+    return [expected[name] for name in names]
+
+
+def test_expected_in_order_with_duplicates():
+    departures = [(n, n, n + 1) for n in range(100)] * 2
+    departures.sort()
+    [expected] = truth_of(departures).expected()
+    assert counters(expected, PASSED, DISCARDED, LOST) == [100, 100, 0]
+
+
+def test_expected_reorder_loss_and_rogue():
+    sequences = [1, 3, 2, 1, 40000] + [n for n in range(4, 100) if n != 50]
+    departures = [(n, n, sequence) for n, sequence in enumerate(sequences)]
+    [expected] = truth_of(departures).expected(history_length=32)
+    assert counters(expected, PASSED, DISCARDED, OUT_OF_ORDER, ROGUE, LOST) == [98, 1, 1, 1, 1]
+
+
+def test_expected_reset_timeout():
+    departures = [(0, 0, 1), (2 * 10**9, 1, 30000), (2 * 10**9 + 1, 2, 30001)]
+    [expected] = truth_of(departures).expected(reset_timeout=1.0)
+    assert counters(expected, PASSED, RESETS, ROGUE) == [3, 1, 0]
+    [expected] = truth_of(departures).expected(reset_timeout=None)
+    assert counters(expected, PASSED, RESETS, ROGUE) == [1, 0, 2]
+
+
+def test_expected_per_stream():
+    # Slot n is stream n % 2; stream 1 never receives its sequence 10
+    departures = [(n, n, n // 2) for n in range(200) if n != 21]
+    first, second = truth_of(departures, streams=2).expected()
+    assert counters(first, PASSED, LOST) == [100, 0]
+    assert counters(second, PASSED, LOST) == [99, 1]
+
+
+PATHS = [
+    PathImpairment(loss=0.02, burst_loss=0.002, burst_length=30, jitter=20e-6,
+                   jitter_distribution='normal', reorder=0.05, duplicate=0.01, rogue=0.005),
+    PathImpairment(loss=0.01, burst_loss=0.003, burst_length=40, delay=50e-6, jitter=30e-6, jitter_distribution='exponential',
+                   reorder=0.02, reorder_depth=8),
+]
+
+
+@pytest.mark.parametrize('reset_timeout', [1.0, 0.0001])
+def test_expected_matches_recovery_table(reset_timeout):
+    schedule = ImpairedSchedule(PATHS, count=30000, period_ns=10000, streams=3,
+                                first_sequence=65000, batch_size=4096, seed=7)
+    table = RecoveryTable(reset_timeout=reset_timeout, latent_error_paths=None, rows=3)
+    for events in schedule.batches():
+        for time_ns, index, sequence in zip(events.time_ns.tolist(), events.index.tolist(),
+                                            events.sequence.tolist()):
+            table.accept(index % 3, sequence, time_ns / 1e9)
+    truth = schedule.truth
+    assert truth.frames == sum(path['frames'] for path in truth.summary()['paths'])
+    for stream, expected in enumerate(truth.expected(reset_timeout=reset_timeout)):
+        received = table.row_counters(stream)
+        assert [expected[c] for c in SCORED] == [received[c] for c in SCORED]
+        if reset_timeout < 1.0:
+            assert expected[RESETS] > 0
+
+
+def test_clean_paths_deliver_every_copy():
+    schedule = ImpairedSchedule([PathImpairment(), PathImpairment()], count=10000,
+                                period_ns=1000, streams=2, batch_size=1000)
+    times = np.concatenate([events.time_ns for events in schedule.batches()])
+    assert np.all(np.diff(times) >= 0)
+    truth = schedule.truth
+    assert truth.frames == 20000
+    assert truth.summary()['unreached'] == 0
+    for expected in truth.expected():
+        assert counters(expected, PASSED, DISCARDED, LOST) == [5000, 5000, 0]
+
+
+def test_same_seed_same_schedule():
+    def run(seed):
+        schedule = ImpairedSchedule(PATHS, count=5000, period_ns=10000, seed=seed)
+        return list(schedule.events())
+    assert run(3) == run(3)
+    assert run(3) != run(4)
+
+
+def test_event_kinds_are_accounted():
+    schedule = ImpairedSchedule(PATHS, count=20000, period_ns=10000, seed=2)
+    for _ in schedule.batches():
+        pass
+    events = schedule.truth.events
+    summary = schedule.truth.summary()
+    for path, stats in enumerate(summary['paths']):
+        mine = events.path == path
+        assert stats['duplicates'] == np.count_nonzero(mine & (events.kind == DUPLICATE))
+        assert stats['rogue'] == np.count_nonzero(mine & (events.kind == ROGUE_COPY))
+    assert summary['paths'][0]['duplicates'] > 0 and summary['paths'][0]['rogue'] > 0
+    assert summary['paths'][1]['duplicates'] == summary['paths'][1]['rogue'] == 0
+
+
+def test_truth_save_and_load(tmp_path):
+    schedule = ImpairedSchedule(PATHS, count=3000, period_ns=10000, streams=2)
+    for _ in schedule.batches():
+        pass
+    path = str(tmp_path / 'truth.npz')
+    schedule.truth.save(path)
+    loaded = GroundTruth.load(path)
+    assert (loaded.paths, loaded.streams, loaded.slots) == (2, 2, 3000)
+    for column, original in zip(loaded.events, schedule.truth.events):
+        assert np.array_equal(column, original)
+    assert loaded.expected() == schedule.truth.expected()
+
+
+@pytest.mark.parametrize('arguments', [
+    {'loss': 1.5}, {'rogue': -0.1}, {'burst_length': 0.5}, {'delay': -1e-6},
+    {'jitter_distribution': 'pareto'}, {'reorder_depth': 0},
+])
+def test_invalid_impairments(arguments):
+    with pytest.raises(ValueError):
+        PathImpairment(**arguments)
+
+
+def test_describe():
+    assert PathImpairment().describe() == "clean"
+    assert "loss 2.00%" in PATHS[0].describe()
@@ -0,0 +1,96 @@
+"""Pacing schedules and absolute deadlines on a simulated clock"""
+
+from itertools import islice
+from types import SimpleNamespace
+
+import pytest
+
+import frer_pacer
+from frer_pacer import GapTimer, Pacer, bursts, constant_rate, periodic
+
+MS = 1000000
+
+
+class FakeClock:
+    """Every reading advances a little; sleeps advance by the request plus oversleep"""
+
+    def __init__(self, tick=100):
+        self.now = 0
+        self.tick = tick
+        self.oversleep = []     # extra ns for the next sleeps, in order
+
+    def monotonic_ns(self):
+        self.now += self.tick
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += round(seconds * 1e9)
+        if self.oversleep:
+            self.now += self.oversleep.pop(0)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(frer_pacer, 'time',
+                        SimpleNamespace(monotonic_ns=fake.monotonic_ns, sleep=fake.sleep))
+    return fake
+
+
+def test_constant_rate_offsets_do_not_accumulate_rounding():
+    assert list(islice(constant_rate(3), 4)) == [
+        (0, 0), (333333333, 1), (666666667, 2), (1000000000, 3)]
+
+
+def test_bursts_share_one_deadline():
+    offsets = [offset for offset, _ in islice(bursts(3, 300), 7)]
+    assert offsets == [0, 0, 0, 10 * MS, 10 * MS, 10 * MS, 20 * MS]
+
+
+def test_periodic_merges_streams_in_priority_order():
+    schedule = periodic([10, 15], phases_ns=[0, 5], counts=[3, 2])
+    assert list(schedule) == [(0, 0), (5, 1), (10, 0), (20, 0), (20, 1)]
+    assert list(periodic([10, 15], counts=[0, 2])) == [(0, 1), (15, 1)]
+
+
+def test_pacer_meets_each_deadline(clock):
+    sent, flushes = [], []
+    report = Pacer().run(constant_rate(1000), sent.append,
+                         lambda: flushes.append(len(sent)), count=5)
+    assert sent == [0, 1, 2, 3, 4]
+    assert flushes == [1, 2, 3, 4, 5]
+    assert report.frames == 5 and report.late == 0
+    assert report.pps == pytest.approx(1000, rel=0.01)
+
+
+def test_oversleep_delays_frames_without_shifting_the_schedule(clock):
+    # The wait for frame 1 overshoots 2.5 ms: frames 1-3 go out together
+    clock.oversleep = [2500000]
+    sent, flushes = [], []
+    report = Pacer().run(constant_rate(1000), sent.append,
+                         lambda: flushes.append(len(sent)), count=5)
+    assert sent == [0, 1, 2, 3, 4]
+    assert flushes == [1, 4, 5]
+    assert report.late == 3
+    assert report.elapsed == pytest.approx(0.004, rel=0.01)
+
+
+def test_duration_includes_the_last_deadline(clock):
+    sent = []
+    report = Pacer().run(constant_rate(1000), sent.append, duration=0.01)
+    assert report.frames == len(sent) == 11
+
+
+def test_gap_timer_counts_from_the_previous_deadline(clock):
+    timer = GapTimer()
+    timer.wait(0.001)
+    first = timer.deadline
+    assert clock.now >= first
+    # Time spent between waits is absorbed instead of added
+    clock.now += 600000
+    timer.wait(0.001)
+    clock.now += 1500000
+    before = clock.now
+    timer.wait(0.001)
+    assert timer.deadline == first + 2 * MS
+    assert clock.now - before < 1000     # already late: no sleep
@@ -0,0 +1,158 @@
+"""pcap/pcapng reader on hand-built captures"""
+
+import struct
+
+import pytest
+
+from frer_pcap import (PcapReader, PcapWriter, LINKTYPE_ETHERNET, PCAP_MAGIC_NSEC, PCAP_MAGIC_USEC,
+                       PCAPNG_BYTE_ORDER_MAGIC, PCAPNG_EPB, PCAPNG_IDB, PCAPNG_SHB,
+                       PCAPNG_SPB, PCAPNG_OPT_IF_TSRESOL)
+
+FRAMES = [bytes(range(60)), b'\xaa' * 61, b'\x55' * 1514]
+
+
+def replay(path, max_frames=None):
+    frames = []
+    with PcapReader(path) as reader:
+        count = reader.replay(lambda frame, tci, ts: frames.append((bytes(frame), tci, ts)),
+                             max_frames)
+    assert count == len(frames)
+    return frames
+
+
+def pcap(endian='<', magic=PCAP_MAGIC_USEC, linktype=LINKTYPE_ETHERNET, frames=FRAMES):
+    data = struct.pack(endian + 'IHHiIII', magic, 2, 4, 0, 0, 0xFFFF, linktype)
+    for n, frame in enumerate(frames):
+        data += struct.pack(endian + 'IIII', 1000 + n, 250, len(frame), len(frame)) + frame
+    return data
+
+
+def pad(data):
+    return data + bytes(-len(data) % 4)
+
+
+def block(block_type, body, endian='<'):
+    body = pad(body)
+    length = 12 + len(body)
+    return struct.pack(endian + 'II', block_type, length) + body + struct.pack(endian + 'I', length)
+
+
+def shb(endian='<'):
+    return block(PCAPNG_SHB, struct.pack(endian + 'IHHq', PCAPNG_BYTE_ORDER_MAGIC, 1, 0, -1),
+                 endian)
+
+
+def idb(tsresol=None, endian='<', linktype=LINKTYPE_ETHERNET):
+    body = struct.pack(endian + 'HHI', linktype, 0, 0xFFFF)
+    if tsresol is not None:
+        body += pad(struct.pack(endian + 'HH', PCAPNG_OPT_IF_TSRESOL, 1) + bytes((tsresol,)))
+        body += struct.pack(endian + 'HH', 0, 0)
+    return block(PCAPNG_IDB, body, endian)
+
+
+def epb(frame, ts, if_id=0, endian='<'):
+    return block(PCAPNG_EPB, struct.pack(endian + 'IIIII', if_id, ts >> 32, ts & 0xFFFFFFFF,
+                                         len(frame), len(frame)) + frame, endian)
+
+
+def spb(frame, endian='<'):
+    return block(PCAPNG_SPB, struct.pack(endian + 'I', len(frame)) + frame, endian)
+
+
+def write(tmp_path, data, name='capture'):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+@pytest.mark.parametrize('endian', ['<', '>'])
+def test_pcap_microseconds(tmp_path, endian):
+    frames = replay(write(tmp_path, pcap(endian)))
+    assert [frame for frame, _, _ in frames] == FRAMES
+    assert [ts for _, _, ts in frames] == [(1000 + n) * 10**9 + 250000 for n in range(3)]
+    assert all(tci is None for _, tci, _ in frames)
+
+
+def test_pcap_nanoseconds(tmp_path):
+    frames = replay(write(tmp_path, pcap(magic=PCAP_MAGIC_NSEC)))
+    assert frames[0][2] == 1000 * 10**9 + 250
+
+
+def test_pcap_truncated_last_record(tmp_path):
+    frames = replay(write(tmp_path, pcap()[:-10]))
+    assert [frame for frame, _, _ in frames] == FRAMES[:2]
+
+
+def test_max_frames(tmp_path):
+    assert len(replay(write(tmp_path, pcap()), max_frames=2)) == 2
+
+
+def test_rejected_files(tmp_path):
+    with pytest.raises(ValueError):
+        PcapReader(write(tmp_path, b'', 'empty'))
+    with pytest.raises(ValueError):
+        PcapReader(write(tmp_path, b'not a capture file', 'text'))
+    with pytest.raises(ValueError):
+        PcapReader(write(tmp_path, b'\xd4\xc3', 'truncated'))
+    with pytest.raises(ValueError):
+        replay(write(tmp_path, pcap(linktype=113), 'sll'))
+
+
+@pytest.mark.parametrize('endian', ['<', '>'])
+def test_pcapng(tmp_path, endian):
+    data = (shb(endian) + idb(endian=endian) + idb(9, endian)
+            + epb(FRAMES[0], 5000001, 0, endian) + epb(FRAMES[1], 7 << 32, 1, endian)
+            + spb(FRAMES[2], endian))
+    frames = replay(write(tmp_path, data))
+    assert [frame for frame, _, _ in frames] == FRAMES
+    # Default microseconds, if_tsresol 9 is nanoseconds, SPBs carry no time
+    assert [ts for _, _, ts in frames] == [5000001000, 7 << 32, None]
+
+
+def test_pcapng_binary_tsresol(tmp_path):
+    data = shb() + idb(0x80 | 10) + epb(FRAMES[0], 3 << 10)
+    assert replay(write(tmp_path, data))[0][2] == 3 * 10**9
+
+
+def test_pcapng_sections_restart_interfaces(tmp_path):
+    data = (shb() + idb(9) + epb(FRAMES[0], 1)
+            + shb('>') + idb(endian='>') + epb(FRAMES[1], 1, endian='>'))
+    assert [ts for _, _, ts in replay(write(tmp_path, data))] == [1, 1000]
+
+
+def test_pcapng_skips_other_link_types(tmp_path):
+    data = shb() + idb(linktype=113) + idb() + epb(FRAMES[0], 1, 0) + epb(FRAMES[1], 1, 1)
+    assert [frame for frame, _, _ in replay(write(tmp_path, data))] == [FRAMES[1]]
+
+
+@pytest.mark.parametrize('packets', [
+    epb(FRAMES[0], 1),                  # before any interface
+    spb(FRAMES[0]),
+    idb() + epb(FRAMES[0], 1, if_id=1), # undeclared interface
+])
+def test_pcapng_packet_without_interface_stops(tmp_path, packets):
+    data = shb() + packets + idb() + epb(FRAMES[1], 1)
+    assert replay(write(tmp_path, data)) == []
+
+
+def test_pcapng_truncated_block(tmp_path):
+    data = shb() + idb() + epb(FRAMES[0], 1) + epb(FRAMES[1], 1)[:-8]
+    assert [frame for frame, _, _ in replay(write(tmp_path, data))] == [FRAMES[0]]
+
+
+def test_writer_round_trip(tmp_path):
+    path = str(tmp_path / 'written.pcap')
+    stamps = [1700000000123456789, 1700000000123456790, 5]
+    with PcapWriter(path) as writer:
+        for frame, timestamp_ns in zip(FRAMES, stamps):
+            writer.write(memoryview(frame), timestamp_ns)
+    assert (writer.frames, writer.bytes) == (3, sum(map(len, FRAMES)))
+    assert replay(path) == [(frame, None, ts) for frame, ts in zip(FRAMES, stamps)]
+
+
+def test_writer_snaplen(tmp_path):
+    path = str(tmp_path / 'snapped.pcap')
+    with PcapWriter(path, snaplen=64) as writer:
+        for frame in FRAMES:
+            writer.write(frame, 0)
+    assert [frame for frame, _, _ in replay(path)] == [frame[:64] for frame in FRAMES]
@@ -0,0 +1,84 @@
+"""Columnar recordings: chunk writing and loading back"""
+
+import os
+import threading
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('pandas')
+
+import frer_recorder
+from frer_recorder import (CaptureRecorder, load_recording, read_metadata, COLUMN_NAMES,
+                           DISCARDED, PASSED)
+
+
+def record_frames(recorder, count):
+    for n in range(count):
+        recorder.record(1000 * n, n % 2, 7, n, 100 if n % 3 else None,
+                        3 if n % 3 else None, 64 + n, PASSED if n % 2 == 0 else DISCARDED)
+
+
+def test_round_trip_over_several_chunks(tmp_path):
+    recorder = CaptureRecorder(str(tmp_path), members=['eth0', 'eth1'], chunk_rows=4)
+    record_frames(recorder, 10)
+    recorder.record_tagless(99999, None, 8, None, None, 60)
+    recorder.close(stream_keys={7: 1 << 70})
+    assert (recorder.rows, recorder.chunks, recorder.dropped) == (11, 3, 0)
+
+    meta = read_metadata(str(tmp_path))
+    assert (meta['rows'], meta['chunks'], meta['chunk_rows']) == (11, 3, 4)
+    assert meta['stream_keys'] == {'7': f"{1 << 70:x}"}
+
+    frame = load_recording(str(tmp_path))
+    assert len(frame) == 11
+    assert list(frame['timestamp_ns'][:10]) == [1000 * n for n in range(10)]
+    assert list(frame['sequence'][:10]) == list(range(10))
+    assert list(frame['vlan'][:4]) == [-1, 100, 100, -1]
+    assert list(frame['pcp'][:4]) == [-1, 3, 3, -1]
+    assert list(frame['interface'][:2]) == ['eth0', 'eth1']
+    last = frame.iloc[-1]
+    assert (last['member'], last['stream'], last['sequence'], last['length'],
+            last['decision']) == (-1, 8, -1, 60, frer_recorder.TAGLESS)
+    assert frame['length'].dtype == np.uint16
+
+
+def test_selected_columns_and_mmap(tmp_path):
+    recorder = CaptureRecorder(str(tmp_path), chunk_rows=4)
+    record_frames(recorder, 6)
+    recorder.close()
+    frame = load_recording(str(tmp_path), columns=['sequence', 'length'], mmap=True)
+    assert list(frame.columns) == ['sequence', 'length']
+    assert list(frame['length']) == [64, 65, 66, 67, 68, 69]
+
+
+def test_unfinished_run_loads_complete_chunks_only(tmp_path):
+    recorder = CaptureRecorder(str(tmp_path), chunk_rows=4)
+    record_frames(recorder, 10)
+    recorder.close()
+    os.remove(str(tmp_path / frer_recorder.META_FILE))
+    # The last chunk lost a column, as if killed mid-write
+    os.remove(frer_recorder._chunk_path(str(tmp_path), 2, 'decision'))
+    assert read_metadata(str(tmp_path)) is None
+    frame = load_recording(str(tmp_path))
+    assert len(frame) == 8
+    assert 'interface' not in frame
+    assert list(frame.columns) == list(COLUMN_NAMES)
+
+
+def test_frames_dropped_while_the_writer_is_behind(tmp_path, monkeypatch):
+    release = threading.Event()
+    chunk_path = frer_recorder._chunk_path
+
+    def slow_chunk_path(*args):
+        release.wait(5)
+        return chunk_path(*args)
+
+    monkeypatch.setattr(frer_recorder, '_chunk_path', slow_chunk_path)
+    recorder = CaptureRecorder(str(tmp_path), chunk_rows=2, buffers=1)
+    record_frames(recorder, 4)
+    assert recorder.dropped == 2
+    release.set()
+    recorder.close()
+    assert (recorder.rows, recorder.chunks) == (2, 1)
+    assert "2 dropped" in recorder.summary()
@@ -0,0 +1,181 @@
+"""VectorRecoveryAlgorithm decisions and counters (IEEE 802.1CB 7.4.3.4)"""
+
+import pytest
+
+from frer_recovery import (RecoveryTable, SequenceRecovery, sequence_delta, COUNTER_NAMES,
+                           DISCARDED, LATENT_ERRORS, LATENT_ERROR_RESETS, LOST, OUT_OF_ORDER,
+                           PASSED, RESETS, ROGUE)
+
+
+def run(sequences, history_length=32, reset_timeout=1.0, now=0.0):
+    recovery = SequenceRecovery(history_length, reset_timeout, latent_error_paths=None)
+    decisions = [recovery.accept(sequence, now) for sequence in sequences]
+    return recovery, decisions
+
+
+def test_sequence_delta_wraps():
+    assert sequence_delta(5, 3) == 2
+    assert sequence_delta(3, 5) == -2
+    assert sequence_delta(0, 0xFFFF) == 1
+    assert sequence_delta(0xFFFF, 0) == -1
+
+
+def test_in_order():
+    recovery, decisions = run(range(1, 101))
+    assert all(decisions)
+    assert recovery.counters[PASSED] == 100
+    assert recovery.counters[LOST] == recovery.counters[DISCARDED] == 0
+
+
+def test_duplicates_are_discarded():
+    recovery, decisions = run([n // 2 for n in range(2, 202)])
+    assert decisions == [True, False] * 100
+    assert recovery.counters[PASSED] == 100
+    assert recovery.counters[DISCARDED] == 100
+
+
+def test_out_of_order_inside_window():
+    recovery, decisions = run([1, 3, 2, 2])
+    assert decisions == [True, True, True, False]
+    assert recovery.counters[OUT_OF_ORDER] == 1
+    assert recovery.counters[DISCARDED] == 1
+
+
+def test_rogue_outside_window():
+    recovery, decisions = run([1, 32, 64, 0xFFF0], history_length=32)
+    assert decisions == [True, True, False, False]
+    assert recovery.counters[ROGUE] == 2
+    assert recovery.recov_seq_num == 32
+
+
+def test_lost_when_leaving_window():
+    sequences = [n for n in range(1, 51) if n != 10]
+    recovery, _ = run(sequences[:38], history_length=32)
+    assert recovery.counters[LOST] == 0
+    recovery, _ = run(sequences, history_length=32)
+    assert recovery.counters[LOST] == 1
+
+
+def test_wraparound():
+    sequences = [n & 0xFFFF for n in range(0xFFF0, 0x10010)]
+    recovery, decisions = run(sequences + sequences[-8:])
+    assert recovery.counters[PASSED] == len(sequences)
+    assert recovery.counters[DISCARDED] == 8
+    assert recovery.counters[ROGUE] == recovery.counters[LOST] == 0
+
+
+def test_nothing_before_first_frame_is_lost():
+    recovery, _ = run(range(100, 300))
+    assert recovery.counters[LOST] == 0
+
+
+def test_reset_timeout():
+    recovery = SequenceRecovery(reset_timeout=1.0, latent_error_paths=None)
+    assert recovery.accept(1, now=0.0)
+    assert recovery.accept(2, now=0.5)
+    # Far outside the window, but after the timeout it is taken as is
+    assert recovery.accept(20000, now=2.0)
+    assert recovery.counters[RESETS] == 1
+    assert recovery.counters[ROGUE] == 0
+    assert recovery.recov_seq_num == 20000
+
+
+def test_explicit_reset():
+    recovery, _ = run([1, 2, 3])
+    recovery.reset()
+    assert recovery.take_any
+    assert recovery.accept(3, now=0.0)
+    assert recovery.counters[RESETS] == 1
+    assert recovery.counters[DISCARDED] == 0
+
+
+@pytest.mark.parametrize('history_length', [0, 65])
+def test_history_length_bounds(history_length):
+    with pytest.raises(ValueError):
+        SequenceRecovery(history_length)
+
+
+
+def test_older_than_first_frame_is_tracked():
+    # 6..9 are never seen once 5 arrives late: lost when they leave
+    recovery, _ = run([10, 5] + list(range(11, 200)))
+    assert recovery.counters[OUT_OF_ORDER] == 1
+    assert recovery.counters[LOST] == 4
+
+
+def test_table_rows_are_independent():
+    table = RecoveryTable(latent_error_paths=None, rows=2)
+    for sequence in range(1, 101):
+        table.accept(0, sequence, 0.0)
+        if sequence != 50:
+            table.accept(1, sequence + 1000, 0.0)
+            table.accept(1, sequence + 1000, 0.0)
+    assert table.row_counters(0)[PASSED] == 100
+    assert table.row_counters(0)[DISCARDED] == 0
+    assert table.row_counters(1)[PASSED] == 99
+    assert table.row_counters(1)[DISCARDED] == 99
+    assert table.row_counters(1)[LOST] == 1
+    assert table.row_counters(0)[LOST] == 0
+
+
+def test_table_clear_and_grow():
+    table = RecoveryTable(latent_error_paths=None, rows=1)
+    for sequence in (1, 2, 2, 40):
+        table.accept(0, sequence, 0.0)
+    table.clear(0)
+    assert list(table.row_counters(0)) == [0] * len(COUNTER_NAMES)
+    assert table.accept(0, 2, 0.0)
+    table.grow(2)
+    assert table.rows == 3
+    assert table.accept(2, 7, 0.0)
+    table.add_counters(2, [1, 2])
+    assert list(table.row_counters(2))[:3] == [2, 2, 0]
+
+
+def latent_recovery():
+    return SequenceRecovery(reset_timeout=None, latent_error_paths=2,
+                            latent_error_difference=5, latent_error_period=1.0,
+                            latent_reset_period=10.0)
+
+
+def feed(recovery, first, count, copies, start, step=0.01):
+    for n in range(count):
+        for _ in range(copies):
+            recovery.accept((first + n) & 0xFFFF, now=start + n * step)
+
+
+def test_no_latent_error_with_every_copy():
+    recovery = latent_recovery()
+    feed(recovery, 1, 500, copies=2, start=0.0)
+    assert not recovery.latent_error
+    assert recovery.counters[LATENT_ERRORS] == 0
+
+
+def test_latent_error_when_a_path_dies():
+    recovery = latent_recovery()
+    feed(recovery, 1, 100, copies=2, start=0.0)
+    feed(recovery, 101, 150, copies=1, start=1.0)
+    assert recovery.latent_error
+    # Counted once while it persists
+    feed(recovery, 251, 300, copies=1, start=2.5)
+    assert recovery.counters[LATENT_ERRORS] == 1
+
+
+def test_latent_error_reset_takes_new_baseline():
+    recovery = latent_recovery()
+    feed(recovery, 1, 100, copies=2, start=0.0)
+    feed(recovery, 101, 950, copies=1, start=1.0)
+    assert recovery.counters[LATENT_ERRORS] == 1
+    assert recovery.counters[LATENT_ERROR_RESETS] == 1
+    # The reset took the single-path difference as the baseline: a path
+    # that stays down is reported again only after the next change
+    feed(recovery, 1051, 50, copies=2, start=10.5)
+    assert not recovery.latent_error
+    assert recovery.counters[LATENT_ERRORS] == 1
+
+
+def test_latent_error_disabled():
+    recovery = SequenceRecovery(latent_error_paths=None)
+    feed(recovery, 1, 500, copies=1, start=0.0)
+    assert recovery.counters[LATENT_ERRORS] == 0
+    assert recovery.counters[LATENT_ERROR_RESETS] == 0
@@ -0,0 +1,77 @@
+"""Relay forwarding decisions and egress frame rebuilding, without rings"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from frer_analysis_tool import FRERAnalyzer
+from frer_frame import FrameTemplate
+from frer_relay import FRERRelay
+from frer_stats import LogHistogram
+from rtag_decoder import ETH_P_8021AD, ETH_P_8021Q
+
+SRC_MAC = bytes.fromhex('020000000001')
+TCI = (3 << 13) | 100
+
+
+def relay(strip=False, passthrough=False, learn=True):
+    """A FRERRelay whose egress ring collects the rebuilt frames"""
+    analyzer = FRERAnalyzer(verbose=False, members=['a', 'b'])
+    analyzer.stream_table.learn = learn
+    forwarded = []
+    node = FRERRelay.__new__(FRERRelay)
+    node.analyzer = analyzer
+    node.strip = strip
+    node.passthrough = passthrough
+    node.batch_size = 4
+    node.received = node.forwarded = node.bytes = 0
+    node.forward_latency = LogHistogram()
+    node._pending = []
+    node.tx = SimpleNamespace(
+        queue_parts=lambda parts: forwarded.append(b''.join(bytes(part) for part in parts)),
+        flush=lambda: None)
+    return node, forwarded
+
+
+def received(sequence):
+    """An R-TAG frame as the kernel hands it over: VLAN tag stripped"""
+    return bytes(FrameTemplate(SRC_MAC, vlan_id=None).build(sequence))
+
+
+def test_forwards_one_copy_of_each_sequence():
+    node, forwarded = relay()
+    for sequence in range(10):
+        for member in (0, 1):
+            node._forward(received(sequence), TCI, 1000 * sequence, member)
+    node.flush()
+    assert (node.received, node.forwarded) == (20, 10)
+    assert forwarded == [bytes(FrameTemplate(SRC_MAC).build(n)) for n in range(10)]
+    assert node.forward_latency.count == 10
+
+
+def test_strip_restores_the_next_protocol():
+    node, forwarded = relay(strip=True)
+    node._forward(received(5), TCI, 0, 0)
+    assert forwarded == [bytes(FrameTemplate(SRC_MAC, rtag=False).build(5))]
+    assert node.bytes == len(forwarded[0])
+
+
+@pytest.mark.parametrize('tpid', [ETH_P_8021Q, ETH_P_8021AD])
+def test_stripped_tag_keeps_its_tpid(tpid):
+    node, forwarded = relay()
+    node._forward(received(1), TCI, 0, 0, tpid)
+    assert forwarded[0][12:16] == tpid.to_bytes(2, 'big') + TCI.to_bytes(2, 'big')
+
+
+def test_untagged_frames_stay_untagged():
+    node, forwarded = relay()
+    node._forward(received(1), None, 0, 0)
+    assert forwarded == [received(1)]
+
+
+@pytest.mark.parametrize('passthrough', [False, True])
+def test_unidentified_streams(passthrough):
+    node, forwarded = relay(passthrough=passthrough, learn=False)
+    for member in (0, 1):
+        node._forward(received(1), TCI, 0, member)
+    assert node.forwarded == len(forwarded) == (2 if passthrough else 0)
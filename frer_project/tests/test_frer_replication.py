@@ -0,0 +1,89 @@
+"""Sequence generation and replication onto member rings"""
+
+from frer_frame import FrameTemplate, decode_probe
+from frer_pacer import GapTimer
+from frer_replication import Replicator, SequenceGenerator
+from rtag_decoder import decode_rtag
+
+SRC_MAC = bytes.fromhex('020000000001')
+
+
+class RecordingRing:
+    """TxRing stand-in: keeps the queued frames and the flush calls"""
+
+    def __init__(self):
+        self.frames = []
+        self.flushes = []
+        self.closed = False
+
+    def queue(self, frame):
+        self.frames.append(bytes(frame))
+
+    def flush(self, wait=True):
+        self.flushes.append(wait)
+
+    def close(self):
+        self.closed = True
+
+
+def replicator(members=2, batch_size=4, sequence=None):
+    node = Replicator.__new__(Replicator)
+    node.interfaces = [f'member{n}' for n in range(members)]
+    node.batch_size = batch_size
+    node.sequence = sequence or SequenceGenerator()
+    node.rings = [RecordingRing() for _ in range(members)]
+    node.timer = GapTimer()
+    node.pending = node.frames = node.bytes = 0
+    node.start_time = node.end_time = None
+    return node
+
+
+def test_sequence_generator():
+    generator = SequenceGenerator(start=65534)
+    assert [generator.next(1) for _ in range(4)] == [65534, 65535, 0, 1]
+    assert generator.next(2) == 65534
+    generator.reset(1)
+    assert generator.next(1) == 65534
+    assert generator.next(2) == 65535
+    generator.reset()
+    assert generator.next(2) == 65534
+
+
+def test_copies_share_sequence_and_tx_time():
+    node = replicator(members=3)
+    rings = node.rings
+    templates = [FrameTemplate(SRC_MAC, src_port=1000 + n, probe_stream=n) for n in range(2)]
+    node.send_batch([(n % 2, templates[n % 2]) for n in range(6)])
+    assert node.frames == 6
+    for index in range(6):
+        copies = [ring.frames[index] for ring in rings]
+        headers = [decode_rtag(frame) for frame in copies]
+        probes = [decode_probe(frame, header) for frame, header in zip(copies, headers)]
+        assert len({header.sequence for header in headers}) == 1
+        assert headers[0].sequence == index // 2
+        assert [probe[1] for probe in probes] == [0, 1, 2]
+        assert len({probe[2] for probe in probes}) == 1
+
+
+def test_flushes_every_batch_without_waiting():
+    node = replicator(batch_size=4)
+    template = FrameTemplate(SRC_MAC)
+    for _ in range(9):
+        node.queue(1, template)
+    assert [ring.flushes for ring in node.rings] == [[False, False]] * 2
+    node.flush()
+    assert [ring.flushes for ring in node.rings] == [[False] * 3] * 2
+    node.flush()
+    assert len(node.rings[0].flushes) == 3
+
+
+def test_close_waits_for_every_ring():
+    node = replicator()
+    rings = node.rings
+    node.send(1, FrameTemplate(SRC_MAC))
+    sent_at = node.end_time
+    node.close()
+    assert [ring.flushes[-1] for ring in rings] == [True, True]
+    assert all(ring.closed for ring in rings)
+    assert node.end_time >= sent_at
+    assert node.report().frames == 1
@@ -0,0 +1,66 @@
+"""Scenario expectations and checks against an analyzer snapshot"""
+
+import pytest
+
+from frer_analysis_tool import FRERAnalyzer
+from frer_recovery import DISCARDED, LOST, OUT_OF_ORDER, PASSED, ROGUE
+from frer_scenario import FIRST_SRC_PORT, Scenario, ScenarioRunner, ScenarioStream
+from frer_stream_id import IP_STREAM_ID, StreamIdentificationTable
+from rtag_decoder import decode_rtag
+
+SRC_MAC = bytes.fromhex('020000000001')
+
+
+def test_expected_counts_follow_scale_and_members():
+    stream = ScenarioStream(10, members=("a", "a", "b"))
+    scenario = Scenario("triple", [stream, ScenarioStream(4)])
+    assert scenario.frames() == 30 + 8
+    assert scenario.frames(scale=2) == 60 + 16
+    assert scenario.expected(stream, scale=2) == {
+        PASSED: 20, DISCARDED: 40, OUT_OF_ORDER: 0, ROGUE: 0, LOST: 0}
+
+
+def test_paths_need_one_impairment_per_member():
+    with pytest.raises(ValueError):
+        ScenarioStream(10, members=("a", "b"), paths=[None])
+
+
+def test_streams_get_unique_handles_over_all_scenarios():
+    scenarios = [Scenario("one", [ScenarioStream(1), ScenarioStream(1)]),
+                 Scenario("two", [ScenarioStream(1)])]
+    runner = ScenarioRunner(scenarios, SRC_MAC)
+    assert [stream.handle for stream in runner.streams] == [1, 2, 3]
+    table = StreamIdentificationTable(IP_STREAM_ID)
+    keys = set()
+    for stream in runner.streams:
+        template = runner.template(stream)
+        frame = template.build(0)
+        keys.add(table.frame_key(frame, decode_rtag(frame)))
+        src_port = int.from_bytes(frame[template.udp_offset:template.udp_offset + 2], 'big')
+        assert src_port == FIRST_SRC_PORT + stream.handle
+    assert len(keys) == 3
+
+
+def test_check_reports_only_mismatching_streams():
+    complete = ScenarioStream(5, first_sequence=65534)
+    single = ScenarioStream(5)
+    unseen = ScenarioStream(3)
+    good, bad = Scenario("good", [complete]), Scenario("bad", [single, unseen])
+    runner = ScenarioRunner([good, bad], SRC_MAC)
+
+    analyzer = FRERAnalyzer(verbose=False)
+    for stream, copies in ((complete, 2), (single, 1)):
+        template = runner.template(stream)
+        for n in range(stream.frames):
+            sequence = (stream.first_sequence + n) & 0xFFFF
+            for path_id in range(copies):
+                analyzer.analyze_frame(bytes(template.build(sequence, path_id=path_id)))
+    snapshot = analyzer.snapshot()
+
+    assert runner.received(complete, snapshot)[:2] == [5, 5]
+    assert runner.received(unseen, snapshot) == [0] * len(runner.received(unseen, snapshot))
+    results = runner.check(snapshot)
+    assert results[0] == (good, [])
+    assert results[1] == (bad, [(single, DISCARDED, 5, 0),
+                                (unseen, PASSED, 3, 0),
+                                (unseen, DISCARDED, 3, 0)])
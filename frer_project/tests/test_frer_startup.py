@@ -0,0 +1,36 @@
+"""Tool start-up: interface addresses without scapy, and no scapy import"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+import frer_frame
+from frer_frame import interface_mac, mac_to_bytes
+
+PROJECT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_mac_to_bytes_accepts_colons_and_dashes():
+    expected = bytes.fromhex('0200000000ff')
+    assert mac_to_bytes('02:00:00:00:00:ff') == expected
+    assert mac_to_bytes('02-00-00-00-00-FF') == expected
+
+
+def test_interface_mac_from_sysfs_and_ioctl(monkeypatch):
+    assert interface_mac('lo') == bytes(6)
+
+    def no_sysfs(path, *args, **kwargs):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(frer_frame, 'open', no_sysfs, raising=False)
+    assert interface_mac('lo') == bytes(6)
+    with pytest.raises(OSError):
+        interface_mac('nosuchif0')
+
+
+def test_tools_start_without_importing_scapy():
+    code = ("import sys, frer_analysis_tool, frer_wireshark_official, comprehensive_rtag_test\n"
+            "sys.exit(any(name.split('.')[0] == 'scapy' for name in sys.modules))")
+    assert subprocess.run([sys.executable, '-c', code], cwd=PROJECT).returncode == 0
@@ -0,0 +1,114 @@
+"""Per-sequence copy and arrival tracking over sequence rings"""
+
+from frer_stats import ArrivalTable, CopyTable, LogHistogram
+
+
+def copies(sequences, window=64):
+    histogram = LogHistogram()
+    table = CopyTable(histogram, window, rows=1)
+    for sequence in sequences:
+        table.add(0, sequence & 0xFFFF)
+    table.finish(0)
+    return dict(histogram.distribution())
+
+
+def test_ring_size_is_a_power_of_two():
+    assert CopyTable(LogHistogram(), window=48).size == 64
+    assert CopyTable(LogHistogram(), window=64).size == 64
+
+
+def test_copies_per_sequence():
+    sequences = [n for n in range(1, 201) for _ in range(2) if n != 50]
+    assert copies(sequences + [150]) == {0: 1, 2: 198, 3: 1}
+
+
+def test_nothing_before_the_first_sequence_is_counted():
+    assert copies(range(1000, 1100)) == {1: 100}
+
+
+def test_older_than_the_first_sequence():
+    assert copies([10, 5] + list(range(11, 200))) == {0: 4, 1: 191}
+
+
+def test_older_than_the_ring_is_ignored():
+    assert copies(list(range(100, 200)) + [100]) == {1: 100}
+
+
+def test_wraparound():
+    assert copies(range(0xFFC0, 0x10040)) == {1: 128}
+
+
+def test_rows_are_independent():
+    histogram = LogHistogram()
+    table = CopyTable(histogram, rows=2)
+    for sequence in range(1, 101):
+        table.add(0, sequence)
+        table.add(1, sequence + 30000)
+        table.add(1, sequence + 30000)
+    table.finish(0)
+    table.finish(1)
+    assert histogram.distribution() == [(1, 100), (2, 100)]
+
+
+def test_clear_forgets_without_accounting():
+    histogram = LogHistogram()
+    table = CopyTable(histogram, rows=1)
+    for sequence in range(10):
+        table.add(0, sequence)
+    table.clear(0)
+    table.finish(0)
+    assert histogram.count == 0
+    table.add(0, 500)
+    table.finish(0)
+    assert histogram.distribution() == [(1, 1)]
+
+
+def test_grow_adds_rows():
+    table = CopyTable(LogHistogram(), rows=1)
+    table.grow(3)
+    assert table.rows == 4
+    assert len(table.counts) == 4 * table.size
+
+
+def arrivals(deliveries, members=2):
+    wins = [0] * members
+    losses = [0] * members
+    skew = [LogHistogram() for _ in range(members)]
+    table = ArrivalTable(wins, losses, skew, rows=1)
+    for sequence, member, arrival_ns in deliveries:
+        table.add(0, sequence, member, arrival_ns)
+    table.finish(0)
+    return wins, losses, skew
+
+
+def test_wins_losses_and_skew():
+    deliveries = []
+    for sequence in range(100):
+        deliveries.append((sequence, 0, sequence * 1000))
+        if sequence != 42:
+            deliveries.append((sequence, 1, sequence * 1000 + 250))
+    wins, losses, skew = arrivals(deliveries)
+    assert wins == [100, 0]
+    assert losses == [0, 1]
+    assert skew[0].count == 0
+    assert (skew[1].count, skew[1].min, skew[1].max) == (99, 250, 250)
+
+
+def test_late_member_wins_when_first():
+    wins, losses, skew = arrivals([(1, 1, 0), (1, 0, 10), (2, 0, 20), (2, 1, 25)])
+    assert wins == [1, 1]
+    assert losses == [0, 0]
+    assert (skew[0].count, skew[1].count) == (1, 1)
+
+
+def test_jump_wider_than_the_ring():
+    # 1..999 never had a slot: they are recorded as lost in bulk
+    assert copies([0, 1000]) == {0: 999, 1: 2}
+    assert copies([0, 64]) == {0: 63, 1: 2}
+    assert copies([0, 65]) == {0: 64, 1: 2}
+
+
+def test_jump_wider_than_the_ring_counts_member_losses():
+    wins, losses, _ = arrivals([(0, 0, 0), (0, 1, 5), (1000, 0, 10)])
+    assert wins == [2, 0]
+    assert losses == [999, 1000]
@@ -0,0 +1,91 @@
+"""Stream identification: packed keys from frames and from configuration"""
+
+import struct
+
+import pytest
+
+from frer_frame import FrameTemplate
+from frer_stream_id import (StreamIdentificationTable, IP_STREAM_ID, NULL_STREAM_ID,
+                            SOURCE_STREAM_ID)
+from rtag_decoder import decode_rtag
+
+SRC_MAC = bytes.fromhex('020000000001')
+DST_MAC = bytes.fromhex('01005e000001')
+
+
+def frame(vlan_id=100, priority=3, src_port=12345, dst_mac=DST_MAC, **kwargs):
+    template = FrameTemplate(SRC_MAC, dst_mac=dst_mac, vlan_id=vlan_id, priority=priority,
+                             src_port=src_port, **kwargs)
+    data = bytes(template.build(1))
+    return data, decode_rtag(data)
+
+
+def test_frame_key_matches_configured_key():
+    table = StreamIdentificationTable(IP_STREAM_ID, learn=False)
+    handle = table.add_stream(dst_mac='01:00:5e:00:00:01', vlan=100,
+                              ip5=('192.168.100.1', '192.168.100.2', 17, 12345, 54321))
+    assert table.identify(*frame()) == handle
+    assert table.identify(*frame(src_port=12346)) is None
+    assert table.identify(*frame(vlan_id=101)) is None
+    assert len(table) == 1
+
+
+def test_key_fields_are_packed_without_overlap():
+    table = StreamIdentificationTable(('dst_mac', 'vlan', 'pcp'))
+    key = table.value_key(dst_mac='ff-ff-ff-ff-ff-ff', vlan=0xFFF, pcp=7)
+    assert key == (1 << (48 + 12 + 3)) - 1
+    assert table.value_key(dst_mac=bytes(6), vlan=1, pcp=0) == 1 << 3
+
+
+@pytest.mark.parametrize('key_fields, differs', [
+    (NULL_STREAM_ID, {'vlan_id': 200}),
+    (SOURCE_STREAM_ID, {'vlan_id': 200}),
+    (IP_STREAM_ID, {'src_port': 1}),
+    (IP_STREAM_ID, {'dst_ip': '10.0.0.1'}),
+    (('pcp',), {'priority': 5}),
+])
+def test_learned_handles(key_fields, differs):
+    table = StreamIdentificationTable(key_fields, first_handle=10)
+    first = table.identify(*frame())
+    assert first == 10
+    assert table.identify(*frame()) == first
+    assert table.identify(*frame(**differs)) == 11
+
+
+def test_ignored_fields_share_a_stream():
+    table = StreamIdentificationTable(NULL_STREAM_ID)
+    assert table.identify(*frame(src_port=1)) == table.identify(*frame(src_port=2))
+
+
+def test_non_ip_payload_keys_on_layer_2():
+    table = StreamIdentificationTable(IP_STREAM_ID)
+    data = bytearray(frame()[0])
+    header = decode_rtag(data)
+    struct.pack_into('!H', data, header.payload_offset - 2, 0x86DD)
+    header = decode_rtag(data)
+    assert table.frame_key(data, header) == table.value_key(
+        dst_mac=DST_MAC, vlan=100, ip5=('0.0.0.0', '0.0.0.0', 0, 0, 0))
+
+
+def test_lookup_does_not_learn():
+    table = StreamIdentificationTable()
+    assert table.lookup(*frame()) is None
+    assert len(table) == 0
+
+
+def test_forget_learned_but_not_configured():
+    table = StreamIdentificationTable(NULL_STREAM_ID)
+    configured = table.add_stream(dst_mac=DST_MAC, vlan=100)
+    learned = table.identify(*frame(vlan_id=7))
+    table.forget(configured)
+    table.forget(learned)
+    assert table.identify(*frame()) == configured
+    assert table.lookup(*frame(vlan_id=7)) is None
+    assert table.identify(*frame(vlan_id=7)) == learned + 1
+
+
+def test_configuration_errors():
+    with pytest.raises(ValueError):
+        StreamIdentificationTable(('dst_mac', 'ttl'))
+    with pytest.raises(ValueError):
+        StreamIdentificationTable(NULL_STREAM_ID).add_stream(dst_mac=DST_MAC)
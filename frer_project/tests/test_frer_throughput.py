@@ -0,0 +1,96 @@
+"""Throughput search against a simulated link instead of real trials"""
+
+import pytest
+
+from frer_frame import max_payload
+from frer_stats import LogHistogram
+from frer_throughput import (DEFAULT_PAYLOADS, RATE_TOLERANCE, ThroughputSweep, Trial,
+                             line_rate)
+
+SRC_MAC = bytes.fromhex('020000000001')
+
+
+def sweep(capacity, back_to_back, paced_limit=None, speed_mbps=None, mtu=1500):
+    """ThroughputSweep whose trials lose whatever exceeds capacity
+
+    back_to_back is the rate the sender reaches unpaced, paced_limit the
+    highest rate it can pace (None: any).
+    """
+    node = ThroughputSweep.__new__(ThroughputSweep)
+    node.members = ['a', 'b']
+    node.listen = ['a', 'b']
+    node.duration = 1.0
+    node.resolution = 0.01
+    node.top_frames = 50000
+    node.src_mac = SRC_MAC
+    node.interfaces = [{'interface': name, 'speed_mbps': speed_mbps} for name in node.members]
+    node.mtu = mtu
+    node.max_payload = max_payload(mtu)
+    node.rates = []
+
+    def trial(payload_size, rate=None):
+        node.rates.append(rate)
+        frames = node.top_frames if rate is None else max(1, round(rate * node.duration))
+        achieved = back_to_back if rate is None else min(rate, paced_limit or rate)
+        passed = frames if achieved <= capacity else round(frames * capacity / achieved)
+        latency = LogHistogram()
+        latency.record(5000)
+        return Trial(rate, frames, achieved, passed, 0, latency)
+
+    node.trial = trial
+    return node
+
+
+def test_line_rate_counts_ethernet_overhead():
+    # 64-byte frames on gigabit: the RFC 2544 1,488,095 frames/s
+    assert line_rate(1000, 60) == pytest.approx(1488095, abs=1)
+
+
+def test_frame_len_of_the_largest_payload_fills_the_mtu():
+    node = sweep(0, 0)
+    # Ethernet and VLAN headers ride on top of the MTU
+    assert node.frame_len(node.max_payload) == 1500 + 18
+    assert node.frame_len(64) == node.frame_len(65) - 1
+
+
+def test_payloads_add_the_mtu_largest():
+    node = sweep(0, 0, mtu=300)
+    assert node.payloads() == [size for size in DEFAULT_PAYLOADS if size < 266] + [266]
+    assert node.payloads([64, 1000]) == [64, 1000]
+
+
+def test_search_converges_below_the_capacity():
+    node = sweep(capacity=30000, back_to_back=100000)
+    result = node.search(64)
+    assert 30000 - 0.01 * 100000 <= result['throughput_pps'] <= 30000
+    assert result['top_rate_pps'] == 100000
+    assert result['loss_at_top'] == pytest.approx(0.7)
+    assert not result['sender_bound']
+    assert result['latency_us']['max'] == pytest.approx(5, rel=0.05)
+    assert len(result['trials']) == len(node.rates) == 8
+    assert node.rates[0] is None
+
+
+def test_line_rate_caps_the_search():
+    node = sweep(capacity=5000, back_to_back=100000, speed_mbps=10)
+    result = node.search(64)
+    top = line_rate(10, node.frame_len(64))
+    assert result['top_rate_pps'] == round(top, 1)
+    assert max(rate for rate in node.rates if rate is not None) < top
+    assert 5000 - 0.01 * top <= result['throughput_pps'] <= 5000
+
+
+def test_zero_loss_back_to_back_is_sender_bound():
+    node = sweep(capacity=10 ** 6, back_to_back=100000)
+    result = node.search(64)
+    assert node.rates == [None]
+    assert result['throughput_pps'] == 100000
+    assert result['sender_bound']
+
+
+def test_rates_the_sender_cannot_pace_count_as_failures():
+    node = sweep(capacity=30000, back_to_back=100000, paced_limit=20000)
+    result = node.search(64)
+    # Within the tolerance, a paced trial still counts as meeting its rate
+    assert result['throughput_pps'] <= 20000 / (1 - RATE_TOLERANCE)
+    assert result['sender_bound']
@@ -0,0 +1,117 @@
+"""TPACKET_V2 transmit ring slots on a plain buffer with a recording socket"""
+
+import socket
+import struct
+from types import SimpleNamespace
+
+import pytest
+
+from frer_transmit import (TxReport, TxRing, TP_STATUS_AVAILABLE, TP_STATUS_SEND_REQUEST,
+                           TP_STATUS_WRONG_FORMAT, TX_DATA_OFFSET)
+
+FRAME_SIZE = 256
+FRAME_NR = 4
+
+
+def ring():
+    """A TxRing over a bytearray; ring.sends lists the flags of each send()"""
+    tx = TxRing.__new__(TxRing)
+    tx.frame_size = FRAME_SIZE
+    tx.frame_nr = FRAME_NR
+    tx.max_frame_len = FRAME_SIZE - TX_DATA_OFFSET
+    tx.current = tx.pending = tx.wrong_format = 0
+    tx.in_flight = False
+    tx.buf = bytearray(FRAME_SIZE * FRAME_NR)
+    tx._view = memoryview(tx.buf)
+    tx._poller = SimpleNamespace(poll=lambda timeout: [])
+    tx.sends = []
+    tx.sock = SimpleNamespace(send=lambda data, flags: tx.sends.append(flags) or 0)
+    return tx
+
+
+def slot(tx, index):
+    """(status, frame) of a ring slot"""
+    base = index * FRAME_SIZE
+    status, length = struct.unpack_from('=II', tx.buf, base)
+    return status, bytes(tx.buf[base + TX_DATA_OFFSET:base + TX_DATA_OFFSET + length])
+
+
+def test_queue_fills_slots_in_order():
+    tx = ring()
+    tx.queue(b'first')
+    tx.queue(memoryview(b'second frame'))
+    assert slot(tx, 0) == (TP_STATUS_SEND_REQUEST, b'first')
+    assert slot(tx, 1) == (TP_STATUS_SEND_REQUEST, b'second frame')
+    assert slot(tx, 2)[0] == TP_STATUS_AVAILABLE
+    assert (tx.current, tx.pending) == (2, 2)
+
+
+def test_flush_sends_once_for_all_pending():
+    tx = ring()
+    for n in range(3):
+        tx.queue(bytes([n]) * 60)
+    tx.flush()
+    assert tx.sends == [0]
+    assert tx.pending == 0
+    tx.flush()
+    assert tx.sends == [0]
+
+
+def test_flush_without_wait_is_waited_for_later():
+    tx = ring()
+    tx.queue(b'frame')
+    tx.flush(wait=False)
+    assert tx.sends == [socket.MSG_DONTWAIT]
+    # Nothing pending, but the frames in flight are still waited for
+    tx.flush()
+    assert tx.sends == [socket.MSG_DONTWAIT, 0]
+    tx.flush()
+    assert len(tx.sends) == 2
+
+
+def test_full_ring_flushes_before_reusing_a_slot():
+    tx = ring()
+
+    def send(data, flags):
+        tx.sends.append(flags)
+        # The driver sends everything and gives the slots back
+        for index in range(FRAME_NR):
+            struct.pack_into('=I', tx.buf, index * FRAME_SIZE, TP_STATUS_AVAILABLE)
+        return 0
+    tx.sock = SimpleNamespace(send=send)
+    for n in range(FRAME_NR + 1):
+        tx.queue(bytes([n]) * 20)
+    assert tx.sends == [0]
+    assert slot(tx, 0) == (TP_STATUS_SEND_REQUEST, bytes([FRAME_NR]) * 20)
+    assert tx.current == 1
+
+
+def test_rejected_slot_is_reclaimed():
+    tx = ring()
+    struct.pack_into('=I', tx.buf, 0, TP_STATUS_WRONG_FORMAT)
+    tx.queue(b'again')
+    assert tx.wrong_format == 1
+    assert slot(tx, 0) == (TP_STATUS_SEND_REQUEST, b'again')
+
+
+def test_oversized_frame():
+    tx = ring()
+    with pytest.raises(ValueError):
+        tx.queue(bytes(FRAME_SIZE - TX_DATA_OFFSET + 1))
+    tx.queue(bytes(FRAME_SIZE - TX_DATA_OFFSET))
+
+
+def test_report_rates():
+    report = TxReport(1000, 125000, 0.5)
+    assert (report.pps, report.bps) == (2000.0, 2000000.0)
+    assert TxReport(0, 0, 0.0).pps == 0.0
+    assert "2,000 pps" in report.summary()
+
+
+def test_queue_parts_joins_pieces_in_one_slot():
+    tx = ring()
+    received = memoryview(b'0123456789abcdef')
+    tx.queue_parts((received[:12], b'\x81\x00\x60\x64', received[12:]))
+    assert slot(tx, 0) == (TP_STATUS_SEND_REQUEST, b'0123456789ab\x81\x00\x60\x64cdef')
+    with pytest.raises(ValueError):
+        tx.queue_parts((bytes(200), bytes(100)))
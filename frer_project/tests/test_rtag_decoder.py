@@ -0,0 +1,83 @@
+"""R-TAG decoding across the Ethernet / 802.1Q / QinQ tag chain"""
+
+import struct
+
+import pytest
+
+from rtag_decoder import (decode_rtag, decode_tagless, ETH_P_8021AD, ETH_P_8021Q,
+                          ETH_P_IP, ETH_P_QINQ_LEGACY, ETH_P_RTAG)
+
+MACS = bytes.fromhex('ffffffffffff' '020000000001')
+PAYLOAD = b'\x45' + bytes(27)
+
+
+def vlan_tag(tpid, vlan, pcp):
+    return struct.pack('!HH', tpid, (pcp << 13) | vlan)
+
+
+def rtag(sequence, reserved=0, next_protocol=ETH_P_IP):
+    return struct.pack('!HHHH', ETH_P_RTAG, reserved, sequence, next_protocol)
+
+
+def test_untagged():
+    frame = MACS + rtag(1234) + PAYLOAD
+    header = decode_rtag(frame)
+    assert header == (None, None, 1234, ETH_P_IP, 20)
+    assert bytes(frame[header.payload_offset:]) == PAYLOAD
+
+
+def test_single_tag():
+    frame = MACS + vlan_tag(ETH_P_8021Q, 100, 3) + rtag(0xFFFF) + PAYLOAD
+    assert decode_rtag(frame) == (100, 3, 0xFFFF, ETH_P_IP, 24)
+
+
+@pytest.mark.parametrize('outer', [ETH_P_8021AD, ETH_P_QINQ_LEGACY, ETH_P_8021Q])
+def test_qinq_uses_inner_tag(outer):
+    frame = (MACS + vlan_tag(outer, 200, 5) + vlan_tag(ETH_P_8021Q, 100, 3)
+             + rtag(7) + PAYLOAD)
+    assert decode_rtag(frame) == (100, 3, 7, ETH_P_IP, 28)
+
+
+def test_three_tags_are_not_walked():
+    frame = (MACS + vlan_tag(ETH_P_8021AD, 1, 0) + vlan_tag(ETH_P_8021AD, 2, 0)
+             + vlan_tag(ETH_P_8021Q, 3, 0) + rtag(7) + PAYLOAD)
+    assert decode_rtag(frame) is None
+
+
+def test_stripped_tag_from_auxdata():
+    frame = MACS + rtag(42) + PAYLOAD
+    assert decode_rtag(frame, vlan_tci=(6 << 13) | 300) == (300, 6, 42, ETH_P_IP, 20)
+
+
+def test_in_band_tag_wins_over_auxdata():
+    frame = MACS + vlan_tag(ETH_P_8021Q, 100, 3) + rtag(42) + PAYLOAD
+    assert decode_rtag(frame, vlan_tci=(6 << 13) | 300)[:2] == (100, 3)
+
+
+def test_nonzero_reserved_is_rejected():
+    assert decode_rtag(MACS + rtag(1, reserved=1) + PAYLOAD) is None
+
+
+def test_not_rtag():
+    frame = MACS + vlan_tag(ETH_P_8021Q, 100, 3) + struct.pack('!H', ETH_P_IP) + PAYLOAD
+    assert decode_rtag(frame) is None
+
+
+@pytest.mark.parametrize('length', [0, 12, 13, 14, 17, 19])
+def test_truncated(length):
+    frame = MACS + rtag(1) + PAYLOAD
+    assert decode_rtag(frame[:length]) is None
+
+
+def test_zero_copy_buffers():
+    frame = bytearray(MACS + rtag(99) + PAYLOAD)
+    view = memoryview(frame)
+    assert decode_rtag(view).sequence == 99
+    assert decode_rtag(frame).sequence == 99
+
+
+def test_tagless():
+    frame = MACS + vlan_tag(ETH_P_8021Q, 100, 3) + struct.pack('!H', ETH_P_IP) + PAYLOAD
+    assert decode_tagless(frame) == (100, 3, None, ETH_P_IP, 18)
+    assert decode_tagless(MACS + rtag(1) + PAYLOAD) is None
+    assert decode_tagless(MACS[:12]) is None